@@ -0,0 +1,218 @@
+import math
+import os
+import numpy as np
+import pandas as pd
+from instrument import traced
+from storage import read_run
+
+### 업로드 run 이상 판정 엔진
+# gyro 투표: run 별로 구간(20cm) 안 gyro 최대값이 그 구간 상한선을 넘는지 (파일 × 구간 행렬)
+#   → 한 구간에서 넘은 파일 수가 ceil(파일 수 × 70%) 이상이면 이상 구간
+# 70% (ANOMALY_RATIO) 는 아래 검증 set 일괄 판정의 bin 초과 비율과 같은 값
+# 모든 run 의 position 을 한 번에 구간 번호로 바꾸고 (파일, 구간) 별 최대값을 배열 연산 한 번으로 구한다.
+
+BIN_SIZE = 20
+ANOMALY_RATIO = 0.7
+
+
+# {구간 시작: 상한선} → (정렬된 구간 시작 배열, 상한선 배열)
+def bin_thresholds(thresholds):
+    bin_starts = np.array(sorted(thresholds), dtype=float)
+    return bin_starts, np.array([thresholds[b] for b in sorted(thresholds)], dtype=float)
+
+
+# position → 구간 인덱스 ([start, start + bin_size) 에 없으면 -1)
+def digitize(position, bin_starts, bin_size=BIN_SIZE):
+    position = np.asarray(position, dtype=float)
+    idx = np.searchsorted(bin_starts, position, side='right') - 1
+    inside = (idx >= 0) & (position < bin_starts[np.maximum(idx, 0)] + bin_size)
+    return np.where(inside, idx, -1)
+
+
+# runs: DataFrame 목록 (position, col 필요)
+# 반환: (파일 × 구간 최대값 행렬 - 데이터 없는 칸은 NaN, 파일 × 구간 초과 여부 행렬)
+def exceedance_matrix(runs, bin_starts, thresholds, bin_size=BIN_SIZE, col='gyro'):
+    n_bins = len(bin_starts)
+    lengths = [len(df) for df in runs]
+    run_idx = np.repeat(np.arange(len(runs)), lengths)
+    position = np.concatenate([df['position'].to_numpy(dtype=float) for df in runs]) if runs else np.empty(0)
+    values = np.concatenate([df[col].to_numpy(dtype=float) for df in runs]) if runs else np.empty(0)
+
+    bin_idx = digitize(position, bin_starts, bin_size)
+    ok = bin_idx >= 0
+    cell = run_idx[ok] * n_bins + bin_idx[ok]
+
+    # (파일, 구간) 별 최대값 (NaN 은 무시 - 원래 pandas 비교와 같음)
+    bin_max = np.full(len(runs) * n_bins, np.nan)
+    np.fmax.at(bin_max, cell, values[ok])
+    bin_max = bin_max.reshape(len(runs), n_bins)
+
+    with np.errstate(invalid='ignore'):
+        exceed = bin_max > thresholds[None, :]
+    return bin_max, exceed
+
+
+# 반환: (구간별 초과 파일 수, 기준 파일 수, 이상 구간 여부)
+def vote(exceed, ratio=ANOMALY_RATIO):
+    counts = exceed.sum(axis=0)
+    threshold_count = math.ceil(exceed.shape[0] * ratio)  # 보수적으로 올림
+    return counts, threshold_count, counts >= threshold_count
+
+
+# gyro 투표 판정 (gyro.show_gyro 용)
+# thresholds: {구간 시작: 상한선}, baseline_version: 상한선을 만든 baseline 모델 version (결과에 기록)
+@traced('detect_gyro')
+def detect_gyro(runs, thresholds, bin_size=BIN_SIZE, ratio=ANOMALY_RATIO, baseline_version=None):
+    bin_starts, limits = bin_thresholds(thresholds)
+    bin_max, exceed = exceedance_matrix(runs, bin_starts, limits, bin_size)
+    counts, threshold_count, abnormal = vote(exceed, ratio)
+    return {
+        'bin_starts': bin_starts,
+        'thresholds': limits,
+        'bin_max': bin_max,
+        'exceed': exceed,
+        'counts': counts,
+        'threshold_count': threshold_count,
+        'abnormal_bins': [(bin_starts[i], int(counts[i])) for i in np.flatnonzero(abnormal)],
+        'baseline': baseline_version,
+    }
+
+
+# --- tilt 3σ 띠 판정 (pitch.show_pitch 용) ---
+# 업로드 run 들의 구간별 tilt 평균이 정상 summary 구간 평균 ± 3σ 를 벗어나는지
+
+TILT_BIN_SIZE = 20
+TILT_RANGE = (0, 220)
+SIGMA = 3
+
+
+# 업로드 run 들을 한 번만 binning 해서 합침 (원본 DataFrame 은 바꾸지 않음)
+# 반환: position_bin + cols 열 DataFrame (lo <= position_bin <= hi)
+def bin_runs(runs, cols=('cumulative_pitch', 'tilt'), bin_size=1, lo=TILT_RANGE[0], hi=TILT_RANGE[1]):
+    frames = []
+    for df in runs:
+        position_bin = (df['position'] / bin_size).round() * bin_size
+        keep = ((position_bin >= lo) & (position_bin <= hi)).to_numpy()
+        frame = df.loc[keep, [c for c in cols if c in df.columns]].reset_index(drop=True)
+        frame.insert(0, 'position_bin', position_bin.to_numpy()[keep])
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+# 정상 summary (position_bin, tilt) → 구간별 tilt 평균/std 배열
+def tilt_band(summary_df, bin_size=TILT_BIN_SIZE, lo=TILT_RANGE[0], hi=TILT_RANGE[1]):
+    bin_starts = np.arange(lo, hi, bin_size)
+    summary_df = summary_df[(summary_df['position_bin'] >= lo) & (summary_df['position_bin'] < hi)]
+    grouped = summary_df.groupby((summary_df['position_bin'] - lo) // bin_size * bin_size + lo)['tilt'].agg(['mean', 'std'])
+    grouped = grouped.reindex(bin_starts)
+    return {'bin_starts': bin_starts, 'bin_size': bin_size,
+            'mean': grouped['mean'].to_numpy(), 'std': grouped['std'].to_numpy()}
+
+
+# binned: bin_runs 결과, band: tilt_band 결과
+# 반환: 구간별 DataFrame (bin_start, upload_mean, mean, std, lower, upper, out_of_band, percent_exceed)
+#   percent_exceed = |업로드 평균 - 정상 평균| / (3σ) × 100
+@traced('tilt_band_check')
+def tilt_band_check(binned, band, sigma=SIGMA):
+    bin_starts = band['bin_starts']
+    n_bins = len(bin_starts)
+    position_bin = binned['position_bin'].to_numpy(dtype=float)
+    tilt = binned['tilt'].to_numpy(dtype=float)
+
+    idx = np.floor((position_bin - bin_starts[0]) / band['bin_size']).astype(np.int64)
+    ok = (idx >= 0) & (idx < n_bins) & ~np.isnan(tilt)
+    counts = np.bincount(idx[ok], minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        upload_mean = np.bincount(idx[ok], weights=tilt[ok], minlength=n_bins) / counts
+
+    mean = band['mean']
+    std = np.where(np.isnan(band['std']) | (band['std'] == 0), 1e-6, band['std'])  # 0일 때 나누기 방지용 아주 작은 수
+    lower = mean - sigma * std
+    upper = mean + sigma * std
+    with np.errstate(invalid='ignore'):
+        out_of_band = (upload_mean > upper) | (upload_mean < lower)
+    return pd.DataFrame({
+        'bin_start': bin_starts,
+        'upload_mean': upload_mean,
+        'mean': mean,
+        'std': std,
+        'lower': lower,
+        'upper': upper,
+        'out_of_band': out_of_band,
+        'percent_exceed': np.abs(upload_mean - mean) / (sigma * std) * 100,
+    })
+
+
+# --- 검증 set 일괄 판정 (matrix.py 용) ---
+# matrix.detect_anomaly 와 같은 규칙:
+#   샘플 position 을 30cm floor bin 으로 → position_bin_gyro 가 같은 모든 summary 행의 상한선과 비교
+#   run 별 0.3cm floor bin 의 (초과 수 / 비교 수) >= 0.7 인 bin 수를 셈 (1개 이상이면 이상)
+# 여러 set 의 run 을 배열 하나로 합치고 (run id), 상한선은 merge 대신 배열 인덱싱으로 찾는다.
+
+FINE_BIN_SIZE = 0.3
+UPPER_BIN_SIZE = 30
+
+
+# 반환: (run id 배열, {열: 배열})
+@traced('load_runs')
+def load_runs_array(file_list, columns=('position', 'gyro')):
+    runs = [read_run(file_path, columns=list(columns)) for file_path in file_list]
+    run_id = np.repeat(np.arange(len(runs)), [len(df) for df in runs])
+    arrays = {col: (np.concatenate([df[col].to_numpy(dtype=float) for df in runs]) if runs else np.empty(0))
+              for col in columns}
+    return run_id, arrays
+
+
+# summary (position_bin_gyro, upper_bound_gyro) → (정렬된 bin, bin × summary 행 상한선 표 - 빈 칸은 NaN)
+@traced('threshold_table')
+def gyro_threshold_table(summary_df):
+    bins, inverse = np.unique(summary_df['position_bin_gyro'].to_numpy(dtype=float), return_inverse=True)
+    upper = summary_df['upper_bound_gyro'].to_numpy(dtype=float)
+    order = np.argsort(inverse, kind='stable')
+    counts = np.bincount(inverse, minlength=len(bins))
+    slot = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+    table = np.full((len(bins), counts.max() if len(counts) else 0), np.nan)
+    table[inverse[order], slot] = upper[order]
+    return bins, table
+
+
+# 반환: run 별 이상 bin 수 (길이 n_runs)
+@traced('count_anomaly_bins')
+def count_anomaly_bins(run_id, position, gyro, bins, table, n_runs,
+                       bin_size=FINE_BIN_SIZE, upper_bin_size=UPPER_BIN_SIZE, ratio=ANOMALY_RATIO):
+    # 1. 30cm bin → 상한선 표의 행 (summary 에 없는 bin 은 제외, merge how='inner' 와 같음)
+    coarse = np.floor(position / upper_bin_size) * upper_bin_size
+    row = np.minimum(np.searchsorted(bins, coarse), len(bins) - 1)
+    matched = bins[row] == coarse
+    limits = table[row[matched]]
+
+    # 2. 샘플별 초과 수 / 비교 수 (summary 행 수만큼)
+    with np.errstate(invalid='ignore'):
+        exceed_count = (gyro[matched, None] > limits).sum(axis=1)
+    compare_count = (~np.isnan(limits)).sum(axis=1)
+
+    # 3. (run, 0.3cm bin) 별로 한 번에 합산
+    fine = np.floor(position[matched] / bin_size).astype(np.int64)
+    runs = run_id[matched]
+    if len(fine) == 0:
+        return np.zeros(n_runs, dtype=np.int64)
+    span = fine.max() - fine.min() + 1
+    group, inverse = np.unique(runs * span + (fine - fine.min()), return_inverse=True)
+    anomaly_ratio = (np.bincount(inverse, weights=exceed_count, minlength=len(group))
+                     / np.bincount(inverse, weights=compare_count, minlength=len(group)))
+
+    # 4. 비율 70% 이상 bin 을 run 별로 셈
+    return np.bincount(group[anomaly_ratio >= ratio] // span, minlength=n_runs)
+
+
+# 파일 목록 일괄 판정 → [{'filename', 'detected', 'anomaly_bins', 'baseline'}, ...] (matrix.py 결과 형식)
+# baseline_version: summary_df 를 만든 baseline 모델 version (결과에 기록)
+@traced('detect_files')
+def detect_files(file_list, summary_df, bin_size=FINE_BIN_SIZE, upper_bin_size=UPPER_BIN_SIZE, ratio=ANOMALY_RATIO,
+                 baseline_version=None):
+    run_id, arrays = load_runs_array(file_list)
+    bins, table = gyro_threshold_table(summary_df)
+    counts = count_anomaly_bins(run_id, arrays['position'], arrays['gyro'], bins, table, len(file_list),
+                                bin_size, upper_bin_size, ratio)
+    return [{'filename': os.path.basename(f), 'detected': bool(c > 0), 'anomaly_bins': int(c), 'baseline': baseline_version}
+            for f, c in zip(file_list, counts)]
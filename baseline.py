@@ -0,0 +1,183 @@
+import argparse
+import glob
+import os
+import numpy as np
+import pandas as pd
+from binstats import IQR_MULTIPLIER, iqr_upper_bound
+from sketch import BinnedMoments, BinnedSketch
+from storage import atomic_write, read_run
+
+### 정상 baseline 증분 저장소
+# set 별 / position_bin 별로 병합 가능한 통계를 들고 있다.
+# - gyro (10 단위 bin): 평균/분산 + 분위수 sketch → upper_bound_gyro = Q3 + k * IQR
+# - cumulative_pitch, tilt (1 단위 bin): 평균/분산
+# 정상 run 하나가 추가되면 그 run 의 행 수만큼만 계산하고 (add_run),
+# set 끼리는 원본을 다시 읽지 않고 merge 로 합친다.
+# export_summaries 로 기존 summary_gyro_setN.csv / summary_pitch_tilt_setN.csv 형식을 만든다.
+# (기본 저장 위치는 data/artifacts/baseline_summary - 커밋된 data/normal/summary 는 data_add.py 결과이므로 덮어쓰지 않음)
+# (mean 은 부동소수점 오차 수준에서 data_add.py 결과와 같고, upper_bound 는 sketch 상대오차 1% 가
+#  IQR 배수만큼 커져서 현재 데이터 기준 2% 이내로 차이남)
+
+base_dir = 'data'
+STORE_PATH = os.path.join(base_dir, 'normal', 'summary', 'baseline_store.npz')
+EXPORT_DIR = os.path.join(base_dir, 'artifacts', 'baseline_summary')
+
+bin_size_gyro = 10
+bin_size_pitch_tilt = 1
+
+# 열 이름 → (bin 크기, 분위수 sketch 사용 여부)
+CHANNELS = {
+    'gyro': (bin_size_gyro, True),
+    'cumulative_pitch': (bin_size_pitch_tilt, False),
+    'tilt': (bin_size_pitch_tilt, False),
+}
+
+
+def position_bin(position, bin_size):
+    return (np.asarray(position, dtype=float) / bin_size).round() * bin_size
+
+
+class SetBaseline:
+    def __init__(self):
+        self.n_runs = 0
+        self.moments = {col: BinnedMoments() for col in CHANNELS}
+        self.sketches = {col: BinnedSketch() for col, (_, use_sketch) in CHANNELS.items() if use_sketch}
+
+    def add_run(self, df):
+        for col, (bin_size, _) in CHANNELS.items():
+            bins = position_bin(df['position'], bin_size)
+            self.moments[col].update(bins, df[col])
+            if col in self.sketches:
+                self.sketches[col].update(bins, df[col])
+        self.n_runs += 1
+        return self
+
+    def merge(self, other):
+        for col in CHANNELS:
+            self.moments[col].merge(other.moments[col])
+        for col, sketch in self.sketches.items():
+            sketch.merge(other.sketches[col])
+        self.n_runs += other.n_runs
+        return self
+
+    def summary_gyro(self, iqr_multiplier=IQR_MULTIPLIER):
+        moments = self.moments['gyro']
+        sketch = self.sketches['gyro']
+        q1 = sketch.quantile(0.25)
+        q3 = sketch.quantile(0.75)
+        return pd.DataFrame({
+            'position_bin_gyro': moments.bins,
+            'mean_gyro': moments.mean,
+            'upper_bound_gyro': iqr_upper_bound(q1, q3, iqr_multiplier),
+        })
+
+    def summary_pitch_tilt(self):
+        pitch = self.moments['cumulative_pitch']
+        tilt = self.moments['tilt']
+        df = pd.DataFrame({'position_bin_pitch_tilt': pitch.bins, 'mean_pitch': pitch.mean})
+        return df.merge(pd.DataFrame({'position_bin_pitch_tilt': tilt.bins, 'mean_tilt': tilt.mean}),
+                        on='position_bin_pitch_tilt', how='outer')
+
+
+class BaselineStore:
+    def __init__(self):
+        self.sets = {}
+
+    def add_run(self, set_name, df):
+        self.sets.setdefault(set_name, SetBaseline()).add_run(df)
+        return self
+
+    def add_file(self, set_name, file_path):
+        return self.add_run(set_name, read_run(file_path, columns=['position', *CHANNELS]))
+
+    # 다른 저장소 (다른 PC, 다른 캠페인) 의 set 들을 합침 (other 의 객체는 복사해서 넣으므로 other 는 그대로)
+    def merge(self, other):
+        for set_name, baseline in other.sets.items():
+            self.sets.setdefault(set_name, SetBaseline()).merge(baseline)
+        return self
+
+    # 여러 set 을 합친 baseline (원본 재로딩 없음)
+    def combined(self, set_names=None):
+        total = SetBaseline()
+        for set_name in (set_names or sorted(self.sets)):
+            total.merge(self.sets[set_name])
+        return total
+
+    def export_summaries(self, summary_dir, iqr_multiplier=IQR_MULTIPLIER):
+        os.makedirs(summary_dir, exist_ok=True)
+        for set_name, baseline in sorted(self.sets.items()):
+            baseline.summary_gyro(iqr_multiplier).to_csv(
+                os.path.join(summary_dir, f"summary_gyro_{set_name}.csv"), index=False)
+            baseline.summary_pitch_tilt().to_csv(
+                os.path.join(summary_dir, f"summary_pitch_tilt_{set_name}.csv"), index=False)
+            print(f"[INFO] 저장 완료: summary_gyro_{set_name}.csv, summary_pitch_tilt_{set_name}.csv")
+
+    def save(self, path=STORE_PATH):
+        arrays = {}
+        for set_name, baseline in self.sets.items():
+            arrays[f'{set_name}/n_runs'] = np.array(baseline.n_runs)
+            for col, moments in baseline.moments.items():
+                for key, value in moments.to_arrays().items():
+                    arrays[f'{set_name}/moments/{col}/{key}'] = value
+            for col, sketch in baseline.sketches.items():
+                for key, value in sketch.to_arrays().items():
+                    arrays[f'{set_name}/sketch/{col}/{key}'] = value
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+
+    @classmethod
+    def load(cls, path=STORE_PATH):
+        store = cls()
+        with np.load(path, allow_pickle=False) as npz:
+            grouped = {}
+            for key in npz.files:
+                set_name, rest = key.split('/', 1)
+                grouped.setdefault(set_name, {})[rest] = npz[key]
+        for set_name, items in grouped.items():
+            baseline = SetBaseline()
+            baseline.n_runs = int(items['n_runs'])
+            for col in CHANNELS:
+                baseline.moments[col] = BinnedMoments.from_arrays(
+                    {k.split('/')[-1]: v for k, v in items.items() if k.startswith(f'moments/{col}/')})
+            for col in baseline.sketches:
+                baseline.sketches[col] = BinnedSketch.from_arrays(
+                    {k.split('/')[-1]: v for k, v in items.items() if k.startswith(f'sketch/{col}/')})
+            store.sets[set_name] = baseline
+        return store
+
+
+# data/normal/set*/normal_*.csv 전체로 저장소 만들기
+def build_store(folder=os.path.join(base_dir, 'normal'), set_pattern='set*'):
+    store = BaselineStore()
+    for set_folder in sorted(glob.glob(os.path.join(folder, set_pattern))):
+        set_name = os.path.basename(set_folder)
+        for file_path in sorted(glob.glob(os.path.join(set_folder, 'normal_*.csv'))):
+            store.add_file(set_name, file_path)
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='정상 baseline 증분 저장소')
+    parser.add_argument('--store', default=STORE_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='data/normal/set* 전체로 새로 만들기')
+    add = sub.add_parser('add', help='정상 run 추가')
+    add.add_argument('set_name')
+    add.add_argument('files', nargs='+')
+    export = sub.add_parser('export', help='summary CSV 내보내기')
+    export.add_argument('--summary-dir', default=EXPORT_DIR)
+    export.add_argument('--iqr-multiplier', type=float, default=IQR_MULTIPLIER)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        store = build_store()
+        store.save(args.store)
+        print(f"[INFO] {len(store.sets)} sets → {args.store}")
+    elif args.command == 'add':
+        store = BaselineStore.load(args.store) if os.path.exists(args.store) else BaselineStore()
+        for file_path in args.files:
+            store.add_file(args.set_name, file_path)
+        store.save(args.store)
+        print(f"[INFO] {args.set_name}: {store.sets[args.set_name].n_runs} runs")
+    elif args.command == 'export':
+        BaselineStore.load(args.store).export_summaries(args.summary_dir, args.iqr_multiplier)
@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from storage import atomic_write, file_hash, files_signature, read_run
+
+### 정상 baseline 모델 파일 (baseline_model.npz)
+# 대시보드(gyro.py / pitch.py) 와 matrix.py 가 매번 summary_*_set[0-5].csv 를 glob → concat → groupby 하던 것을
+# 한 번 만들어 둔 배열 파일 하나로 읽는다 (비압축 .npz, 수십 KB, 로딩 수 ms).
+# - gyro: 10cm bin × set 평균 / 상한선 (set 에 없는 bin 은 NaN)
+# - pitch, tilt: 1cm bin × set 평균 + set 사이 평균 / std (matrix.py 의 normal_stats)
+# - meta: set 목록, 원본 summary 파일 sha1, IQR 배수, 만든 시각, version
+# version 은 배열 내용 + set 목록의 sha1 앞 12자리 → 같은 summary 로 다시 만들면 같은 version.
+# 판정 결과에 version 을 같이 남겨서 어떤 baseline 으로 판정했는지 알 수 있게 한다.
+# 원본 summary 의 mtime/size 가 바뀌면 load_model 이 다시 만든다 (내용이 같으면 version 도 같음).
+
+base_dir = 'data'
+SUMMARY_DIR = os.path.join(base_dir, 'normal', 'summary')
+MODEL_PATH = os.path.join(SUMMARY_DIR, 'baseline_model.npz')
+MODEL_SETS = [f'set{i}' for i in range(6)]
+FORMAT_VERSION = 1
+
+
+def summary_files(sets=MODEL_SETS, summary_dir=SUMMARY_DIR):
+    return ([os.path.join(summary_dir, f'summary_gyro_{s}.csv') for s in sets]
+            + [os.path.join(summary_dir, f'summary_pitch_tilt_{s}.csv') for s in sets])
+
+
+# set 별 (bin, 값...) DataFrame 목록 → (bin 배열, {열: bin × set 배열})
+def stack_sets(frames, bin_col, value_cols):
+    bins = np.unique(np.concatenate([df[bin_col].to_numpy(dtype=float) for df in frames]))
+    arrays = {col: np.full((len(bins), len(frames)), np.nan) for col in value_cols}
+    for j, df in enumerate(frames):
+        row = np.searchsorted(bins, df[bin_col].to_numpy(dtype=float))
+        for col in value_cols:
+            arrays[col][row, j] = df[col].to_numpy(dtype=float)
+    return bins, arrays
+
+
+# bin × set 배열 → set 순서대로 이어 붙인 긴 DataFrame (원래 summary CSV 를 concat 한 것과 같은 행)
+def unstack_sets(sets, bins, arrays, bin_col):
+    frames = []
+    for j, set_name in enumerate(sets):
+        present = ~np.isnan(next(iter(arrays.values()))[:, j])
+        df = pd.DataFrame({bin_col: bins[present], **{col: a[present, j] for col, a in arrays.items()}})
+        frames.append(df.assign(set_name=set_name))
+    return pd.concat(frames, ignore_index=True)
+
+
+class BaselineModel:
+    def __init__(self, arrays, meta):
+        self.arrays = arrays    # 'gyro/position_bin', 'gyro/mean', 'gyro/upper', 'pitch_tilt/...'
+        self.meta = meta
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    @property
+    def sets(self):
+        return self.meta['sets']
+
+    def content_hash(self):
+        h = hashlib.sha1(json.dumps({'format': FORMAT_VERSION, 'sets': self.sets}).encode('utf-8'))
+        for key in sorted(self.arrays):
+            h.update(key.encode('utf-8'))
+            h.update(np.ascontiguousarray(self.arrays[key]).tobytes())
+        return h.hexdigest()[:12]
+
+    # --- 원래 summary CSV 형태 (set_name 열 추가) ---
+    def gyro_summary(self):
+        a = self.arrays
+        return unstack_sets(self.sets, a['gyro/position_bin'],
+                            {'mean_gyro': a['gyro/mean'], 'upper_bound_gyro': a['gyro/upper']}, 'position_bin_gyro')
+
+    def pitch_tilt_summary(self):
+        a = self.arrays
+        return unstack_sets(self.sets, a['pitch_tilt/position_bin'],
+                            {'mean_pitch': a['pitch_tilt/pitch'], 'mean_tilt': a['pitch_tilt/tilt']},
+                            'position_bin_pitch_tilt')
+
+    # 1cm bin 별 set 사이 pitch / tilt 평균, std (matrix.py 의 normal_stats 와 같은 열)
+    def pitch_tilt_stats(self):
+        a = self.arrays
+        return pd.DataFrame({
+            'position': a['pitch_tilt/position_bin'],
+            'normal_mean_pitch': a['pitch_tilt/pitch_mean'],
+            'normal_std_pitch': a['pitch_tilt/pitch_std'],
+            'normal_mean_tilt': a['pitch_tilt/tilt_mean'],
+            'normal_std_tilt': a['pitch_tilt/tilt_std'],
+        })
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # 대시보드 세션 여러 개가 동시에 다시 만들 수 있으므로 겹치지 않는 임시 파일로 (storage.atomic_write)
+        atomic_write(path, lambda f: np.savez(f, meta=np.array(json.dumps(self.meta, ensure_ascii=False)), **self.arrays))
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta']))
+            if meta.get('format') != FORMAT_VERSION:
+                raise ValueError(f"baseline 모델 형식이 다름: {meta.get('format')} (필요: {FORMAT_VERSION})")
+            return cls({key: npz[key] for key in npz.files if key != 'meta'}, meta)
+
+    # summary_gyro_setN.csv / summary_pitch_tilt_setN.csv 로 만들기
+    # iqr_multiplier: summary 를 만들 때 쓴 값 (기록용, 모르면 None)
+    @classmethod
+    def from_summaries(cls, sets=MODEL_SETS, summary_dir=SUMMARY_DIR, iqr_multiplier=None):
+        sets = list(sets)
+        files = summary_files(sets, summary_dir)
+        gyro = [read_run(f) for f in files[:len(sets)]]
+        pitch_tilt = [read_run(f) for f in files[len(sets):]]
+
+        gyro_bins, gyro_arrays = stack_sets(gyro, 'position_bin_gyro', ['mean_gyro', 'upper_bound_gyro'])
+        pt_bins, pt_arrays = stack_sets(pitch_tilt, 'position_bin_pitch_tilt', ['mean_pitch', 'mean_tilt'])
+        stats = pd.concat(pitch_tilt).groupby('position_bin_pitch_tilt')[['mean_pitch', 'mean_tilt']].agg(['mean', 'std'])
+        stats = stats.reindex(pt_bins)
+
+        arrays = {
+            'gyro/position_bin': gyro_bins,
+            'gyro/mean': gyro_arrays['mean_gyro'],
+            'gyro/upper': gyro_arrays['upper_bound_gyro'],
+            'pitch_tilt/position_bin': pt_bins,
+            'pitch_tilt/pitch': pt_arrays['mean_pitch'],
+            'pitch_tilt/tilt': pt_arrays['mean_tilt'],
+            'pitch_tilt/pitch_mean': stats[('mean_pitch', 'mean')].to_numpy(),
+            'pitch_tilt/pitch_std': stats[('mean_pitch', 'std')].to_numpy(),
+            'pitch_tilt/tilt_mean': stats[('mean_tilt', 'mean')].to_numpy(),
+            'pitch_tilt/tilt_std': stats[('mean_tilt', 'std')].to_numpy(),
+        }
+        meta = {
+            'format': FORMAT_VERSION,
+            'sets': sets,
+            'iqr_multiplier': iqr_multiplier,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sources': [{'file': os.path.basename(f), 'sha1': file_hash(f)} for f in files],
+            'signature': [list(s) for s in files_signature(files)],
+        }
+        model = cls(arrays, meta)
+        meta['version'] = model.content_hash()
+        return model
+
+
+def build_model(sets=MODEL_SETS, summary_dir=SUMMARY_DIR, path=MODEL_PATH, iqr_multiplier=None):
+    model = BaselineModel.from_summaries(sets, summary_dir, iqr_multiplier)
+    model.save(path)
+    return model
+
+
+# 저장된 모델이 있고 원본 summary 가 그대로면 읽고, 아니면 다시 만들어 저장
+def load_model(path=MODEL_PATH, sets=MODEL_SETS, summary_dir=SUMMARY_DIR):
+    signature = [list(s) for s in files_signature(summary_files(sets, summary_dir))]
+    try:
+        model = BaselineModel.load(path)
+        if model.meta['signature'] == signature and model.sets == list(sets):
+            return model
+        iqr_multiplier = model.meta.get('iqr_multiplier')
+    except (OSError, ValueError, KeyError):
+        iqr_multiplier = None  # 없거나 형식이 다르면 새로 만든다
+    try:
+        return build_model(sets, summary_dir, path, iqr_multiplier)
+    except OSError:
+        return BaselineModel.from_summaries(sets, summary_dir, iqr_multiplier)  # 읽기 전용 환경
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='정상 baseline 모델 파일')
+    parser.add_argument('--path', default=MODEL_PATH)
+    parser.add_argument('--rebuild', action='store_true', help='summary CSV 로 새로 만들기')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        model = build_model(path=args.path)
+    else:
+        start = time.perf_counter()
+        model = load_model(args.path)
+        print(f"[INFO] 로딩 {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"[INFO] baseline {model.version} ({', '.join(model.sets)}), "
+          f"{os.path.getsize(args.path) / 1e3:.1f} KB → {args.path}")
+    print(json.dumps({k: v for k, v in model.meta.items() if k != 'signature'}, ensure_ascii=False, indent=2))
@@ -0,0 +1,364 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time as timer
+import numpy as np
+import pandas as pd
+
+### 전처리 → summary → 판정 단계별 벤치마크 (end-to-end)
+# data_demo.analyze_and_save / data_add.py / matrix.py 판정 (anomaly.detect_files) / gyro.show_gyro / pitch.show_pitch
+# 를 고정된 데이터셋에서 시간 재고, 초당 행 수와 최대 메모리를 기록해서 커밋별 JSON 으로 남긴다.
+# - 데이터셋: bundled (지금 data 폴더 run 복사본) / synth_x10, synth_x100, synth_x1000 (synth.py, seed 고정, 지금 run 수의 배수)
+#   data/.cache/bench/<데이터셋>/data 에 한 번 만들어 두고 다시 씀 (원본 run 이나 합성 프로필이 바뀌면 다시 만듦)
+# - 단계마다 새 프로세스에서 실행 (앞 단계의 import / 메모리 / 캐시가 섞이지 않음)
+#   최대 메모리 = 그 프로세스의 최대 RSS (import 포함), stage_rss_mb = 단계 중에 늘어난 최대 RSS
+#   preprocess 는 원본을 심볼릭 링크한 임시 폴더에서 (결과 CSV / read_run 캐시가 데이터셋을 바꾸지 않음, 캐시 없는 첫 전처리)
+#   summary / detect / gyro / pitch 는 데이터셋 폴더에서 (read_run 캐시는 준비 단계에서 만들어져 있음)
+#   gyro / pitch 는 업로드 9개 묶음으로 (이상 run 부터, 최대 MAX_UPLOAD_GROUPS 묶음) streamlit 없이 호출 (bare mode)
+#   startup 은 대시보드 cold start: 새 프로세스에서 streamlit + 첫 화면 모듈 import (import_seconds) 후
+#   dashboard.py 첫 실행 (streamlit AppTest, 기본 Gyro 탭, render_seconds) - 합이 seconds. bundled 데이터셋에서만
+#   첫 실행 뒤 DEFERRED_MODULES 중 하나라도 import 되어 있으면 단계 실패 (종료 코드 1)
+#   baseline 과 별개로 STAGE_BUDGETS (초) 를 넘으면 회귀 (baseline 에 그 단계가 없어도 확인)
+# - 결과: data/artifacts/bench/<commit>.json (작업 트리가 바뀌어 있으면 <commit>-dirty.json)
+#   baseline.json 과 비교해서 시간이 tolerance (기본 20%) 넘게 늘거나 최대 메모리가 같은 비율로 늘면 회귀 → 종료 코드 1
+#   같은 커밋으로 다시 돌리면 돌린 (데이터셋, 단계) 만 바꿔 씀
+#   baseline 은 --save-baseline 으로 지금 결과를 저장 (시간은 기계마다 다르므로 같은 기계 결과끼리 비교)
+# python bench.py --datasets bundled,synth_x10 --repeat 3
+
+base_dir = 'data'
+WORK_DIR = os.path.join(base_dir, '.cache', 'bench')
+RESULT_DIR = os.path.join(base_dir, 'artifacts', 'bench')
+BASELINE_PATH = os.path.join(RESULT_DIR, 'baseline.json')
+
+STAGES = ['preprocess', 'summary', 'detect', 'gyro', 'pitch', 'startup']
+BUNDLED_ONLY = {'startup'}   # 데이터 크기와 무관한 단계
+PARTS_STAGES = {'startup'}   # 함수가 {부분: 초} 를 돌려주는 단계 (seconds 는 그 합)
+STAGE_BUDGETS = {'startup': 3.0}  # 절대 시간 상한 (초) - 지금 1.3~1.8s
+BASE_RUNS = 127             # 지금 전처리 run 수 (정상 78 + 이상 49), synth_xN = N 배
+SYNTH_SCALES = {'synth_x10': 10, 'synth_x100': 100, 'synth_x1000': 1000}
+DATASETS = ['bundled', *SYNTH_SCALES]
+SYNTH_SEED = 0
+ANOMAL_RATIO = 49 / 127     # bundled 와 같은 이상 run 비율
+UPLOAD_SIZE = 9             # 대시보드 판정에 필요한 업로드 run 수
+MAX_UPLOAD_GROUPS = 100
+TOLERANCE = 0.2
+FORMAT_VERSION = 1
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+# 대시보드 첫 화면 (Gyro 탭) 에 필요 없는 모듈 (PIL / plotly 일부는 streamlit 이 직접 import)
+DEFERRED_MODULES = ('matplotlib', 'plotly.express', 'qrcode', 'pitch')
+
+
+# --- 데이터셋 준비 ---
+
+def bundled_sources():
+    return (sorted(glob.glob(os.path.join(base_dir, 'normal', 'set*', 'normal_*.csv')))
+            + sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set*', 'anomal_*.csv')))
+            + sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set*', 'raw_anomal_*.csv'))))
+
+
+# 데이터셋이 무엇으로 만들어졌는지 (바뀌면 다시 만듦)
+def dataset_stamp(name):
+    from storage import files_signature
+    if name == 'bundled':
+        return {'format': FORMAT_VERSION, 'sources': [list(s) for s in files_signature(bundled_sources())]}
+    from synth import load_profile
+    return {'format': FORMAT_VERSION, 'runs': SYNTH_SCALES[name] * BASE_RUNS, 'seed': SYNTH_SEED,
+            'anomal_ratio': ANOMAL_RATIO, 'profile': load_profile()['meta']['created_at']}
+
+
+# data/.cache/bench/<name> (그 안의 data 폴더가 원래 data 폴더와 같은 구조) 를 만들어 두고 경로 반환
+def prepare_dataset(name, rebuild=False):
+    root = os.path.join(WORK_DIR, name)
+    stamp_path = os.path.join(root, 'stamp.json')
+    stamp = dataset_stamp(name)
+    if not rebuild and os.path.exists(stamp_path):
+        with open(stamp_path, encoding='utf-8') as f:
+            if json.load(f) == stamp:
+                return root
+
+    print(f"[INFO] 데이터셋 준비: {name}")
+    shutil.rmtree(root, ignore_errors=True)
+    data_dir = os.path.join(root, base_dir)
+    if name == 'bundled':
+        for src in bundled_sources():
+            dest = os.path.join(data_dir, os.path.relpath(src, base_dir))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(src, dest)
+    else:
+        from synth import generate
+        generate(stamp['runs'], data_dir, ANOMAL_RATIO, SYNTH_SEED)
+    # summary / baseline 모델 (detect / gyro / pitch 단계에 필요) + read_run 캐시
+    run_stage('summary', root)
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f)
+    return root
+
+
+# --- 단계 (새 프로세스, 작업 폴더 = 데이터셋 폴더) ---
+
+def count_rows(file_list):
+    rows = 0
+    for f in file_list:
+        with open(f, 'rb') as fh:
+            rows += sum(1 for _ in fh) - 1
+    return rows
+
+
+def processed_files(kind):
+    return sorted(glob.glob(os.path.join(base_dir, kind, 'set*', f'{kind}_*.csv')))
+
+
+# 대시보드 cold start (새 프로세스에서 한 번) → 단계별 시간
+def dashboard_startup():
+    start = timer.perf_counter()
+    import streamlit
+    import storage
+    import uploads
+    import gyro
+    import_seconds = timer.perf_counter() - start
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(DASHBOARD, default_timeout=120)
+    start = timer.perf_counter()
+    app.run()
+    render_seconds = timer.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f'대시보드 첫 실행 실패: {app.exception[0].value}')
+    loaded = [m for m in DEFERRED_MODULES if m in sys.modules]
+    if loaded:
+        raise RuntimeError(f"첫 화면에서 import 되면 안 되는 모듈: {', '.join(loaded)}")
+    return {'import_seconds': import_seconds, 'render_seconds': render_seconds}
+
+
+# 반환: (실행할 함수, 행 수, 단위 수) - PARTS_STAGES 의 함수는 {부분: 초} 를 돌려줌
+def setup_stage(stage):
+    if stage == 'preprocess':
+        import data_demo
+        file_list = sorted(glob.glob(os.path.join(base_dir, '*', 'set*', 'raw_*.csv')))
+
+        def func():
+            for f in file_list:
+                data_demo.analyze_and_save(f, 'normal' if f.startswith(os.path.join(base_dir, 'normal')) else 'anomal',
+                                           mode='headless')
+        return func, count_rows(file_list), len(file_list)
+
+    if stage == 'summary':
+        import data_add
+        file_list = processed_files('normal')
+        return (lambda: data_add.main(mode='headless')), count_rows(file_list), len(file_list)
+
+    if stage == 'detect':
+        from anomaly import detect_files
+        from baseline_model import load_model
+        file_list = processed_files('normal') + processed_files('anomal')
+
+        def func():
+            model = load_model()
+            detect_files(file_list, model.gyro_summary(), baseline_version=model.version)
+        return func, count_rows(file_list), len(file_list)
+
+    if stage in ('gyro', 'pitch'):
+        from storage import read_run
+        show = __import__(stage).show_gyro if stage == 'gyro' else __import__(stage).show_pitch
+        file_list = processed_files('anomal') + processed_files('normal')
+        groups = []
+        for i in range(0, len(file_list) - UPLOAD_SIZE + 1, UPLOAD_SIZE):
+            group = []
+            for f in file_list[i:i + UPLOAD_SIZE]:
+                df = read_run(f)
+                df.attrs['filename'] = os.path.basename(f)
+                group.append(df)
+            groups.append(group)
+            if len(groups) == MAX_UPLOAD_GROUPS:
+                break
+
+        def func():
+            for group in groups:
+                show(group)
+        return func, sum(len(df) for group in groups for df in group), len(groups)
+
+    if stage == 'startup':
+        return dashboard_startup, 0, 1
+
+    raise ValueError(f'알 수 없는 단계: {stage}')
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+# 작업 프로세스 본체: 단계 하나 실행 → JSON 한 줄 출력
+def stage_main(stage, root):
+    scratch = None
+    if stage == 'preprocess':
+        # 원본만 링크한 임시 폴더 (결과 CSV / 캐시를 데이터셋 폴더에 쓰지 않음)
+        scratch = tempfile.mkdtemp(prefix='bench_preprocess_')
+        for src in glob.glob(os.path.join(root, base_dir, '*', 'set*', 'raw_*.csv')):
+            dest = os.path.join(scratch, os.path.relpath(src, root))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.symlink(os.path.abspath(src), dest)
+        root = scratch
+    os.chdir(root)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            func, rows, units = setup_stage(stage)
+            rss_before = max_rss_mb()
+            start = timer.perf_counter()
+            result = func()
+            elapsed = timer.perf_counter() - start
+            parts = result if stage in PARTS_STAGES else {}
+            if parts:
+                elapsed = sum(parts.values())
+        rss_after = max_rss_mb()
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    print(json.dumps({'seconds': elapsed, 'rows': rows, 'units': units,
+                      'peak_rss_mb': rss_after, 'stage_rss_mb': rss_after - rss_before, **parts}))
+
+
+def run_stage(stage, root):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '_stage', stage, os.path.abspath(root)],
+                          capture_output=True, text=True, env=dict(os.environ, MPLBACKEND='Agg'))
+    if proc.returncode != 0:
+        raise RuntimeError(f'{stage} 단계 실패 ({root}):\n{proc.stderr[-2000:]}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- 결과 / 회귀 판정 ---
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                    text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+# 절대 시간 상한 확인 → 결과 행에 budget / over_budget 추가
+def check_budgets(results, budgets=STAGE_BUDGETS):
+    for r in results:
+        budget = budgets.get(r['stage'])
+        if budget is None:
+            continue
+        r['budget'] = budget
+        r['over_budget'] = bool(r['seconds'] > budget)
+    return results
+
+
+# 같은 (데이터셋, 단계) 끼리 비교 → 결과 행에 base_seconds / change / regression 추가
+def compare(results, baseline, tolerance=TOLERANCE):
+    base = {(r['dataset'], r['stage']): r for r in baseline['results']}
+    for r in results:
+        b = base.get((r['dataset'], r['stage']))
+        if b is None:
+            r['regression'] = None
+            continue
+        r['base_seconds'] = b['seconds']
+        r['change'] = r['seconds'] / b['seconds'] - 1
+        r['regression'] = bool(r['seconds'] > b['seconds'] * (1 + tolerance)
+                               or r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance))
+    return results
+
+
+def main(datasets=('bundled', 'synth_x10'), stages=STAGES, repeat=3, tolerance=TOLERANCE,
+         baseline_path=BASELINE_PATH, save_baseline=False, rebuild=False):
+    results = []
+    for name in datasets:
+        root = prepare_dataset(name, rebuild)
+        for stage in stages:
+            if stage in BUNDLED_ONLY and name != 'bundled':
+                continue
+            # 시간은 최소값, 메모리는 최대값
+            runs = [run_stage(stage, root) for _ in range(repeat)]
+            best = min(runs, key=lambda r: r['seconds'])
+            results.append({
+                'dataset': name, 'stage': stage, 'seconds': best['seconds'], 'rows': best['rows'],
+                'units': best['units'], 'rows_per_s': best['rows'] / best['seconds'],
+                'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+                'stage_rss_mb': max(r['stage_rss_mb'] for r in runs),
+                **{k: v for k, v in best.items() if k.endswith('_seconds')},
+            })
+            r = results[-1]
+            print(f"[INFO] {name:11s} {stage:10s} {r['seconds'] * 1000:9.1f} ms  {r['rows_per_s']:12,.0f} rows/s  "
+                  f"{r['peak_rss_mb']:7.1f} MB")
+
+    commit, dirty = git_commit()
+    report = {'format': FORMAT_VERSION, 'commit': commit, 'dirty': dirty,
+              'created_at': timer.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': repeat,
+              'machine': machine_info(), 'results': results}
+    if os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        compare(results, baseline, tolerance)
+        report['baseline'] = {'commit': baseline['commit'], 'dirty': baseline['dirty'], 'tolerance': tolerance}
+    check_budgets(results)
+
+    os.makedirs(RESULT_DIR, exist_ok=True)
+    out_path = os.path.join(RESULT_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    # 같은 커밋의 이전 결과 중 이번에 돌리지 않은 (데이터셋, 단계) 는 남김
+    if os.path.exists(out_path):
+        with open(out_path, encoding='utf-8') as f:
+            done = {(r['dataset'], r['stage']) for r in results}
+            report['results'] = [r for r in json.load(f)['results'] if (r['dataset'], r['stage']) not in done] + results
+    from storage import atomic_write
+    for path in [out_path] + ([baseline_path] if save_baseline else []):
+        atomic_write(path, lambda f: json.dump(report, f, ensure_ascii=False, indent=2), mode='w')
+
+    table = pd.DataFrame(results)
+    print()
+    print(table.drop(columns=['units']).to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    print(f"\n[INFO] 결과 → {out_path}" + (f" (baseline 으로도 저장 → {baseline_path})" if save_baseline else ''))
+    regressed = [r for r in results if r.get('regression') or r.get('over_budget')]
+    for r in regressed:
+        if r.get('regression'):
+            print(f"[WARN] 회귀: {r['dataset']} / {r['stage']} {r['base_seconds'] * 1000:.1f} → {r['seconds'] * 1000:.1f} ms "
+                  f"({r['change']:+.0%})")
+        if r.get('over_budget'):
+            print(f"[WARN] 상한 초과: {r['dataset']} / {r['stage']} {r['seconds'] * 1000:.1f} ms "
+                  f"(상한 {r['budget'] * 1000:.0f} ms)")
+    if 'baseline' in report:
+        print(f"[INFO] baseline {report['baseline']['commit']} 대비 회귀 {len(regressed)}개 (허용 {tolerance:.0%})")
+    return len(regressed)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '_stage':
+        stage_main(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='전처리 / summary / 판정 단계별 벤치마크')
+    parser.add_argument('--datasets', default='bundled,synth_x10', help=f"쉼표 구분 ({', '.join(DATASETS)})")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"쉼표 구분 ({', '.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3, help='단계별 반복 횟수 (시간은 최소값)')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='baseline 대비 허용 증가 비율')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='이번 결과를 baseline 으로 저장')
+    parser.add_argument('--rebuild', action='store_true', help='데이터셋 다시 만들기')
+    args = parser.parse_args()
+
+    for name in args.datasets.split(','):
+        if name not in DATASETS:
+            parser.error(f'알 수 없는 데이터셋: {name}')
+    for stage in args.stages.split(','):
+        if stage not in STAGES:
+            parser.error(f'알 수 없는 단계: {stage}')
+    n_regressed = main(args.datasets.split(','), args.stages.split(','), args.repeat, args.tolerance,
+                       args.baseline, args.save_baseline, args.rebuild)
+    sys.exit(1 if n_regressed else 0)
@@ -0,0 +1,71 @@
+import glob
+import os
+import time as timer
+import numpy as np
+import pandas as pd
+from sklearn.metrics import confusion_matrix
+from anomaly import detect_files
+from storage import read_run
+
+### matrix.py 파일별 판정 (merge + groupby) vs 일괄 판정 (anomaly.detect_files) 비교
+# 같은 set 에 대해 run 별 이상 bin 수와 confusion matrix 가 같은지 확인하고 시간을 잰다.
+
+base_dir = 'data'
+
+
+# 기존 matrix.detect_anomaly (비교용)
+def legacy_detect_anomaly(file_path, summary_df, bin_size=0.3, upper_bin_size=30):
+    df = read_run(file_path)
+    df['position_bin_0.3'] = (df['position'] / bin_size).apply(np.floor) * bin_size
+    df['position_bin_30'] = (df['position'] / upper_bin_size).apply(np.floor) * upper_bin_size
+    merged = pd.merge(df, summary_df, left_on='position_bin_30', right_on='position_bin_gyro', how='inner')
+    merged['is_anomaly'] = merged['gyro'] > merged['upper_bound_gyro']
+    anomaly_count = merged.groupby('position_bin_0.3')['is_anomaly'].sum()
+    total_count = merged.groupby('position_bin_0.3')['is_anomaly'].count()
+    anomaly_ratio = anomaly_count / total_count
+    anomaly_bins = anomaly_ratio[anomaly_ratio >= 0.7]
+    return len(anomaly_bins) > 0, len(anomaly_bins)
+
+
+def compare(name, normal_files, abnormal_files, summary_df):
+    file_list = normal_files + abnormal_files
+
+    start = timer.perf_counter()
+    legacy = [legacy_detect_anomaly(f, summary_df) for f in file_list]
+    t_legacy = timer.perf_counter() - start
+
+    start = timer.perf_counter()
+    batch = detect_files(file_list, summary_df)
+    t_batch = timer.perf_counter() - start
+
+    for f, (detected, n_bins), r in zip(file_list, legacy, batch):
+        assert (detected, n_bins) == (r['detected'], r['anomaly_bins']), (f, (detected, n_bins), r)
+
+    y_true = [0] * len(normal_files) + [1] * len(abnormal_files)
+    cm_legacy = confusion_matrix(y_true, [d for d, _ in legacy], labels=[0, 1])
+    cm_batch = confusion_matrix(y_true, [r['detected'] for r in batch], labels=[0, 1])
+    assert np.array_equal(cm_legacy, cm_batch)
+
+    print(f"[{name}] {len(file_list)} runs, confusion matrix {cm_batch.tolist()} (일치)")
+    print(f"  파일별 merge : {t_legacy * 1000:8.1f} ms")
+    print(f"  일괄 판정    : {t_batch * 1000:8.1f} ms  (x{t_legacy / t_batch:.1f})")
+
+
+def main():
+    summary_files = sorted(glob.glob(os.path.join(base_dir, 'normal', 'summary', 'summary_gyro_set[0-5].csv')))
+    summary_df = pd.concat([read_run(f) for f in summary_files], ignore_index=True)
+
+    # matrix.py 와 같은 검증 set
+    compare('set6 / set13',
+            sorted(glob.glob(os.path.join(base_dir, 'normal', 'set6', 'normal_*.csv'))),
+            sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set13', 'anomal_*.csv'))),
+            summary_df)
+    # 전체 set
+    compare('all sets',
+            sorted(glob.glob(os.path.join(base_dir, 'normal', 'set*', 'normal_*.csv'))),
+            sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set*', 'anomal_*.csv'))),
+            summary_df)
+
+
+if __name__ == "__main__":
+    main()
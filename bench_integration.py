@@ -0,0 +1,75 @@
+import glob
+import os
+import time as timer
+import numpy as np
+import pandas as pd
+from integration import estimate_position, estimate_position_batch
+
+### 기존 for 루프 적분 vs 벡터화 적분 시간 비교
+# 대상: data/*/set*/raw_*.csv
+
+base_dir = 'data'
+
+
+# 기존 analyze_and_save 의 적분 코드 (비교용)
+def legacy_position(time, accel_y):
+    accel = accel_y * 9.81
+    dt = np.diff(time)
+    total_distance = 2.19
+    total_time = time[-1] - time[0]
+
+    velocity_temp = np.zeros_like(accel)
+    for i in range(1, len(accel)):
+        velocity_temp[i] = velocity_temp[i-1] + 0.5 * (accel[i-1] + accel[i]) * dt[i-1]
+
+    initial_velocity = total_distance / total_time - np.mean(velocity_temp)
+    velocity = velocity_temp + initial_velocity
+
+    position = np.zeros_like(time)
+    for i in range(1, len(time)):
+        position[i] = position[i-1] + 0.5 * (velocity[i-1] + velocity[i]) * dt[i-1]
+
+    position = position * (219 / position[-1])
+    return velocity, position
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        func()
+        best = min(best, timer.perf_counter() - start)
+    return best
+
+
+def main(repeat=5):
+    file_list = sorted(glob.glob(os.path.join(base_dir, '*', 'set*', 'raw_*.csv')))
+    runs = []
+    for file_path in file_list:
+        df = pd.read_csv(file_path, usecols=['time', 'accel_y'])
+        runs.append((df['time'].to_numpy(), df['accel_y'].to_numpy()))
+    times = [t for t, _ in runs]
+    accels = [a for _, a in runs]
+    n_rows = sum(len(t) for t in times)
+    print(f"[INFO] {len(runs)} runs, {n_rows} rows")
+
+    # 결과 일치 확인
+    batch_velocity, batch_position = estimate_position_batch(times, accels)
+    for i, (t, a) in enumerate(runs):
+        v_old, p_old = legacy_position(t, a)
+        v_new, _, p_new = estimate_position(t, a)
+        assert np.array_equal(v_old, v_new) and np.array_equal(p_old, p_new), file_list[i]
+        assert np.allclose(p_old, batch_position[i], rtol=1e-9, atol=1e-9), file_list[i]
+    print("[INFO] 결과 일치: loop == vectorized (bitwise), loop ≈ batch (1e-9)")
+
+    t_loop = best_of(lambda: [legacy_position(t, a) for t, a in runs], repeat)
+    t_vec = best_of(lambda: [estimate_position(t, a) for t, a in runs], repeat)
+    t_batch = best_of(lambda: estimate_position_batch(times, accels), repeat)
+
+    print(f"for 루프      : {t_loop * 1000:8.2f} ms")
+    print(f"벡터화 (run별) : {t_vec * 1000:8.2f} ms  (x{t_loop / t_vec:.1f})")
+    print(f"벡터화 (batch) : {t_batch * 1000:8.2f} ms  (x{t_loop / t_batch:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import glob
+import os
+import shutil
+import tempfile
+import time as timer
+import pandas as pd
+from storage import read_run
+
+### pd.read_csv vs 컬럼형 캐시(read_run) 로딩 시간 비교
+# 대상: data/*/set* 의 모든 CSV (set 단위로 전부 읽는 시간)
+
+base_dir = 'data'
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        func()
+        best = min(best, timer.perf_counter() - start)
+    return best
+
+
+def main(repeat=5):
+    file_list = sorted(glob.glob(os.path.join(base_dir, '*', 'set*', '*.csv')))
+    size_mb = sum(os.path.getsize(f) for f in file_list) / 1e6
+    print(f"[INFO] {len(file_list)} files, {size_mb:.1f} MB CSV")
+
+    # 벤치마크용 임시 캐시 폴더 (실제 data/.cache 는 건드리지 않음)
+    cache_dir = tempfile.mkdtemp(prefix='bench_cache_')
+    try:
+        start = timer.perf_counter()
+        for f in file_list:
+            read_run(f, cache_dir=cache_dir)
+        t_build = timer.perf_counter() - start
+
+        # 캐시 결과가 CSV 와 같은지 확인
+        for f in file_list:
+            pd.testing.assert_frame_equal(read_run(f, cache_dir=cache_dir), pd.read_csv(f))
+
+        t_csv = best_of(lambda: [pd.read_csv(f) for f in file_list], repeat)
+        t_cache = best_of(lambda: [read_run(f, cache_dir=cache_dir) for f in file_list], repeat)
+        cache_mb = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(cache_dir) for name in names) / 1e6
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"pd.read_csv        : {t_csv * 1000:8.1f} ms")
+    print(f"캐시 생성 (최초 1회) : {t_build * 1000:8.1f} ms")
+    print(f"read_run (캐시)     : {t_cache * 1000:8.1f} ms  ({t_cache / t_csv * 100:.0f}% of read_csv)")
+    print(f"캐시 크기           : {cache_mb:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
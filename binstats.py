@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+### bin 별 통계 커널 (groupby + lambda 대신)
+# (key, 값) 으로 한 번만 정렬한 뒤 모든 bin 의 개수/평균/최소/최대/분위수를 배열 연산으로 계산한다.
+# 분위수는 pandas 기본(linear) 과 같은 방식으로 보간한다.
+# summary 를 만드는 코드(data_add.py, data_demo_add.py 등)는 모두 이 함수를 쓴다.
+
+# 판정용 IQR 상한선 배수 (upper_bound_gyro = Q3 + k * IQR) - data_add / baseline / sweep 이 이 값을 씀
+# (data_demo_add 그래프의 IQR 선은 따로 1.5, --iqr-multiplier 로 바꿀 수 있음)
+IQR_MULTIPLIER = 2.5
+
+
+def iqr_upper_bound(q1, q3, multiplier=IQR_MULTIPLIER):
+    return q3 + multiplier * (q3 - q1)
+
+
+# keys: {열 이름: 배열} (예: {'set_name': ..., 'position_bin': ...}) - 넣은 순서대로 정렬 키
+# values: 통계를 낼 값 배열
+# quantiles: 계산할 분위수 (결과 열 이름은 q25, q75 처럼 백분위)
+# 반환: key 열 + count, mean, std, min, max, q.. 열을 가진 DataFrame (key 오름차순, std 는 pandas 와 같은 ddof=1)
+def binned_stats(keys, values, quantiles=(0.25, 0.75)):
+    values = np.asarray(values, dtype=float)
+    key_arrays = {}
+    key_codes = []
+    for name, key in keys.items():
+        key = np.asarray(key)
+        # 문자열 key 는 정렬된 코드로 바꿔서 정렬
+        if key.dtype.kind in 'OUS':
+            codes, uniques = pd.factorize(key, sort=True)
+            key_arrays[name] = (codes, np.asarray(uniques))
+            key_codes.append(codes)
+        else:
+            key = key.astype(float)
+            key_arrays[name] = (key, None)
+            key_codes.append(key)
+
+    # groupby 와 같이 key 가 NaN 인 행과 NaN 값은 제외
+    ok = ~np.isnan(values)
+    for codes in key_codes:
+        ok &= ~np.isnan(codes) if codes.dtype.kind == 'f' else codes >= 0
+    values = values[ok]
+    key_codes = [codes[ok] for codes in key_codes]
+
+    # 1. 한 번 정렬 (마지막 key 가 가장 우선 → 순서 뒤집어서 넣음, 값은 가장 하위)
+    order = np.lexsort([values] + key_codes[::-1])
+    raw_values = values
+    values = values[order]
+    key_codes = [codes[order] for codes in key_codes]
+
+    # 2. 그룹 경계
+    n = len(values)
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+        for codes in key_codes:
+            change[1:] |= codes[1:] != codes[:-1]
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, n))
+
+    result = {}
+    for (name, (_, uniques)), codes in zip(key_arrays.items(), key_codes):
+        group_codes = codes[starts]
+        result[name] = uniques[group_codes] if uniques is not None else group_codes
+
+    # 3. 통계 (정렬돼 있으므로 최소/최대는 양 끝값)
+    # 평균/표준편차는 원래 행 순서로 pandas groupby 에 맡김 (합산 순서가 같아야 commit 된 summary 와 끝자리까지 같음)
+    result['count'] = counts
+    group_ids = np.empty(n, dtype=np.int64)
+    group_ids[order] = np.cumsum(change) - 1
+    grouped = pd.Series(raw_values).groupby(group_ids, sort=True)
+    result['mean'] = grouped.mean().to_numpy() if n else np.empty(0)
+    result['std'] = grouped.std().to_numpy() if n else np.empty(0)
+    result['min'] = values[starts]
+    result['max'] = values[starts + counts - 1]
+
+    for q in quantiles:
+        pos = q * (counts - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, counts - 1)
+        frac = pos - lo
+        v_lo = values[starts + lo]
+        v_hi = values[starts + hi]
+        result[f'q{round(q * 100):g}'] = v_lo + (v_hi - v_lo) * frac
+
+    return pd.DataFrame(result)
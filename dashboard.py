@@ -1,21 +1,27 @@
-import qrcode
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from io import BytesIO
-from PIL import Image
 import os
-import glob
 import zipfile
+import hashlib
+from functools import partial
 from io import BytesIO
+from storage import file_hash, files_signature
+from uploads import UploadPool, expand_uploads, prepare_uploads
+
+# 첫 화면까지 필요한 것만 import (bench.py startup 단계에서 시간 / import 된 모듈 확인)
+# - matplotlib / plotly.express / PIL 은 쓰지 않음, qrcode 는 QR 파일이 없을 때만
+# - gyro.py / pitch.py 는 선택한 탭 것만 (맨 아래)
 
-# QR코드 생성
+# QR코드 생성 (파일이 없을 때만 만들어서 저장 - 있으면 qrcode 를 import 하지 않음)
 url = "https://xhwhdtjf-b7n87zyelbtmnhzzjlp6kq.streamlit.app/"
-img = qrcode.make(url)
-img.save("qr_code.png")
+QR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qr_code.png")  # 이 파일 옆 (작업 폴더와 무관)
+
+@st.cache_resource(show_spinner=False)
+def make_qr_code(url, path=QR_PATH):
+    import qrcode
+    qrcode.make(url).save(path)
+
+if not os.path.exists(QR_PATH):
+    make_qr_code(url)
 
 
 st.set_page_config(layout="wide")
@@ -49,15 +55,29 @@ analysis_option = st.radio("✅ 분석 항목을 선택하세요", ["Gyro", "Pit
 # 사이드바
 
 # 모의 데이터 다운로드 버튼
-def make_zip_from_files(file_paths):
+# ZIP 은 버튼을 처음 누를 때 만들고, 원본 파일 내용 해시로 캐시해서 다음부터는 메모리에서 바로 보냄
+# (rerun 마다 파일을 다시 읽지 않음 - 파일 mtime/size 가 바뀌었을 때만 해시 다시 계산)
+@st.cache_data(show_spinner=False)
+def files_content_hash(signature):
+    h = hashlib.sha1()
+    for file_path, _, _ in signature:
+        h.update(os.path.basename(file_path).encode("utf-8"))
+        h.update(file_hash(file_path).encode("utf-8"))
+    return h.hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_zip(file_paths, content_hash):
     zip_buffer = BytesIO()
     with zipfile.ZipFile(zip_buffer, "w") as zf:
         for file_path in file_paths:
             file_name = os.path.basename(file_path)
             with open(file_path, "rb") as f:
                 zf.writestr(file_name, f.read())
-    zip_buffer.seek(0)
-    return zip_buffer
+    return zip_buffer.getvalue()
+
+def make_zip_from_files(file_paths):
+    file_paths = tuple(file_paths)
+    return build_zip(file_paths, files_content_hash(files_signature(file_paths)))
 
 # 경로 설정
 normal_dir = "data/normal/set6"
@@ -76,84 +96,75 @@ anomal_2_files = [os.path.join(anomal_dir, f"anomal_{i}.csv") for i in [140, 141
 st.sidebar.subheader("\U0001F4C1 데이터 다운로드")
 
 # 버튼 1: normal_1.zip
-zip_buffer = make_zip_from_files(normal_1_files)
 st.sidebar.download_button(
     label="⬇️ 정상 데이터 1",
-    data=zip_buffer,
+    data=partial(make_zip_from_files, normal_1_files),
     file_name="normal_1.zip",
     mime="application/zip"
 )
 
 # 버튼 2: normal_2.zip
-zip_buffer = make_zip_from_files(normal_2_files)
 st.sidebar.download_button(
     label="⬇️ 정상 데이터 2",
-    data=zip_buffer,
+    data=partial(make_zip_from_files, normal_2_files),
     file_name="normal_2.zip",
     mime="application/zip"
 )
 
 # 버튼 3: anomal_1.zip
-zip_buffer = make_zip_from_files(anomal_1_files)
 st.sidebar.download_button(
     label="⬇️ 이상 데이터 1",
-    data=zip_buffer,
+    data=partial(make_zip_from_files, anomal_1_files),
     file_name="anomal_1.zip",
     mime="application/zip"
 )
 
 # 버튼 4: anomal_2.zip
-zip_buffer = make_zip_from_files(anomal_2_files)
 st.sidebar.download_button(
     label="⬇️ 이상 데이터 2",
-    data=zip_buffer,
+    data=partial(make_zip_from_files, anomal_2_files),
     file_name="anomal_2.zip",
     mime="application/zip"
 )
 
 
 # 데이터 업로드
-# 데이터 업로드
-def process_uploaded_file(uploaded_file):
-    import pandas as pd
-    
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file)
-        return [df]
-    elif uploaded_file.name.endswith('.xlsx'):
-        df = pd.read_excel(uploaded_file)
-        return [df]
-    elif uploaded_file.name.endswith('.zip'):
-        import zipfile
-        from io import BytesIO
-        dfs = []
-        with zipfile.ZipFile(BytesIO(uploaded_file.read())) as z:
-            for filename in z.namelist():
-                if filename.endswith('.csv'):
-                    with z.open(filename) as f:
-                        dfs.append(pd.read_csv(f))
-                elif filename.endswith('.xlsx'):
-                    with z.open(filename) as f:
-                        dfs.append(pd.read_excel(f))
-        return dfs
-    else:
-        return []
+# 전처리된 CSV 는 그대로, 휴대폰 원본(time, accel_y, gyro_*, roll, pitch) 은 프로세스 풀에서 전처리
+# ZIP 안의 CSV/XLSX 도 같이 처리. 이미 처리한 파일(내용 해시)은 세션 동안 다시 처리하지 않음
+# 풀은 프로세스당 하나 (작업 프로세스가 죽으면 UploadPool 이 새로 만듦)
+@st.cache_resource(show_spinner=False)
+def get_upload_pool():
+    return UploadPool()
 
 
 st.sidebar.markdown("---")
 st.sidebar.header("\U0001F4C2 데이터 업로드")
 uploaded_files = st.sidebar.file_uploader(
-    "센서 데이터를 업로드하세요", 
-    type=["csv"], 
+    "센서 데이터를 업로드하세요 (전처리된 CSV 또는 원본 CSV/XLSX, ZIP)", 
+    type=["csv", "xlsx", "zip"], 
     accept_multiple_files=True
 )
-dfs_uploaded = [pd.read_csv(f) for f in uploaded_files] if uploaded_files else None
 
+dfs_uploaded = None
+if uploaded_files:
+    entries, unreadable = expand_uploads((f.name, f.getvalue()) for f in uploaded_files)
+    processed_cache = st.session_state.setdefault('processed_uploads', {})
+    progress_bar = st.sidebar.progress(0.0, text="원본 데이터 전처리 중...")
+
+    def update_progress(done, total):
+        progress_bar.progress(done / total, text=f"원본 데이터 전처리 중... ({done}/{total})")
+
+    dfs_uploaded, skipped = prepare_uploads(entries, get_upload_pool(), processed_cache, update_progress)
+    skipped = unreadable + skipped
+    progress_bar.empty()
+    if skipped:
+        st.sidebar.warning(f"처리할 수 없는 파일 {len(skipped)}개: {', '.join(skipped)}")
+    dfs_uploaded = dfs_uploaded or None
 
-from gyro import show_gyro
-from pitch import show_pitch
 
 if analysis_option == "Gyro":
+    from gyro import show_gyro
     show_gyro(uploaded_data=dfs_uploaded)  # 없으면 None 전달됨
 elif analysis_option == "Pitch":
+    from pitch import show_pitch
     show_pitch(uploaded_data=dfs_uploaded)
\ No newline at end of file
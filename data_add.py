@@ -1,64 +1,100 @@
+import argparse
 import pandas as pd
 import os
 import glob
-import matplotlib.pyplot as plt
+import time
+import tracemalloc
+from diagnostics import MODES, ArtifactRenderer
+from instrument import span, traced
+from baseline_model import MODEL_PATH, build_model
+from binstats import IQR_MULTIPLIER, binned_stats, iqr_upper_bound
+from pyramid import PYRAMID_PATH, build_pyramid, source_files
+from storage import read_run
+
+### 정상 데이터 set 별 요약 통계 (summary_gyro_setN.csv / summary_pitch_tilt_setN.csv)
+# 모든 set 의 run 을 한 번씩만 읽고, (set, position_bin) 별 통계를 binstats 로 한 번에 계산한다.
+# 그래프도 이미 읽은 DataFrame 으로 그린다 (다시 읽지 않음).
 
 # === 기본 설정 ===
 base_dir = 'data'
 data_type = 'normal'
-folder = os.path.join(base_dir, data_type)
-summary_save_dir = os.path.join(folder, "summary")
-os.makedirs(summary_save_dir, exist_ok=True)
-set_folders = sorted(glob.glob(os.path.join(folder, 'set0')))
 
 bin_size_gyro = 10
 bin_size_pitch_tilt = 1
-
-# === 반복 시작 ===
-plt. figure(figsize=(6,5))
-for set_folder in set_folders:
-    set_name = os.path.basename(set_folder)
-    csv_files = sorted(glob.glob(os.path.join(set_folder, 'normal_*.csv')))
-
-    combined_df = pd.DataFrame()
-    for file_path in csv_files:
-        df = pd.read_csv(file_path)
-        combined_df = pd.concat([combined_df, df], ignore_index=True)
-
-    if combined_df.empty:
-        print(f'Warning: {set_name} has no data. Skipping...')
-        continue
-
-    required_cols = ['position', 'gyro', 'cumulative_pitch', 'tilt']
-    if not all(col in combined_df.columns for col in required_cols):
-        print(f'Warning: {set_name} is missing required columns. Skipping...')
-        continue
+required_cols = ['position', 'gyro', 'cumulative_pitch', 'tilt']
+
+
+# === set 별 run 읽기 (파일당 1번) ===
+# 반환: {set_name: [(base_name, df), ...]}
+@traced('load_sets')
+def load_sets(folder, set_pattern='set*'):
+    sets = {}
+    for set_folder in sorted(glob.glob(os.path.join(folder, set_pattern))):
+        set_name = os.path.basename(set_folder)
+        csv_files = sorted(glob.glob(os.path.join(set_folder, f'{data_type}_*.csv')))
+        runs = []
+        for file_path in csv_files:
+            df = read_run(file_path)
+            runs.append((os.path.basename(file_path).split('.')[0], df))
+
+        if not runs:
+            print(f'Warning: {set_name} has no data. Skipping...')
+            continue
+        if not all(all(col in df.columns for col in required_cols) for _, df in runs):
+            print(f'Warning: {set_name} is missing required columns. Skipping...')
+            continue
+        sets[set_name] = runs
+    return sets
+
+
+# === 요약 통계 계산 (전체 set 한번에) ===
+# 반환: {set_name: (summary_gyro, summary_pitch_tilt)}
+@traced('build_summaries')
+def build_summaries(sets, iqr_multiplier=IQR_MULTIPLIER):
+    if not sets:
+        return {}
+    combined_df = pd.concat(
+        [df[required_cols].assign(set_name=set_name) for set_name, runs in sets.items() for _, df in runs],
+        ignore_index=True,
+    )
 
     # === Binning ===
     combined_df['position_bin_gyro'] = (combined_df['position'] / bin_size_gyro).round() * bin_size_gyro
     combined_df['position_bin_pitch_tilt'] = (combined_df['position'] / bin_size_pitch_tilt).round() * bin_size_pitch_tilt
 
-    # === 요약 통계 계산 ===
-    summary_gyro = combined_df.groupby('position_bin_gyro').agg(
-        mean_gyro=('gyro', 'mean'),
-        q1_gyro=('gyro', lambda x: x.quantile(0.25)),
-        q3_gyro=('gyro', lambda x: x.quantile(0.75))
-    ).reset_index()
-    summary_gyro['iqr_gyro'] = summary_gyro['q3_gyro'] - summary_gyro['q1_gyro']
-    summary_gyro['upper_bound_gyro'] = summary_gyro['q3_gyro'] + 2.5 * summary_gyro['iqr_gyro']
-    summary_gyro = summary_gyro.drop(columns=['q1_gyro', 'q3_gyro', 'iqr_gyro'])
-
-    summary_pitch_tilt = combined_df.groupby('position_bin_pitch_tilt').agg(
-        mean_pitch=('cumulative_pitch', 'mean'),
-        mean_tilt=('tilt', 'mean')
-    ).reset_index()
-
-    # === 1. Gyro Plot ===    
-    for file_path in csv_files:
-        df = pd.read_csv(file_path)
+    # bin 별 통계는 binstats 커널로 (정렬 1번, lambda 없음)
+    set_names = combined_df['set_name'].to_numpy()
+    gyro_stats = binned_stats({'set_name': set_names, 'position_bin_gyro': combined_df['position_bin_gyro'].to_numpy()},
+                              combined_df['gyro'].to_numpy(), quantiles=(0.25, 0.75))
+    summary_gyro = pd.DataFrame({
+        'set_name': gyro_stats['set_name'],
+        'position_bin_gyro': gyro_stats['position_bin_gyro'],
+        'mean_gyro': gyro_stats['mean'],
+        'upper_bound_gyro': iqr_upper_bound(gyro_stats['q25'], gyro_stats['q75'], iqr_multiplier),
+    })
+
+    pitch_tilt_keys = {'set_name': set_names, 'position_bin_pitch_tilt': combined_df['position_bin_pitch_tilt'].to_numpy()}
+    pitch_stats = binned_stats(pitch_tilt_keys, combined_df['cumulative_pitch'].to_numpy(), quantiles=())
+    tilt_stats = binned_stats(pitch_tilt_keys, combined_df['tilt'].to_numpy(), quantiles=())
+    summary_pitch_tilt = pitch_stats[['set_name', 'position_bin_pitch_tilt', 'mean']].rename(columns={'mean': 'mean_pitch'}).merge(
+        tilt_stats[['set_name', 'position_bin_pitch_tilt', 'mean']].rename(columns={'mean': 'mean_tilt'}),
+        on=['set_name', 'position_bin_pitch_tilt'], how='outer')
+
+    summaries = {}
+    for set_name in sets:
+        gyro = summary_gyro[summary_gyro['set_name'] == set_name].drop(columns='set_name').reset_index(drop=True)
+        pitch_tilt = summary_pitch_tilt[summary_pitch_tilt['set_name'] == set_name].drop(columns='set_name').reset_index(drop=True)
+        summaries[set_name] = (gyro, pitch_tilt)
+    return summaries
+
+
+# === 1. Gyro Plot ===
+def plot_gyro(set_name, runs, summary_gyro):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(6, 5))
+    for _, df in runs:
         plt.plot(df['position'], df['gyro'], linewidth=0.5, alpha=0.8)
 
-
     plt.plot(summary_gyro['position_bin_gyro'], summary_gyro['mean_gyro'], color='red', linewidth=1, label='Mean Gyro')
     plt.plot(summary_gyro['position_bin_gyro'], summary_gyro['upper_bound_gyro'], color='orange', linestyle='--', linewidth=1, label='IQR Upper Bound')
 
@@ -69,14 +105,16 @@ for set_folder in set_folders:
     plt.grid(True)
     plt.tight_layout()
     plt.ylim(0, 1.0)
-    plt.close()
+    return fig
+
+
+# === 2. Cumulative Pitch / 3. Tilt Plot ===
+def plot_pitch_tilt(set_name, runs, summary_pitch_tilt):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(12, 10))
 
-    # === 2. Cumulative Pitch Plot ===
-    plt. figure(figsize=(12,10))
-    
     plt.subplot(2, 1, 1)
-    for file_path in csv_files:
-        df = pd.read_csv(file_path)
+    for _, df in runs:
         plt.plot(df['position'], df['cumulative_pitch'], linewidth=0.5, alpha=0.5)
 
     plt.plot(summary_pitch_tilt['position_bin_pitch_tilt'], summary_pitch_tilt['mean_pitch'], color='red', linewidth=2.5, label='Mean Cumulative Pitch')
@@ -89,10 +127,8 @@ for set_folder in set_folders:
     plt.tight_layout()
     plt.ylim(-0.1, 0.1)
 
-    # === 3. Tilt Plot ===
     plt.subplot(2, 1, 2)
-    for file_path in csv_files:
-        df = pd.read_csv(file_path)
+    for _, df in runs:
         plt.plot(df['position'], df['tilt'], linewidth=0.5, alpha=0.5)
 
     plt.plot(summary_pitch_tilt['position_bin_pitch_tilt'], summary_pitch_tilt['mean_tilt'], color='red', linewidth=2.5, label='Mean Tilt')
@@ -104,12 +140,74 @@ for set_folder in set_folders:
     plt.grid(True)
     plt.tight_layout()
     plt.ylim(0, 0.1)
-    
-    plt.tight_layout()
-    plt.show()
 
-    # === 파일 저장 ===
-    summary_gyro.to_csv(os.path.join(summary_save_dir, f"summary_gyro_{set_name}.csv"), index=False)
-    summary_pitch_tilt.to_csv(os.path.join(summary_save_dir, f"summary_pitch_tilt_{set_name}.csv"), index=False)
-
-    print(f"[INFO] 저장 완료: summary_gyro_{set_name}.csv, summary_pitch_tilt_{set_name}.csv")
+    plt.tight_layout()
+    return fig
+
+
+# mode: diagnostics.MODES 참고 (interactive 는 원래처럼 pitch/tilt 그래프만 띄움)
+def main(set_pattern='set*', mode='interactive', artifact_dir=os.path.join(base_dir, 'artifacts'),
+         iqr_multiplier=IQR_MULTIPLIER):
+    folder = os.path.join(base_dir, data_type)
+    summary_save_dir = os.path.join(folder, "summary")
+    os.makedirs(summary_save_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    # instrument.py 가 memory 모드로 이미 추적 중이면 시작 / 정지는 그쪽에 맡김
+    own_tracing = not tracemalloc.is_tracing()
+    if own_tracing:
+        tracemalloc.start()
+
+    with span('data_add', sets=set_pattern) as run:
+        sets = load_sets(folder, set_pattern)
+        summaries = build_summaries(sets, iqr_multiplier)
+
+        # === 파일 저장 ===
+        with span('write_summary'):
+            for set_name, (summary_gyro, summary_pitch_tilt) in summaries.items():
+                summary_gyro.to_csv(os.path.join(summary_save_dir, f"summary_gyro_{set_name}.csv"), index=False)
+                summary_pitch_tilt.to_csv(os.path.join(summary_save_dir, f"summary_pitch_tilt_{set_name}.csv"), index=False)
+                print(f"[INFO] 저장 완료: summary_gyro_{set_name}.csv, summary_pitch_tilt_{set_name}.csv")
+
+        # 같은 run 으로 다해상도 피라미드도 미리 저장 (지금은 sweep.py 가 10cm Q1/Q3 를 읽음, 약 0.3초)
+        # gyro.py / pitch.py / matrix.py 는 아직 summary / baseline 모델을 직접 다시 묶음
+        if set_pattern == 'set*':
+            with span('pyramid'):
+                build_pyramid(sets, sources=source_files(folder)).save(PYRAMID_PATH)
+            print(f"[INFO] 저장 완료: {os.path.basename(PYRAMID_PATH)}")
+            # 대시보드 / matrix.py 용 baseline 모델 (set0~5)
+            with span('baseline_model'):
+                model = build_model(iqr_multiplier=iqr_multiplier)
+            print(f"[INFO] 저장 완료: {os.path.basename(MODEL_PATH)} (baseline {model.version})")
+
+    # memory 모드에서는 안쪽 span 이 tracemalloc peak 를 reset 하므로 바깥 span 의 최대값을 씀
+    peak = run.peak_bytes if run.peak_bytes is not None else tracemalloc.get_traced_memory()[1]
+    if own_tracing:
+        tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    n_runs = sum(len(runs) for runs in sets.values())
+    print(f"[INFO] {len(summaries)} sets, {n_runs} runs: {elapsed:.2f}s, peak memory {peak / 1e6:.1f} MB")
+
+    # === 그래프 ===
+    if mode == 'interactive':
+        import matplotlib.pyplot as plt
+        for set_name, (summary_gyro, summary_pitch_tilt) in summaries.items():
+            plot_pitch_tilt(set_name, sets[set_name], summary_pitch_tilt)
+            plt.show()
+    elif mode == 'artifacts':
+        with ArtifactRenderer(artifact_dir) as renderer:
+            for set_name, (summary_gyro, summary_pitch_tilt) in summaries.items():
+                renderer.submit(plot_gyro, f'summary_gyro_{set_name}', set_name, sets[set_name], summary_gyro)
+                renderer.submit(plot_pitch_tilt, f'summary_pitch_tilt_{set_name}', set_name, sets[set_name], summary_pitch_tilt)
+
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sets', default='set*', help="set 폴더 glob (예: 'set0', 'set[0-5]')")
+    parser.add_argument('--mode', choices=MODES, default='interactive')
+    parser.add_argument('--artifact-dir', default=os.path.join(base_dir, 'artifacts'))
+    parser.add_argument('--iqr-multiplier', type=float, default=IQR_MULTIPLIER)
+    args = parser.parse_args()
+    main(args.sets, args.mode, args.artifact_dir, args.iqr_multiplier)
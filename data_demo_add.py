@@ -1,9 +1,13 @@
+import argparse
 import pandas as pd
 import os
 import glob
-import matplotlib.pyplot as plt
+from diagnostics import MODES, ArtifactRenderer
+from binstats import binned_stats, iqr_upper_bound
+from storage import read_run
 ##통합본 파일11111##
 base_dir = 'data'
+PLOT_IQR_MULTIPLIER = 1.5     # 그래프의 IQR Upper Bound 선 (판정용 binstats.IQR_MULTIPLIER 와 별개)
 
 def load_add_files(data_type):  # data_type: 'normal_add' or 'anomal_add'
     folder = os.path.join(base_dir, data_type)
@@ -19,14 +23,45 @@ def load_add_files(data_type):  # data_type: 'normal_add' or 'anomal_add'
     return sorted(file_list)
 
 
-# 1) 원하는 데이터 타입 설정
-data_type = 'normal_add'  # 또는 'anomal_add'
+# 파일마다 한 번만 읽어서 (base_name, df) 리스트로 보관
+def load_runs(file_list):
+    runs = []
+    for file_path in file_list:
+        df = read_run(file_path)
+        base_name = os.path.basename(file_path).split('.')[0]
+        runs.append((base_name, df))
+    return runs
+
+
+# 평균선 계산 (0.1이 쪼개는 단위, 더 작은 수치 대입하여 더 정교한 값 얻을 수 있음)
+# bin 별 평균/최대/최소/분위수는 binstats 커널로 한 번에 계산
+def compute_summaries(runs, bin_size=0.1, iqr_multiplier=PLOT_IQR_MULTIPLIER):
+    summaries = {}
+    for col in ['gyro', 'cumulative_pitch', 'cumulative_roll', 'tilt']:
+        frames = [df[['position', col]] for _, df in runs if col in df.columns]
+        if not frames:
+            continue
+        combined_df = pd.concat(frames, ignore_index=True)
+        combined_df['position_bin'] = (combined_df['position'] / bin_size).round() * bin_size
+        quantiles = (0.25, 0.75) if col == 'gyro' else ()
+        stats = binned_stats({'position_bin': combined_df['position_bin'].to_numpy()}, combined_df[col].to_numpy(), quantiles)
+        summaries[col] = {
+            'mean': stats[['position_bin', 'mean']].rename(columns={'mean': col}),
+            'max': stats[['position_bin', 'max']].rename(columns={'max': col}),
+            'min': stats[['position_bin', 'min']].rename(columns={'min': col}),
+        }
+        if col == 'gyro':
+            ###IQR 방식은 데이터가 한쪽으로 너무 커지면 불리함
+            summaries[col]['upper'] = pd.DataFrame({
+                'position_bin': stats['position_bin'],
+                'upper': iqr_upper_bound(stats['q25'], stats['q75'], iqr_multiplier),
+            })
+    return summaries
 
-# 2) 파일 리스트 불러오기
-file_list = load_add_files(data_type)
 
     # 그래프 1: x = position, y = gyro
 def plot_individual_graphs(df, base_name):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(10, 6))  # 그래프 크기 설정
     plt.plot(df['position'], df['gyro'], label='Gyro', color='b')
     plt.xlabel('Position')
@@ -36,7 +71,7 @@ def plot_individual_graphs(df, base_name):
     plt.grid(True)
     plt.ylim(0, 3)  # y축 범위 설정
     plt.close()
-    
+
     # 그래프 2: x = position, y = pitch
     plt.figure(figsize=(10, 6))  # 그래프 크기 설정
     plt.plot(df['position'], df['cumulative_pitch'], label='pitch', color='g')
@@ -71,191 +106,187 @@ def plot_individual_graphs(df, base_name):
     plt.close()
 
 
+# 개별 파일 시각화
+def plot_runs(plt, runs, col):
+    for base_name, df in runs:
+        if col in df.columns:
+            plt.plot(df['position'], df[col], alpha=0.35, label=f'{base_name} - {col}')
 
 
 
 ### 한번에 비교 ###
 ### 그래프 1: x = position, y = gyro
+def plot_gyro(runs, summaries):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
+    plot_runs(plt, runs, 'gyro')
 
-plt.figure(figsize=(10, 6))
-combined_df = pd.DataFrame()
-
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    if 'gyro' in df.columns:
-        combined_df = pd.concat([combined_df, df[['position', 'gyro']]], ignore_index=True)
-
-
-# 개별 파일 시각화
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    base_name = os.path.basename(file_path).split('.')[0]
-    if 'gyro' in df.columns:
-        plt.plot(df['position'], df['gyro'], alpha=0.35, label=f'{base_name} - Gyro')
-
-
-# 평균선 계산 (0.1이 쪼개는 단위, 더 작은 수치 대입하여 더 정교한 값 얻을 수 있음)
+    gyro_summary = summaries['gyro']['mean']
+    plt.plot(gyro_summary['position_bin'], gyro_summary['gyro'], color='red', linewidth=1.5, label='Mean Gyro')
 
-combined_df['position_bin'] = (combined_df['position'] / 0.1).round() * 0.1
-
-gyro_summary = combined_df.groupby('position_bin')['gyro'].mean().reset_index()
-plt.plot(gyro_summary['position_bin'], gyro_summary['gyro'], color='red', linewidth=1.5, label='Mean Gyro')
-
-# 고점 계산
-gyro_max = combined_df.groupby('position_bin')['gyro'].max().reset_index()
-plt.plot(gyro_max['position_bin'], gyro_max['gyro'], color='green', linewidth=1, label='Max Gyro')
-
-# 상한선만 계산
-def calc_iqr_upper_bound(group):
-    q1 = group.quantile(0.25)
-    q3 = group.quantile(0.75)
-    iqr = q3 - q1
-    upper = q3 + 1.5 * iqr
-    return pd.Series({'upper': upper})
-
-iqr_upper = combined_df.groupby('position_bin')['gyro'].apply(calc_iqr_upper_bound).unstack().reset_index()
-###IQR 방식은 데이터가 한쪽으로 너무 커지면 불리함
-
-# 상한선 시각화
-plt.plot(iqr_upper['position_bin'], iqr_upper['upper'], color='orange', linestyle='--', linewidth=1, label='IQR Upper Bound')
-
-# 시각화
-plt.xlabel('Position')
-plt.ylabel('Gyro')
-plt.title('Gyro vs Position with Mean, Max and IQR Bounds')
-plt.legend()
-plt.grid(True)
-plt.ylim(0, 2.5)
-plt.show()
+    # 고점 계산
+    gyro_max = summaries['gyro']['max']
+    plt.plot(gyro_max['position_bin'], gyro_max['gyro'], color='green', linewidth=1, label='Max Gyro')
 
+    # 상한선 시각화
+    iqr_upper = summaries['gyro']['upper']
+    plt.plot(iqr_upper['position_bin'], iqr_upper['upper'], color='orange', linestyle='--', linewidth=1, label='IQR Upper Bound')
 
+    # 시각화
+    plt.xlabel('Position')
+    plt.ylabel('Gyro')
+    plt.title('Gyro vs Position with Mean, Max and IQR Bounds')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(0, 2.5)
+    return fig
 
 
 ### 그래프 2: x = position, y = cumulative_pitch
-plt.figure(figsize=(10, 6))
-
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    base_name = os.path.basename(file_path).split('.')[0]
-    if 'cumulative_pitch' in df.columns:
-        plt.plot(df['position'], df['cumulative_pitch'], alpha=0.35, label=f'{base_name} - cumulative_pitch')
+def plot_pitch(runs, summaries):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
+    plot_runs(plt, runs, 'cumulative_pitch')
 
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    if 'cumulative_pitch' in df.columns:
-        combined_df = pd.concat([combined_df, df[['position', 'cumulative_pitch']]], ignore_index=True)
+    pitch_summary = summaries['cumulative_pitch']['mean']
+    plt.plot(pitch_summary['position_bin'], pitch_summary['cumulative_pitch'], color='red', linewidth=1, label='Mean Pitch')
 
-combined_df['position_bin'] = (combined_df['position'] / 0.1).round() * 0.1
-pitch_summary = combined_df.groupby('position_bin')['cumulative_pitch'].mean().reset_index()
+    # 고점 계산
+    pitch_max = summaries['cumulative_pitch']['max']
+    plt.plot(pitch_max['position_bin'], pitch_max['cumulative_pitch'], color='green', linewidth=0.7, label='Max Pitch')
 
-plt.plot(pitch_summary['position_bin'], pitch_summary['cumulative_pitch'], color='red', linewidth=1, label='Mean Pitch')
+    # 저점 계산
+    pitch_min = summaries['cumulative_pitch']['min']
+    plt.plot(pitch_min['position_bin'], pitch_min['cumulative_pitch'], color='green', linewidth=0.7, label='Min Pitch')
 
-# 고점 계산
-pitch_max = combined_df.groupby('position_bin')['cumulative_pitch'].max().reset_index()
-plt.plot(pitch_max['position_bin'], pitch_max['cumulative_pitch'], color='green', linewidth=0.7, label='Max Pitch')
-
-# 저점 계산
-pitch_min = combined_df.groupby('position_bin')['cumulative_pitch'].min().reset_index()
-plt.plot(pitch_min['position_bin'], pitch_min['cumulative_pitch'], color='green', linewidth=0.7, label='Min Pitch')
-
-# 고점-저점 음영처리
-plt.fill_between(pitch_max['position_bin'], pitch_max['cumulative_pitch'], pitch_min['cumulative_pitch'], color='green', alpha=0.1, label='Max-Min Range')
-
-
-plt.xlabel('Position')
-plt.ylabel('cumulative_pitch')
-plt.title('Pitch vs Position with Mean Line')
-plt.legend()
-plt.grid(True)
-plt.ylim(-0.3, 0.3)
-plt.show()
+    # 고점-저점 음영처리
+    plt.fill_between(pitch_max['position_bin'], pitch_max['cumulative_pitch'], pitch_min['cumulative_pitch'], color='green', alpha=0.1, label='Max-Min Range')
 
+    plt.xlabel('Position')
+    plt.ylabel('cumulative_pitch')
+    plt.title('Pitch vs Position with Mean Line')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(-0.3, 0.3)
+    return fig
 
 
 ### 그래프 3: x = position, y = cumulative_roll
-plt.figure(figsize=(10, 6))
-
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    base_name = os.path.basename(file_path).split('.')[0]
-    if 'cumulative_roll' in df.columns:
-        plt.plot(df['position'], df['cumulative_roll'], alpha=0.35, label=f'{base_name} - cumulative_roll')
-
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    if 'cumulative_roll' in df.columns:
-        combined_df = pd.concat([combined_df, df[['position', 'cumulative_roll']]], ignore_index=True)
+def plot_roll(runs, summaries):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
+    plot_runs(plt, runs, 'cumulative_roll')
 
-combined_df['position_bin'] = (combined_df['position'] / 0.1).round() * 0.1
-roll_summary = combined_df.groupby('position_bin')['cumulative_roll'].mean().reset_index()
-
-plt.plot(roll_summary['position_bin'], roll_summary['cumulative_roll'], color='green', linewidth=1, label='Mean Roll')
-
-plt.xlabel('Position')
-plt.ylabel('cumulative_roll')
-plt.title('Roll vs Position with Mean Line')
-plt.legend()
-plt.grid(True)
-plt.ylim(-0.3, 0.3)
-plt.show()
+    roll_summary = summaries['cumulative_roll']['mean']
+    plt.plot(roll_summary['position_bin'], roll_summary['cumulative_roll'], color='green', linewidth=1, label='Mean Roll')
 
+    plt.xlabel('Position')
+    plt.ylabel('cumulative_roll')
+    plt.title('Roll vs Position with Mean Line')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(-0.3, 0.3)
+    return fig
 
 
 ### 그래프 4: x = position, y = tilt
-plt.figure(figsize=(10, 6))
-
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    if 'tilt' in df.columns:
-        combined_df = pd.concat([combined_df, df[['position', 'tilt']]], ignore_index=True)
+def plot_tilt(runs, summaries):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
 
-combined_df['position_bin'] = (combined_df['position'] / 0.1).round() * 0.1
-tilt_summary = combined_df.groupby('position_bin')['tilt'].mean().reset_index()
+    tilt_summary = summaries['tilt']['mean']
+    plt.plot(tilt_summary['position_bin'], tilt_summary['tilt'], color='red', linewidth=1, label='Mean Tilt')
 
-plt.plot(tilt_summary['position_bin'], tilt_summary['tilt'], color='red', linewidth=1, label='Mean Tilt')
+    # 고점 계산
+    tilt_max = summaries['tilt']['max']
+    plt.plot(tilt_max['position_bin'], tilt_max['tilt'], color='green', linewidth=0.7, label='Max Tilt')
 
-# 고점 계산
-tilt_max = combined_df.groupby('position_bin')['tilt'].max().reset_index()
-plt.plot(tilt_max['position_bin'], tilt_max['tilt'], color='green', linewidth=0.7, label='Max Tilt')
+    plot_runs(plt, runs, 'tilt')
 
-for file_path in file_list:
-    df = pd.read_csv(file_path)
-    base_name = os.path.basename(file_path).split('.')[0]
-    if 'tilt' in df.columns:
-        plt.plot(df['position'], df['tilt'], alpha=0.35, label=f'{base_name} - tilt')
-
-plt.xlabel('Position')
-plt.ylabel('Tilt')
-plt.title('Tilt vs Position with Mean Line')
-plt.legend()
-plt.grid(True)
-plt.ylim(0, 0.3)
-plt.show()
+    plt.xlabel('Position')
+    plt.ylabel('Tilt')
+    plt.title('Tilt vs Position with Mean Line')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(0, 0.3)
+    return fig
 
 
 # pitch와 tilt 평균을 한 그래프에 시각화
-plt.figure(figsize=(10, 6))
+def plot_pitch_tilt(runs, summaries):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=(10, 6))
+
+    pitch_summary = summaries['cumulative_pitch']['mean']
+    pitch_max = summaries['cumulative_pitch']['max']
+    pitch_min = summaries['cumulative_pitch']['min']
+    tilt_summary = summaries['tilt']['mean']
 
-# pitch 평균선 시각화 (이미 계산된 pitch_summary 사용)
-plt.plot(pitch_summary['position_bin'], pitch_summary['cumulative_pitch'], label='Mean Pitch', color='green', linewidth=0.7)
+    # pitch 평균선 시각화 (이미 계산된 pitch_summary 사용)
+    plt.plot(pitch_summary['position_bin'], pitch_summary['cumulative_pitch'], label='Mean Pitch', color='green', linewidth=0.7)
 
-# pitch 고점선 시각화 (이미 계산된 pitch_max 사용)
-plt.plot(pitch_max['position_bin'], pitch_max['cumulative_pitch'], label='Max Pitch', color='green', linestyle='--', linewidth=0.7)
+    # pitch 고점선 시각화 (이미 계산된 pitch_max 사용)
+    plt.plot(pitch_max['position_bin'], pitch_max['cumulative_pitch'], label='Max Pitch', color='green', linestyle='--', linewidth=0.7)
 
-# pitch 저점선 시각화 (이미 계산된 pitch_min 사용)
-plt.plot(pitch_min['position_bin'], pitch_min['cumulative_pitch'], label='Min Pitch', color='green', linestyle='--', linewidth=0.7)
+    # pitch 저점선 시각화 (이미 계산된 pitch_min 사용)
+    plt.plot(pitch_min['position_bin'], pitch_min['cumulative_pitch'], label='Min Pitch', color='green', linestyle='--', linewidth=0.7)
 
-# pitch 고점과 저점 사이 음영 처리
-plt.fill_between(pitch_max['position_bin'], pitch_max['cumulative_pitch'], pitch_min['cumulative_pitch'], color='green', alpha=0.1)
+    # pitch 고점과 저점 사이 음영 처리
+    plt.fill_between(pitch_max['position_bin'], pitch_max['cumulative_pitch'], pitch_min['cumulative_pitch'], color='green', alpha=0.1)
 
-# tilt 평균선 시각화 (이미 계산된 tilt_summary 사용)
-plt.plot(tilt_summary['position_bin'], tilt_summary['tilt'], label='Mean Tilt', color='red', linewidth=0.7)
+    # tilt 평균선 시각화 (이미 계산된 tilt_summary 사용)
+    plt.plot(tilt_summary['position_bin'], tilt_summary['tilt'], label='Mean Tilt', color='red', linewidth=0.7)
 
-# 그래프 꾸미기
-plt.xlabel('Position')
-plt.ylabel('Cumulative Value')
-plt.title('Comparison of Mean Pitch and Mean Tilt vs Position')
-plt.legend()
-plt.grid(True)
-plt.ylim(-0.3, 0.3)
-plt.show()
\ No newline at end of file
+    # 그래프 꾸미기
+    plt.xlabel('Position')
+    plt.ylabel('Cumulative Value')
+    plt.title('Comparison of Mean Pitch and Mean Tilt vs Position')
+    plt.legend()
+    plt.grid(True)
+    plt.ylim(-0.3, 0.3)
+    return fig
+
+
+# (이름, 함수, 필요한 summary 열)
+FIGURES = [
+    ('gyro', plot_gyro, ['gyro']),
+    ('pitch', plot_pitch, ['cumulative_pitch']),
+    ('roll', plot_roll, ['cumulative_roll']),
+    ('tilt', plot_tilt, ['tilt']),
+    ('pitch_tilt', plot_pitch_tilt, ['cumulative_pitch', 'tilt']),
+]
+
+
+# mode: diagnostics.MODES 참고
+def main(data_type='normal_add', mode='interactive', artifact_dir=os.path.join(base_dir, 'artifacts'),
+         iqr_multiplier=PLOT_IQR_MULTIPLIER):
+    # 1) 파일 리스트 불러오기 + 한 번씩만 읽기
+    runs = load_runs(load_add_files(data_type))
+
+    # 2) 요약 통계
+    summaries = compute_summaries(runs, iqr_multiplier=iqr_multiplier)
+
+    # 3) 그래프 (headless 이면 만들지 않음)
+    figures = [(name, func) for name, func, cols in FIGURES if all(c in summaries for c in cols)]
+    if mode == 'interactive':
+        import matplotlib.pyplot as plt
+        for _, plot_func in figures:
+            plot_func(runs, summaries)
+            plt.show()
+    elif mode == 'artifacts':
+        with ArtifactRenderer(artifact_dir) as renderer:
+            for name, plot_func in figures:
+                renderer.submit(plot_func, f'{data_type}_{name}', runs, summaries)
+
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    # 원하는 데이터 타입 설정
+    parser.add_argument('--data-type', default='normal_add')  # 또는 'anomal_add'
+    parser.add_argument('--mode', choices=MODES, default='interactive')
+    parser.add_argument('--artifact-dir', default=os.path.join(base_dir, 'artifacts'))
+    parser.add_argument('--iqr-multiplier', type=float, default=PLOT_IQR_MULTIPLIER)
+    args = parser.parse_args()
+    main(args.data_type, args.mode, args.artifact_dir, args.iqr_multiplier)
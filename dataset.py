@@ -0,0 +1,207 @@
+import argparse
+import glob
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from storage import atomic_write, files_signature, read_run
+
+### run × position 격자 데이터셋
+# run 마다 길이와 position 간격이 달라서, 단계마다 (summary, gyro 투표, pitch 띠, matrix 판정)
+# position 을 반올림해서 다시 묶고 있음. 여기서는 모든 run 을 같은 position 격자(기본 0~219cm, 1cm)로
+# 선형 보간해서 채널별 (run 수 × 격자 수) 2차원 배열 하나로 쌓는다.
+# - 보간은 전체 run 을 (run, position) 순으로 한 번 정렬한 뒤 searchsorted 한 번으로 계산 (run 별 반복 없음)
+# - run 이 지나가지 않은 구간 (첫/마지막 position 바깥) 은 NaN
+# - position 이 되돌아가는 구간은 position 순으로 정렬해서 보간 (같은 position 은 나중 샘플)
+# 격자 위 통계는 축 방향 계산 (예: ds.channel('gyro')[ds.mask(sets=['set0'])].mean(axis=0))
+# 전체 정상/이상 run (127개 × 220칸 × 3채널) 이 float64 로 1MB 이하
+# 저장 파일에 원본 run 목록 + 크기/수정 시각 (storage.files_signature) 을 같이 기록 → load_dataset 이 바뀌었으면 다시 만듦
+
+base_dir = 'data'
+DATASET_PATH = os.path.join(base_dir, '.cache', 'dataset_grid.npz')
+FORMAT_VERSION = 1
+
+GRID_START = 0
+GRID_END = 220  # 미포함
+GRID_STEP = 1
+CHANNELS = ['gyro', 'cumulative_pitch', 'tilt']
+# (data 폴더 기준 glob, label) - 정상 0 / 이상 1
+SOURCES = [('normal/set*/normal_*.csv', 0), ('anomal/set*/anomal_*.csv', 1)]
+
+
+def make_grid(start=GRID_START, end=GRID_END, step=GRID_STEP):
+    return np.arange(start, end, step, dtype=float)
+
+
+# run_id, position, {채널: 값} (run 이 섞여 있어도 됨) → {채널: (n_runs × 격자 수) 배열}
+def resample(run_id, position, values, n_runs, grid):
+    run_id = np.asarray(run_id, dtype=np.int64)
+    position = np.asarray(position, dtype=float)
+    keep = ~np.isnan(position)
+    run_id, position = run_id[keep], position[keep]
+    order = np.lexsort((position, run_id))
+    run_id, position = run_id[order], position[order]
+    values = {col: np.asarray(v, dtype=float)[keep][order] for col, v in values.items()}
+    n_grid = len(grid)
+    if len(position) == 0:
+        return {col: np.full((n_runs, n_grid), np.nan) for col in values}
+
+    # run 경계
+    counts = np.bincount(run_id, minlength=n_runs)
+    end = np.cumsum(counts)
+    start = end - counts
+    nonempty = counts > 0
+    run_min = np.full(n_runs, np.nan)
+    run_max = np.full(n_runs, np.nan)
+    run_min[nonempty] = position[start[nonempty]]
+    run_max[nonempty] = position[end[nonempty] - 1]
+
+    # (run, position) 을 하나의 증가하는 key 로 → 모든 (run, 격자) 위치를 한 번에 찾음
+    lo = min(position.min(), grid[0])
+    span = max(position.max(), grid[-1]) - lo + 1
+    key = run_id * span + (position - lo)
+    rows = np.repeat(np.arange(n_runs), n_grid)
+    g = np.tile(grid, n_runs)
+    idx = np.searchsorted(key, rows * span + (g - lo), side='right')
+
+    last = len(position) - 1
+    left = np.clip(np.maximum(idx - 1, start[rows]), 0, last)
+    right = np.clip(np.minimum(idx, end[rows] - 1), 0, last)
+    with np.errstate(invalid='ignore'):
+        inside = (g >= run_min[rows]) & (g <= run_max[rows])
+    gap = position[right] - position[left]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = np.clip(np.where(gap > 0, (g - position[left]) / gap, 0.0), 0, 1)
+
+    arrays = {}
+    for col, v in values.items():
+        out = v[left] + w * (v[right] - v[left])
+        out[~inside] = np.nan
+        arrays[col] = out.reshape(n_runs, n_grid)
+    return arrays
+
+
+class RunDataset:
+    def __init__(self, grid, arrays, run_ids, labels, set_names, sources=None):
+        self.grid = np.asarray(grid, dtype=float)
+        self.arrays = arrays                                # {채널: (n_runs × 격자 수)}
+        self.run_ids = np.asarray(run_ids, dtype=str)       # 'normal/set0/normal_0' (data 폴더 기준, 확장자 없음)
+        self.labels = np.asarray(labels, dtype=np.int8)     # 정상 0 / 이상 1
+        self.set_names = np.asarray(set_names, dtype=str)
+        self.sources = sources                              # 만든 run 파일 signature (모르면 None)
+
+    def __len__(self):
+        return len(self.run_ids)
+
+    def channel(self, col):
+        return self.arrays[col]
+
+    # 조건에 맞는 run 행 (None 이면 조건 없음)
+    def mask(self, sets=None, label=None):
+        mask = np.ones(len(self), dtype=bool)
+        if sets is not None:
+            mask &= np.isin(self.set_names, [sets] if isinstance(sets, str) else list(sets))
+        if label is not None:
+            mask &= self.labels == label
+        return mask
+
+    def subset(self, mask):
+        return RunDataset(self.grid, {col: a[mask] for col, a in self.arrays.items()},
+                          self.run_ids[mask], self.labels[mask], self.set_names[mask])
+
+    # 격자 칸별 통계 (run 축 방향) → position + 채널별 mean_/std_/q25_/q75_ 열
+    def summary(self, sets=None, label=0, channels=None):
+        mask = self.mask(sets, label)
+        summary = {'position': self.grid}
+        for col in channels or list(self.arrays):
+            a = self.arrays[col][mask]
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # run 이 하나도 없는 칸 (NaN)
+                summary[f'mean_{col}'] = np.nanmean(a, axis=0)
+                summary[f'std_{col}'] = np.nanstd(a, axis=0, ddof=1)
+                summary[f'q25_{col}'], summary[f'q75_{col}'] = np.nanquantile(a, [0.25, 0.75], axis=0)
+        return pd.DataFrame(summary)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def save(self, path=DATASET_PATH):
+        arrays = {f'channel/{col}': a for col, a in self.arrays.items()}
+        meta = json.dumps({'format': FORMAT_VERSION, 'sources': self.sources})
+        atomic_write(path, lambda f: np.savez_compressed(f, meta=meta, grid=self.grid, run_ids=self.run_ids,
+                                                         labels=self.labels, set_names=self.set_names, **arrays))
+
+    @classmethod
+    def load(cls, path=DATASET_PATH):
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta'])) if 'meta' in npz.files else {}
+            if meta.get('format') != FORMAT_VERSION:
+                raise ValueError(f"dataset format {meta.get('format')} != {FORMAT_VERSION}")
+            arrays = {key.split('/', 1)[1]: npz[key] for key in npz.files if key.startswith('channel/')}
+            return cls(npz['grid'], arrays, npz['run_ids'], npz['labels'], npz['set_names'], meta['sources'])
+
+    # file_list: 전처리된 run CSV 목록, labels: run 별 label
+    @classmethod
+    def from_files(cls, file_list, labels, grid=None, channels=CHANNELS):
+        grid = make_grid() if grid is None else np.asarray(grid, dtype=float)
+        runs = [read_run(f, columns=['position', *channels]) for f in file_list]
+        run_id = np.repeat(np.arange(len(runs)), [len(df) for df in runs])
+
+        def stack(col):
+            return np.concatenate([df[col].to_numpy(dtype=float) for df in runs]) if runs else np.empty(0)
+
+        arrays = resample(run_id, stack('position'), {col: stack(col) for col in channels}, len(runs), grid)
+        run_ids = [os.path.splitext(os.path.relpath(f, base_dir))[0].replace(os.sep, '/') for f in file_list]
+        set_names = [os.path.basename(os.path.dirname(f)) for f in file_list]
+        return cls(grid, arrays, run_ids, labels, set_names, signature_json(file_list))
+
+
+def signature_json(file_list):
+    return [list(entry) for entry in files_signature(file_list)]
+
+
+# SOURCES 의 run 파일 목록 → (file_list, labels)
+def source_files(sources=SOURCES):
+    file_list, labels = [], []
+    for pattern, label in sources:
+        files = sorted(glob.glob(os.path.join(base_dir, pattern)))
+        file_list += files
+        labels += [label] * len(files)
+    return file_list, labels
+
+
+# SOURCES 의 run 전체로 만들기
+def build_dataset(sources=SOURCES, grid=None):
+    return RunDataset.from_files(*source_files(sources), grid)
+
+
+# 저장된 데이터셋이 지금 run 파일로 만든 것이면 읽고, 아니면 (없음 / 형식 다름 / run 바뀜) 새로 만들어 저장
+def load_dataset(path=DATASET_PATH):
+    if os.path.exists(path):
+        try:
+            dataset = RunDataset.load(path)
+            if dataset.sources == signature_json(source_files()[0]):
+                return dataset
+            print(f"[INFO] 원본 run 이 바뀌어서 데이터셋 다시 만듦: {path}")
+        except (OSError, ValueError, KeyError):
+            print(f"[INFO] 데이터셋 파일을 읽을 수 없어서 다시 만듦: {path}")
+    dataset = build_dataset()
+    dataset.save(path)
+    return dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='run × position 격자 데이터셋')
+    parser.add_argument('--path', default=DATASET_PATH)
+    parser.add_argument('--rebuild', action='store_true', help='저장된 파일 무시하고 새로 만들기')
+    parser.add_argument('--show', metavar='SETS', help='예: --show set0,set1 (정상 run 격자 통계 출력)')
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path):
+        os.remove(args.path)
+    dataset = load_dataset(args.path)
+    print(f"[INFO] {len(dataset)} runs (정상 {(dataset.labels == 0).sum()} / 이상 {(dataset.labels == 1).sum()}) "
+          f"× {len(dataset.grid)} positions, {dataset.nbytes() / 1e6:.2f} MB → {args.path}")
+    if args.show:
+        print(dataset.summary(args.show.split(',')).to_string(index=False))
@@ -0,0 +1,290 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+### data_demo.analyze_and_save 진단 그래프
+# 각 함수는 diag(dict) 를 받아 figure 를 만들어 돌려준다.
+# headless 모드에서는 아예 호출되지 않고, artifacts 모드에서는 ArtifactRenderer 가
+# 별도 프로세스에서 PNG 로 저장한다.
+
+# 실행 모드
+# - interactive: 기존처럼 plt.show() 로 띄움 (원래 바로 close 되던 그래프는 만들지 않음)
+# - headless: 그래프를 전혀 만들지 않음 (서버 배치용)
+# - artifacts: headless + 그래프를 백그라운드 프로세스에서 PNG 로 저장
+MODES = ('interactive', 'headless', 'artifacts')
+
+
+# 원본 accel_y / gyro / pitch, roll
+def plot_raw(diag):
+    import matplotlib.pyplot as plt
+    df = diag['df']
+    fig = plt.figure(figsize=(15, 10))
+
+    plt.subplot(3, 1, 1)
+    plt.plot(df['time'], df['accel_y'], label='accel_y', color='blue')
+    plt.title('accel_y over time')
+    plt.xlabel('Time')
+    plt.ylabel('Acceleration Y')
+    plt.grid(True)
+
+    plt.subplot(3, 1, 2)
+    plt.plot(df['time'], df['gyro_x'], label='gyro_x', color='red')
+    plt.plot(df['time'], df['gyro_y'], label='gyro_y', color='green')
+    plt.plot(df['time'], df['gyro_z'], label='gyro_z', color='purple')
+    plt.title('Gyroscope (x, y, z) over time')
+    plt.xlabel('Time')
+    plt.ylabel('Gyro')
+    plt.legend()
+    plt.grid(True)
+
+    plt.subplot(3, 1, 3)
+    plt.plot(df['time'], df['pitch'], label='pitch', color='green')
+    plt.plot(df['time'], df['roll'], label='roll', color='red')
+    plt.title('pitch and roll over time')
+    plt.xlabel('Time')
+    plt.ylabel('Angle (degrees)')
+    plt.legend()
+    plt.grid(True)
+
+    plt.tight_layout()
+    return fig
+
+
+# 방지턱 감지로 데이터 절단 (충격 구간이 없으면 None)
+def plot_shock_cut(diag):
+    import matplotlib.pyplot as plt
+    if not diag['shock_regions']:
+        return None
+    df = diag['df']
+    fig = plt.figure(figsize=(12, 6))
+    plt.plot(df['time'], diag['gyro_combined'], label='Gyro Combined')
+    plt.plot(df['time'], diag['gyro_smooth'], label='Gyro Smooth', alpha=0.7)
+    plt.axhline(y=diag['threshold'], color='r', linestyle='--', label='Threshold')
+
+    df_len = len(df)
+    for start, end in diag['shock_regions']:
+        safe_start = min(start, df_len - 1)
+        safe_end = min(end, df_len - 1)
+        plt.axvspan(df['time'].iloc[safe_start], df['time'].iloc[safe_end], color='red', alpha=0.2)
+
+    plt.axvline(diag['stable_start_time'], color='green', linestyle='--', label='Stable Start')
+    plt.axvline(diag['stable_end_time'], color='blue', linestyle='--', label='Stable End')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Gyro Magnitude')
+    plt.title('방지턱 감지로 데이터 절단')
+    plt.grid(True)
+    plt.legend()
+    return fig
+
+
+# 이상치 제거 전후 비교
+def plot_cleaning(diag):
+    import matplotlib.pyplot as plt
+    df_original = diag['df']
+    df_clean = diag['df_clean']
+    fig = plt.figure(figsize=(15, 10))
+
+    plt.subplot(3, 1, 1)
+    plt.plot(df_original['time'], df_original['accel_y'], label='Original accel_y', color='orange', alpha=0.5)
+    plt.plot(df_clean['time'], df_clean['accel_y'], label='Cleaned accel_y', color='blue')
+    plt.title('accel_y')
+    plt.xlabel('Time')
+    plt.ylabel('Acceleration')
+    plt.legend()
+    plt.grid(True)
+
+    plt.subplot(3, 1, 2)
+    plt.plot(df_original['time'], df_original['gyro_x'], label='Original gyro_x', color='salmon', alpha=0.4)
+    plt.plot(df_clean['time'], df_clean['gyro_x'], label='Cleaned gyro_x', color='red')
+    plt.plot(df_original['time'], df_original['gyro_y'], label='Original gyro_y', color='lightgreen', alpha=0.4)
+    plt.plot(df_clean['time'], df_clean['gyro_y'], label='Cleaned gyro_y', color='green')
+    plt.plot(df_original['time'], df_original['gyro_z'], label='Original gyro_z', color='plum', alpha=0.4)
+    plt.plot(df_clean['time'], df_clean['gyro_z'], label='Cleaned gyro_z', color='purple')
+    plt.title('gyro_x_y_z')
+    plt.xlabel('Time')
+    plt.ylabel('Gyroscope')
+    plt.legend()
+    plt.grid(True)
+
+    plt.subplot(3, 1, 3)
+    plt.plot(df_original['time'], df_original['pitch'], label='Original pitch', color='salmon', alpha=0.4)
+    plt.plot(df_clean['time'], df_clean['pitch'], label='pitch', color='green')
+    plt.plot(df_original['time'], df_original['roll'], label='Original roll', color='salmon', alpha=0.4)
+    plt.plot(df_clean['time'], df_clean['roll'], label='roll', color='red')
+    plt.title('pitch and roll')
+    plt.xlabel('Time')
+    plt.ylabel('Orientation')
+    plt.legend()
+    plt.grid(True)
+
+    plt.tight_layout()
+    return fig
+
+
+# 가속도 → 속도 → 위치 (219cm 보정 전)
+def plot_integration(diag):
+    import matplotlib.pyplot as plt
+    df_clean = diag['df_clean']
+    fig = plt.figure(figsize=(15, 10))
+
+    plt.subplot(3, 1, 1)
+    plt.plot(df_clean['time'], df_clean['accel_y'])
+    plt.title('Acceleration (from accel_y)')
+    plt.xlabel('Time')
+    plt.ylabel('Accelerometer (m/s)')
+    plt.grid()
+
+    plt.subplot(3, 1, 2)
+    plt.plot(df_clean['time'], diag['velocity'])
+    plt.title('Velocity (from accel_y)')
+    plt.xlabel('Time')
+    plt.ylabel('Velocity (m/s)')
+    plt.grid()
+
+    plt.subplot(3, 1, 3)
+    plt.plot(df_clean['time'], diag['position_raw'])
+    plt.title('position (from accel_y)')
+    plt.xlabel('Time')
+    plt.ylabel('position (m/s)')
+    plt.grid()
+
+    plt.tight_layout()
+    return fig
+
+
+# 시간에 따른 위치 (cm)
+def plot_position(diag):
+    import matplotlib.pyplot as plt
+    df_clean = diag['df_clean']
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(df_clean['time'], df_clean['position'], label='position (cm)', color='orange')
+    plt.title('position over Time')
+    plt.xlabel('Time (s)')
+    plt.ylabel('position (cm)')
+    plt.grid(True)
+    plt.legend()
+    return fig
+
+
+# 자이로 합성 벡터 크기
+def plot_gyro(diag):
+    import matplotlib.pyplot as plt
+    df_clean = diag['df_clean']
+    fig = plt.figure(figsize=(10, 4))
+    plt.plot(df_clean['time'], df_clean['gyro'], label='Gyro Magnitude', color='purple')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Gyro Magnitude (deg/s)')
+    plt.title('Combined Gyroscope Magnitude Over Time')
+    plt.grid(True)
+    plt.legend()
+    return fig
+
+
+# 누적 pitch / roll / tilt
+def plot_cumulative(diag):
+    import matplotlib.pyplot as plt
+    df_clean = diag['df_clean']
+    fig = plt.figure(figsize=(12, 9))
+
+    plt.subplot(3, 1, 1)
+    plt.plot(df_clean['time'], df_clean['cumulative_pitch'], label='Cumulative Pitch', color='blue')
+    plt.xlabel('time')
+    plt.ylabel('Cumulative Pitch (Relative Change)')
+    plt.title('Cumulative Pitch Change Based on Position')
+    plt.grid(True)
+    plt.ylim(-0.2, 0.2)
+    plt.legend()
+
+    plt.subplot(3, 1, 2)
+    plt.plot(df_clean['time'], df_clean['cumulative_roll'], label='Cumulative Roll', color='green')
+    plt.xlabel('Time')
+    plt.ylabel('Cumulative Roll (Relative Change)')
+    plt.title('Cumulative Roll Change Based on Position')
+    plt.grid(True)
+    plt.ylim(-0.2, 0.2)
+    plt.legend()
+
+    plt.subplot(3, 1, 3)
+    plt.plot(df_clean['time'], df_clean['tilt'], label='tilt', color='red')
+    plt.xlabel('Time')
+    plt.ylabel('Tilt')
+    plt.title('tilt')
+    plt.grid(True)
+    plt.legend()
+    plt.ylim(0, 0.2)
+    plt.tight_layout()
+    return fig
+
+
+# artifacts 모드에서 저장하는 그래프 (이름, 함수)
+FIGURES = [
+    ('raw', plot_raw),
+    ('shock_cut', plot_shock_cut),
+    ('cleaning', plot_cleaning),
+    ('integration', plot_integration),
+    ('position', plot_position),
+    ('gyro', plot_gyro),
+    ('cumulative', plot_cumulative),
+]
+
+# interactive 모드에서 plt.show() 로 띄우는 그래프 (나머지는 원래도 바로 close 됨)
+SHOWN_FIGURES = ['cleaning', 'cumulative']
+
+
+# --- 작업 프로세스에서 그래프 하나를 PNG 로 저장 ---
+def render_to_png(plot_func, out_path, *args):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig = plot_func(*args)
+    if fig is None:
+        return None
+    fig.savefig(out_path, dpi=100)
+    plt.close(fig)
+    return out_path
+
+
+# --- 백그라운드 PNG 렌더링 풀 ---
+# 처음 submit 될 때 프로세스 풀을 만든다 (요청이 없으면 아무 비용 없음)
+class ArtifactRenderer:
+    def __init__(self, out_dir, max_workers=None):
+        self.out_dir = out_dir
+        self.max_workers = max_workers
+        self.executor = None
+        self.futures = []
+
+    def submit(self, plot_func, name, *args):
+        if self.executor is None:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        out_path = os.path.join(self.out_dir, f'{name}.png')
+        self.futures.append(self.executor.submit(render_to_png, plot_func, out_path, *args))
+
+    # data_demo 진단 그래프 전체를 run 이름으로 저장
+    def submit_diagnostics(self, base_name, diag):
+        for fig_name, plot_func in FIGURES:
+            self.submit(plot_func, f'{base_name}_{fig_name}', diag)
+
+    # 남은 작업이 끝날 때까지 기다리고 저장된 파일 목록 반환
+    def close(self):
+        saved = [f.result() for f in self.futures]
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.futures = []
+        return [path for path in saved if path is not None]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# interactive 모드: 원래 띄우던 그래프만 만들어서 보여줌
+def show_diagnostics(diag):
+    import matplotlib.pyplot as plt
+    for fig_name, plot_func in FIGURES:
+        if fig_name in SHOWN_FIGURES:
+            plot_func(diag)
+            plt.show()
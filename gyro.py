@@ -1,31 +1,26 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
 import plotly.graph_objects as go
-from io import BytesIO
-from PIL import Image
-import os
-import glob
-import math
-
-def show_gyro(uploaded_data=None):
-
-    # 1. 파일 로딩
-    data_dir = "data/normal/summary"
-    file_list = glob.glob(os.path.join(data_dir, "summary_gyro_set[0-5].csv"))
-    combined_df = pd.DataFrame()
-
-    for file in file_list:
-        df = pd.read_csv(file)
-        df['file'] = os.path.basename(file).split('.')[0]
-        df.rename(columns={
-            'position_bin_gyro': 'position_bin',
-            'mean_gyro': 'mean',
-            'upper_bound_gyro': 'upper'
-        }, inplace=True)
-        combined_df = pd.concat([combined_df, df[['position_bin', 'mean', 'upper', 'file']]], ignore_index=True)
+from anomaly import ANOMALY_RATIO, detect_gyro
+from baseline_model import load_model
+
+
+# baseline 모델 로딩 + 기본(정상) 그래프/표/20 단위 상한선은 rerun·세션 사이에 캐시
+# baseline version (모델 내용 해시) 이 바뀌면 다시 계산
+# st.cache_data 는 호출할 때마다 복사본을 주므로 반환된 fig 에 업로드 trace 를 더해도 캐시는 그대로
+@st.cache_data(show_spinner=False)
+def load_gyro_baseline(version):
+
+    # 1. baseline 모델 로딩 (set0~5 summary_gyro 를 이어 붙인 것과 같은 행)
+    combined_df = load_model().gyro_summary()
+    combined_df['file'] = 'summary_gyro_' + combined_df['set_name']
+    combined_df.rename(columns={
+        'position_bin_gyro': 'position_bin',
+        'mean_gyro': 'mean',
+        'upper_bound_gyro': 'upper'
+    }, inplace=True)
+    combined_df = combined_df[['position_bin', 'mean', 'upper', 'file']]
 
     # 2. 필터링
     combined_df = combined_df[(combined_df['position_bin'] >= 0) & (combined_df['position_bin'] <= 220)]
@@ -74,19 +69,6 @@ def show_gyro(uploaded_data=None):
         line=dict(color='orange', width=2, dash='dash')
     ))
 
-    # 업로드 데이터가 있으면 같은 그래프에 추가 (항상 보임, 토글 없음)
-    if uploaded_data is not None:
-        for i, df in enumerate(uploaded_data):
-            label = df.attrs.get('filename', f'Uploaded {i+1}')
-            fig.add_trace(go.Scatter(
-                x=df['position'],   # position 그대로 사용 (필요시 버킷 처리 가능)
-                y=df['gyro'],
-                mode='lines',
-                name=label,
-                line=dict(width=1, dash='dot'),
-                opacity=0.7
-            ))
-
     fig.update_layout(
         title='📈 Gyro Summary by Position (from Summary Files)',
         xaxis_title='Position (m)',
@@ -106,8 +88,6 @@ def show_gyro(uploaded_data=None):
         margin=dict(b=80)
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-
     # 4. 표 생성 (0.5m 구간별 요약)
     combined_df['range'] = (combined_df['position_bin'] // 20) * 20
     iqr_summary = combined_df.groupby('range')['upper'].mean()
@@ -129,6 +109,36 @@ def show_gyro(uploaded_data=None):
     )
     summary_table.index.name = 'Position(m)'
 
+    # 5. IQR 상한선 (summary에서 전체 평균 사용)
+    # position_bin 20 단위로 묶인 upper 평균값을 구함
+    iqr_summary = combined_df.groupby('position_bin')['upper'].mean()
+    # 20단위 구간 라벨 (ex: 0,20,40,...) 별 평균 upper 값 계산
+    iqr_20bins = iqr_summary.groupby((iqr_summary.index // 20) * 20).mean().to_dict()
+
+    return fig, summary_table, iqr_20bins
+
+
+def show_gyro(uploaded_data=None):
+
+    # 기본 그래프/표 (캐시) - 업로드 데이터 부분만 매번 계산
+    baseline = load_model()
+    fig, summary_table, iqr_20bins = load_gyro_baseline(baseline.version)
+
+    # 업로드 데이터가 있으면 같은 그래프에 추가 (항상 보임, 토글 없음)
+    if uploaded_data is not None:
+        for i, df in enumerate(uploaded_data):
+            label = df.attrs.get('filename', f'Uploaded {i+1}')
+            fig.add_trace(go.Scatter(
+                x=df['position'],   # position 그대로 사용 (필요시 버킷 처리 가능)
+                y=df['gyro'],
+                mode='lines',
+                name=label,
+                line=dict(width=1, dash='dot'),
+                opacity=0.7
+            ))
+
+    st.plotly_chart(fig, use_container_width=True)
+
     st.dataframe(summary_table.style.format("{:.3f}"))
 
     # 1) 업로드 데이터 9개인지 확인
@@ -139,47 +149,23 @@ def show_gyro(uploaded_data=None):
         st.warning(f"⚠️ 데이터 부족: 업로드된 데이터가 9개 미만입니다. (현재 업로드:{len(uploaded_data)}개)")
         return
 
-    # 2) IQR 상한선 (summary에서 전체 평균 사용)
-    # combined_df에는 summary 파일 데이터 있음
-    # position_bin 20 단위로 묶인 upper 평균값을 구함
-    iqr_summary = combined_df.groupby('position_bin')['upper'].mean()
-    # 20단위 구간 라벨로 변환 (ex: 0,20,40,...)
-    iqr_20bins = {}
-    for pos_bin, upper_val in iqr_summary.items():
-        bin_20 = (pos_bin // 20) * 20
-        if bin_20 not in iqr_20bins:
-            iqr_20bins[bin_20] = []
-        iqr_20bins[bin_20].append(upper_val)
-    # 각 20단위 구간별 평균 upper 값 계산
-    iqr_20bins = {k: sum(v)/len(v) for k, v in iqr_20bins.items()}
-
-    # 3) 구간별로 9개 데이터에서 상한선 넘은 횟수 세기
-    exceed_counts = {}
-    for bin_start in sorted(iqr_20bins.keys()):
-        count_exceed = 0
-        upper_limit = iqr_20bins[bin_start]
-        bin_end = bin_start + 20
-        for df in uploaded_data:
-            # 해당 구간 position 값 필터링
-            sub_df = df[(df['position'] >= bin_start) & (df['position'] < bin_end)]
-            if sub_df.empty:
-                continue
-            # 해당 구간 gyro값이 upper_limit 넘은 점이 있는지 검사
-            if (sub_df['gyro'] > upper_limit).any():
-                count_exceed += 1
-        exceed_counts[bin_start] = count_exceed
-
-    # 4) 6개 이상 넘으면 이상 예측 구간
-    abnormal_bins = []
+    # 2) 파일 × 구간 초과 행렬 (구간 안 gyro 최대값 > 상한선) → anomaly.py
+    # 3) 70% 이상 파일이 넘으면 이상 예측 구간
+    result = detect_gyro(uploaded_data, iqr_20bins, bin_size=20, ratio=ANOMALY_RATIO, baseline_version=baseline.version)
+    abnormal_bins = result['abnormal_bins']
     total_files = len(uploaded_data)
-    threshold_ratio = 0.7  # 기준 비율 (70%)
-    threshold_count = math.ceil(total_files * threshold_ratio)  # 보수적으로 올림
-
-    for bin_start, count in exceed_counts.items():
-        if count >= threshold_count:
-            abnormal_bins.append((bin_start, count))
 
-        # 5) 메시지 출력
+    with st.expander("📊 파일 × 구간 상한선 초과 행렬", expanded=False):
+        range_labels = [f"{b:.0f}~{b + 20:.0f}" for b in result['bin_starts']]
+        file_labels = [f"{i+1}. {df.attrs.get('filename', 'Uploaded')}" for i, df in enumerate(uploaded_data)]
+        matrix_df = pd.DataFrame(result['bin_max'], index=file_labels, columns=range_labels)
+        exceed_df = pd.DataFrame(result['exceed'], index=file_labels, columns=range_labels)
+        st.dataframe(matrix_df.style.format("{:.3f}", na_rep="-").apply(
+            lambda _: np.where(exceed_df, 'background-color: rgba(255, 99, 71, 0.4)', ''), axis=None))
+        st.caption(f"구간별 초과 파일 수: {dict(zip(range_labels, result['counts'].tolist()))} (기준 {result['threshold_count']}개)"
+                   f" · baseline {result['baseline']}")
+
+        # 4) 메시지 출력
     if abnormal_bins:
         detected_bins = len(abnormal_bins)  # 발견한 이상 구간 수
         total_files = len(uploaded_data)
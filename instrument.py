@@ -0,0 +1,311 @@
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from storage import atomic_write
+
+### 단계별 시간 / 메모리 계측 (span)
+# 전처리 / summary / 판정 코드의 단계를 span 으로 감싸 두고, 켜져 있을 때만 시간 (와 메모리) 을 기록한다.
+#     with span('zscore', rows=len(df)):                  # 컨텍스트 매니저
+#         ...
+#     @traced('anomaly.tilt_band_check')                  # 데코레이터
+#     def tilt_band_check(...):
+# - 끄고 켜기: 환경 변수 PIPELINE_TRACE=1 (시간), PIPELINE_TRACE=memory (시간 + tracemalloc 최대 메모리)
+#   PIPELINE_TRACE_FILE=경로 를 주면 바깥 span (run 하나, 예: analyze_and_save) 이 끝날 때마다 JSON lines 로 덧붙임
+#   (프로세스 풀 작업 프로세스도 환경 변수를 물려받아서 같은 파일에 씀) / 코드에서는 enable() / disable()
+#   파일로 쓸 때는 메모리 (records()) 에 쌓지 않음 - stream.py 처럼 오래 도는 프로세스에서 계속 늘지 않게
+# - 꺼져 있으면 span() 은 아무것도 안 하는 객체 하나를 돌려주고, traced 는 원래 함수를 바로 부름 (호출당 0.2us 정도)
+# - 기록 (span 하나 = 한 줄): name, path (바깥 span 부터 'a/b/c'), run (바깥 span id), start (epoch 초), seconds,
+#   labels (file, rows 등 - 안쪽 span 은 바깥 label 을 물려받음), peak_bytes (memory 모드: span 시작 대비 최대 증가량)
+# - 누적 통계 (span 이름별 횟수 / 합 / 최대) 는 항상 유지 → prometheus_text() 로 Prometheus 텍스트 형식 snapshot
+# - 스레드마다 span stack 이 따로 (stream.py 판정 스레드)
+# python instrument.py demo : 전처리 / summary / 판정을 계측해서 단계별 표 + JSONL + .prom 저장, 꺼져 있을 때 비용 측정
+
+base_dir = 'data'
+OUT_DIR = os.path.join(base_dir, 'artifacts', 'instrument')
+METRIC_PREFIX = 'pipeline_stage'
+
+_enabled = False
+_memory = False
+_sink = None                # JSONL 경로 (None 이면 records 에 쌓기만, 있으면 파일에만)
+_records = []
+_stats = {}                 # name → [count, sum 초, max 초, max peak_bytes]
+_lock = threading.Lock()
+_local = threading.local()
+_run_ids = iter(range(1, 1 << 62))
+
+
+def enable(memory=False, sink=None):
+    global _enabled, _memory, _sink
+    _enabled, _memory, _sink = True, memory, sink
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _memory
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _enabled = _memory = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _records.clear()
+        _stats.clear()
+
+
+class _NullSpan:
+    peak_bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **labels):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.peak_seen = 0
+        self.peak_bytes = None  # memory 모드: 끝난 뒤 이 span 의 최대 증가량 (안쪽 span 이 tracemalloc peak 를 reset 하므로
+                                # 바깥에서 전체 최대값이 필요하면 tracemalloc 대신 이 값을 씀)
+
+    def set(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            self.labels = {**parent.labels, **self.labels}
+            self.path = f'{parent.path}/{self.name}'
+            self.run = parent.run
+        else:
+            self.path = self.name
+            self.run = next(_run_ids)
+            self.buffer = []
+        self.root = parent.root if parent is not None else self
+        if _memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.peak_seen = max(parent.peak_seen, peak)  # reset 하면 바깥 span 의 최대값이 사라지므로 넘겨 둠
+            tracemalloc.reset_peak()
+            self.mem_start = current
+        else:
+            self.mem_start = None
+        stack.append(self)
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        record = {'name': self.name, 'path': self.path, 'run': self.run, 'start': round(self.start_time, 6),
+                  'seconds': seconds, 'labels': self.labels}
+        peak_bytes = None
+        if self.mem_start is not None and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak_seen)
+            peak_bytes = self.peak_bytes = record['peak_bytes'] = peak - self.mem_start
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+        if exc[0] is not None:
+            record['error'] = exc[0].__name__
+        self.root.buffer.append(record)
+        with _lock:
+            stat = _stats.setdefault(self.name, [0, 0.0, 0.0, 0])
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+            if peak_bytes is not None:
+                stat[3] = max(stat[3], peak_bytes)
+            if not stack and _sink is None:
+                _records.extend(self.buffer)
+        if not stack and _sink is not None:
+            write_jsonl(_sink, self.buffer)
+        return False
+
+
+# 켜져 있으면 Span, 꺼져 있으면 아무것도 안 하는 객체
+def span(name, **labels):
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, labels)
+
+
+def traced(name=None):
+    def decorator(func):
+        span_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+# 기록을 JSON lines 로 덧붙임 (한 번의 write 로 - 여러 프로세스가 같은 파일에 써도 줄이 섞이지 않게)
+def write_jsonl(path, recs=None):
+    recs = records() if recs is None else recs
+    if not recs:
+        return 0
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    text = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in recs)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+    return len(recs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# span 이름별 누적 통계 → Prometheus 텍스트 형식
+def prometheus_text(prefix=METRIC_PREFIX):
+    with _lock:
+        stats = {name: list(stat) for name, stat in _stats.items()}
+    lines = [f'# HELP {prefix}_seconds Time spent in pipeline stage spans.',
+             f'# TYPE {prefix}_seconds summary']
+    for name in sorted(stats):
+        count, total, _, _ = stats[name]
+        lines.append(f'{prefix}_seconds_sum{{stage="{_escape(name)}"}} {total:.9g}')
+        lines.append(f'{prefix}_seconds_count{{stage="{_escape(name)}"}} {count}')
+    lines += [f'# HELP {prefix}_seconds_max Longest single span.', f'# TYPE {prefix}_seconds_max gauge']
+    lines += [f'{prefix}_seconds_max{{stage="{_escape(name)}"}} {stats[name][2]:.9g}' for name in sorted(stats)]
+    memory = [name for name in sorted(stats) if stats[name][3]]
+    if memory:
+        lines += [f'# HELP {prefix}_peak_bytes Largest traced memory increase within a span.',
+                  f'# TYPE {prefix}_peak_bytes gauge']
+        lines += [f'{prefix}_peak_bytes{{stage="{_escape(name)}"}} {stats[name][3]}' for name in memory]
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, prefix=METRIC_PREFIX):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    text = prometheus_text(prefix)
+    atomic_write(path, lambda f: f.write(text), mode='w')
+
+
+# 환경 변수로 켜기 (import 할 때 한 번)
+_mode = os.environ.get('PIPELINE_TRACE', '').strip().lower()
+if _mode and _mode not in ('0', 'false', 'off'):
+    enable(memory=_mode == 'memory', sink=os.environ.get('PIPELINE_TRACE_FILE') or None)
+
+
+# 전처리 / summary / 판정을 계측 - 전부 임시 폴더에서 (원본 run 은 심볼릭 링크, 결과 / 캐시 / 모델은 임시 폴더에)
+def demo(memory=False, out_dir=OUT_DIR):
+    import contextlib
+    import glob
+    import io
+    import shutil
+    import tempfile
+    import timeit
+    import pandas as pd
+
+    # 꺼져 있을 때 span / traced 한 번 비용
+    disable()
+    noop = traced('noop')(lambda: None)
+    n = 200000
+    t_span = min(timeit.repeat(lambda: span('x').__enter__(), number=n, repeat=3)) / n
+    t_call = min(timeit.repeat(noop, number=n, repeat=3)) / n
+    t_plain = min(timeit.repeat(lambda: None, number=n, repeat=3)) / n
+
+    reset()
+    enable(memory=memory)
+    import data_add
+    import data_demo
+    from anomaly import detect_files
+    from baseline_model import load_model
+
+    # 이상 원본 (전처리 대상) + 정상 전처리 결과 (summary 대상)
+    raw_files = sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set*', 'raw_anomal_*.csv')))
+    normal_files = sorted(glob.glob(os.path.join(base_dir, 'normal', 'set*', 'normal_*.csv')))
+    scratch = tempfile.mkdtemp(prefix='instrument_')
+    cwd = os.getcwd()
+    try:
+        for src in raw_files + normal_files:
+            dest = os.path.join(scratch, src)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.symlink(os.path.abspath(src), dest)
+        os.chdir(scratch)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for f in raw_files:
+                data_demo.analyze_and_save(f, 'anomal', mode='headless')
+            data_add.main(mode='headless')
+        model = load_model()
+        val_files = (sorted(glob.glob(os.path.join(base_dir, 'normal', 'set6', 'normal_*.csv')))
+                     + sorted(glob.glob(os.path.join(base_dir, 'anomal', 'set13', 'anomal_*.csv'))))
+        detect_files(val_files, model.gyro_summary(), baseline_version=model.version)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+    disable()
+
+    recs = records()
+    table = pd.DataFrame(recs)
+    summary = table.groupby('path')['seconds'].agg(['count', 'sum', 'mean', 'max'])
+    if 'peak_bytes' in table:
+        summary['peak_mb'] = table.groupby('path')['peak_bytes'].max() / 1e6
+    print(summary.sort_index().to_string(float_format=lambda v: f'{v:.4f}'))
+
+    os.makedirs(out_dir, exist_ok=True)
+    jsonl_path = os.path.join(out_dir, 'spans.jsonl')
+    if os.path.exists(jsonl_path):
+        os.remove(jsonl_path)
+    write_jsonl(jsonl_path, recs)
+    write_prometheus(os.path.join(out_dir, 'spans.prom'))
+    print(f"\n[INFO] span {len(recs)}개 → {jsonl_path}, {os.path.join(out_dir, 'spans.prom')}")
+    print(f"[INFO] 꺼져 있을 때: span() {t_span * 1e9:.0f} ns, traced 함수 호출 {(t_call - t_plain) * 1e9:.0f} ns 추가")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='단계별 시간 / 메모리 계측')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('demo', help='전처리 / summary / 판정 계측')
+    p.add_argument('--memory', action='store_true', help='tracemalloc 최대 메모리도 기록 (느려짐)')
+    p.add_argument('--out-dir', default=OUT_DIR)
+    p = sub.add_parser('prom', help='JSONL 기록 → Prometheus 텍스트')
+    p.add_argument('jsonl')
+    args = parser.parse_args()
+
+    # 스크립트로 실행하면 이 파일은 __main__ → 파이프라인 모듈이 import 하는 instrument 와 상태가 따로이므로 그쪽을 씀
+    import instrument
+    if args.command == 'demo':
+        instrument.demo(args.memory, args.out_dir)
+    else:
+        with open(args.jsonl, encoding='utf-8') as f:
+            for line in f:
+                r = json.loads(line)
+                stat = instrument._stats.setdefault(r['name'], [0, 0.0, 0.0, 0])
+                stat[0] += 1
+                stat[1] += r['seconds']
+                stat[2] = max(stat[2], r['seconds'])
+                stat[3] = max(stat[3], r.get('peak_bytes') or 0)
+        print(instrument.prometheus_text(), end='')
@@ -0,0 +1,78 @@
+import numpy as np
+
+### accel_y → 속도 → 위치 이중적분 (사다리꼴 적분법, 벡터화)
+# data_demo.analyze_and_save 의 for 루프 적분과 같은 결과를 낸다.
+
+# 총 이동 거리 (고정값)
+TOTAL_DISTANCE = 2.19  # meters
+# 마지막 위치 보정값
+FINAL_POSITION = 219   # cm
+GRAVITY = 9.81
+
+
+# --- 누적 사다리꼴 적분 (시작값 0) ---
+def cumulative_trapezoid(y, dt):
+    out = np.zeros_like(y)
+    # 루프와 같은 순서로 더해지도록 cumsum 사용 (부동소수점 결과 동일)
+    np.cumsum(0.5 * (y[..., :-1] + y[..., 1:]) * dt, axis=-1, out=out[..., 1:])
+    return out
+
+
+# --- 단일 run 위치 추정 ---
+# 반환: (보정된 속도, 보정 전 위치(m), 219cm 로 맞춘 위치)
+def estimate_position(time, accel_y, total_distance=TOTAL_DISTANCE, final_position=FINAL_POSITION):
+    time = np.asarray(time, dtype=float)
+    accel = np.asarray(accel_y, dtype=float) * GRAVITY
+
+    dt = np.diff(time)
+    total_time = time[-1] - time[0]
+
+    # 1차 적분: 초기속도 0 기준 속도
+    velocity_temp = cumulative_trapezoid(accel, dt)
+
+    # 초기속도 보정값 (실제 평균 속도 - 측정된 평균 속도)
+    initial_velocity = total_distance / total_time - np.mean(velocity_temp)
+    velocity = velocity_temp + initial_velocity
+
+    # 2차 적분: 위치
+    position_raw = cumulative_trapezoid(velocity, dt)
+
+    # 마지막 위치를 final_position 으로 맞추기
+    position = position_raw * (final_position / position_raw[-1])
+
+    return velocity, position_raw, position
+
+
+# --- 여러 run 을 패딩 배열 하나로 한번에 처리 ---
+# times, accels: 길이가 다른 1차원 배열들의 리스트
+# 반환: 각 run 의 (속도, 위치) 리스트 (길이는 원래대로 잘라서 돌려줌)
+def pad_runs(arrays, fill=0.0):
+    lengths = np.array([len(a) for a in arrays])
+    padded = np.full((len(arrays), lengths.max()), fill, dtype=float)
+    mask = np.arange(padded.shape[1]) < lengths[:, None]
+    padded[mask] = np.concatenate(arrays)
+    return padded, lengths, mask
+
+
+def estimate_position_batch(times, accels, total_distance=TOTAL_DISTANCE, final_position=FINAL_POSITION):
+    time, lengths, mask = pad_runs([np.asarray(t, dtype=float) for t in times])
+    accel, _, _ = pad_runs([np.asarray(a, dtype=float) for a in accels])
+    accel *= GRAVITY
+    rows = np.arange(len(lengths))
+    last = lengths - 1
+
+    # 패딩 구간은 dt = 0 이므로 적분값이 더 늘어나지 않음
+    dt = np.diff(time, axis=1)
+    dt[~mask[:, 1:]] = 0.0
+    total_time = time[rows, last] - time[:, 0]
+
+    velocity_temp = cumulative_trapezoid(accel, dt)
+    measured_avg_velocity = np.where(mask, velocity_temp, 0.0).sum(axis=1) / lengths
+    initial_velocity = total_distance / total_time - measured_avg_velocity
+    velocity = np.where(mask, velocity_temp + initial_velocity[:, None], 0.0)
+
+    position_raw = cumulative_trapezoid(velocity, dt)
+    position = position_raw * (final_position / position_raw[rows, last])[:, None]
+
+    return ([velocity[i, :n] for i, n in enumerate(lengths)],
+            [position[i, :n] for i, n in enumerate(lengths)])
@@ -1,63 +1,32 @@
 import os
 import glob
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.metrics import classification_report, confusion_matrix, ConfusionMatrixDisplay
+from anomaly import detect_files
+from baseline_model import load_model
+from storage import read_run
+from sklearn.metrics import classification_report, confusion_matrix
 
-# 1. 정상 데이터 통계 요약 파일들 불러오기 (position_bin_gyro는 5단위임)
-summary_files = sorted(glob.glob('data/normal/summary/summary_gyro_set[0-5].csv'))
-summary_df_list = [pd.read_csv(f) for f in summary_files]
-summary_df = pd.concat(summary_df_list, ignore_index=True)
-
-# 2. 이상 탐지용 함수 정의
-def detect_anomaly(file_path, summary_df, bin_size=0.3, upper_bin_size=30):
-    df = pd.read_csv(file_path)
-    
-    # 0.3 단위 position_bin_0.1 생성
-    df['position_bin_0.3'] = (df['position'] / bin_size).apply(np.floor) * bin_size
-    
-    # 5 단위 상한선 기준 position_bin_5 생성 (summary_df 기준)
-    df['position_bin_30'] = (df['position'] / upper_bin_size).apply(np.floor) * upper_bin_size
-
-    # summary_df와 병합 (position_bin_5 기준)
-    merged = pd.merge(df, summary_df, left_on='position_bin_30', right_on='position_bin_gyro', how='inner')
-
-    # 이상치 여부 (gyro > 상한선)
-    merged['is_anomaly'] = merged['gyro'] > merged['upper_bound_gyro']
-
-    # 0.3 단위 구간별 이상치 개수, 총 개수
-    anomaly_count = merged.groupby('position_bin_0.3')['is_anomaly'].sum()
-    total_count = merged.groupby('position_bin_0.3')['is_anomaly'].count()
-    
-    anomaly_ratio = anomaly_count / total_count
-
-    # 이상 비율 70% 이상인 구간만 추출
-    anomaly_bins = anomaly_ratio[anomaly_ratio >= 0.7]
-
-    # 이상 구간 1개 이상이면 이상 감지 True
-    detected = len(anomaly_bins) > 0
-
-    return detected, len(anomaly_bins)
+# 1. 정상 baseline 모델 (set0~5 summary 를 합친 것, position_bin_gyro는 10단위임)
+baseline = load_model()
+summary_df = baseline.gyro_summary()
+print(f"baseline {baseline.version} ({', '.join(baseline.sets)})")
 
+# 2. 이상 탐지: 검증 set 전체를 배열 하나로 합쳐 일괄 판정 → anomaly.detect_files
+#    (샘플 position 30 단위 상한선과 비교, 0.3 단위 구간 중 이상 비율 70% 이상 구간이 있으면 이상)
+#    기존 파일별 merge 방식과의 비교는 bench_detection.py
 
 # 3. 정상 데이터 검증
 normal_val_dir = 'data/normal/set6'
 normal_val_files = sorted(glob.glob(os.path.join(normal_val_dir, 'normal_*.csv')))
 
-normal_results = []
-for f in normal_val_files:
-    detected, anomaly_bin_count = detect_anomaly(f, summary_df)
-    normal_results.append({'filename': os.path.basename(f), 'detected': detected, 'anomaly_bins': anomaly_bin_count})
-
 # 4. 이상 데이터 검증
 abnormal_val_dir = 'data/anomal/set13'
 abnormal_val_files = sorted(glob.glob(os.path.join(abnormal_val_dir, 'anomal_*.csv')))
 
-abnormal_results = []
-for f in abnormal_val_files:
-    detected, anomaly_bin_count = detect_anomaly(f, summary_df)
-    abnormal_results.append({'filename': os.path.basename(f), 'detected': detected, 'anomaly_bins': anomaly_bin_count})
+results = detect_files(normal_val_files + abnormal_val_files, summary_df, baseline_version=baseline.version)
+normal_results = results[:len(normal_val_files)]
+abnormal_results = results[len(normal_val_files):]
 
 # 5. 평가
 y_true = [0]*len(normal_results) + [1]*len(abnormal_results)
@@ -92,21 +61,13 @@ base_dir = 'data'
 normal_summary_dir = os.path.join(base_dir, 'normal', 'summary')
 anomal_summary_dir = os.path.join(base_dir, 'anomal', 'summary')
 
-# === 정상 summary 전체 로드 및 평균화 및 std 계산 ===
-normal_dfs = []
-for i in range(6):  # set0 ~ set6
-    file_path = os.path.join(normal_summary_dir, f'summary_pitch_tilt_set{i}.csv')
-    df = pd.read_csv(file_path)
-    normal_dfs.append(df)
-
-normal_all = pd.concat(normal_dfs)
-normal_stats = normal_all.groupby('position_bin_pitch_tilt')[['mean_pitch', 'mean_tilt']].agg(['mean', 'std']).reset_index()
-normal_stats.columns = ['position', 'normal_mean_pitch', 'normal_std_pitch', 'normal_mean_tilt', 'normal_std_tilt']
+# === 정상 summary 전체 평균 및 std (baseline 모델에 저장된 값) ===
+normal_stats = baseline.pitch_tilt_stats()
 
 # === 이상 summary 로드 및 비교 ===
 for i in [6]:  # set10 ~ set13
     file_path = os.path.join(normal_summary_dir, f'summary_pitch_tilt_set{i}.csv')
-    anomal_df = pd.read_csv(file_path)
+    anomal_df = read_run(file_path)
     anomal_df = anomal_df.rename(columns={'position_bin_pitch_tilt': 'position'})
 
     # 위치 기준으로 병합
@@ -0,0 +1,241 @@
+import argparse
+import glob
+import os
+import time as timer
+import numpy as np
+import pandas as pd
+from anomaly import (ANOMALY_RATIO, FINE_BIN_SIZE, UPPER_BIN_SIZE, count_anomaly_bins, gyro_threshold_table,
+                     load_runs_array)
+from baseline_model import load_model
+from storage import read_run
+
+### run 을 position 순서로 받으면서 bin 별 판정 (온라인)
+# matrix.py / anomaly.detect_files 는 run 전체가 올라와야 판정한다. 여기서는 샘플을 position 순서로
+# 청크 단위로 받으면서 (0.3cm bin 별 초과 수, 비교 수) 를 이어서 세고, bin 이 닫히는 순간 판정한다.
+# - 규칙은 anomaly.count_anomaly_bins 와 같음: 샘플 gyro 를 30cm bin 의 summary 상한선 전부와 비교,
+#   0.3cm bin 의 (초과 수 / 비교 수) >= 0.7 이면 이상 bin
+# - 지금까지 받은 최대 position (watermark) 이 bin 끝 + lateness 를 넘으면 그 bin 을 닫고 비율 확정 (conclusive)
+#   첫 이상 bin 이 확정되면 run 전체를 기다리지 않고 바로 이상 flag (이상 run 은 여기서 멈춰도 결과가 같음)
+#   정상 판정은 run 이 끝나야 (flush) 확정
+# - 늦은 샘플: 전처리 run 은 position 이 조금 되돌아가는 구간이 있음 (set13/set6 37개 중 10개, 최대 4.6cm)
+#   → 아직 열린 bin 이면 그대로 더하고, 이미 닫힌 bin 이면 버리고 late_dropped 로 셈
+#   lateness (기본 LATENESS = 5cm) 안의 역행은 일괄 판정과 결과가 같고, 대신 flag 가 lateness 만큼 늦게 나옴
+#   (lateness=0 이면 다음 bin 샘플이 들어오는 순간 닫힘 - 지연 최소, 역행 샘플은 버림)
+# - 들고 있는 상태는 lateness 안의 열린 bin 카운터 + flag 목록 (run 길이와 무관)
+# - 판정 지연: flag 가 나올 때까지 받은 샘플 수 / 첫 position 에서 이동한 거리 (cm)
+# - replay_run 은 기록된 순서 그대로 넣는다 (정렬 없음)
+# python online.py : set13 / set6 run 을 청크로 흘려 넣고 일괄 판정 (detect_files) 과 비교, 판정 지연 출력
+
+base_dir = 'data'
+CHUNK_SIZE = 16
+LATENESS = 5.0     # cm
+
+
+class OnlineBinDetector:
+    # bins, table: anomaly.gyro_threshold_table 결과
+    def __init__(self, bins, table, bin_size=FINE_BIN_SIZE, upper_bin_size=UPPER_BIN_SIZE, ratio=ANOMALY_RATIO,
+                 lateness=LATENESS, baseline_version=None):
+        self.bins = bins
+        self.table = table
+        self.bin_size = bin_size
+        self.upper_bin_size = upper_bin_size
+        self.ratio = ratio
+        self.lateness = lateness
+        self.baseline_version = baseline_version
+        self.n_samples = 0
+        self.first_position = np.nan
+        self.last_position = np.nan
+        self.watermark = -np.inf    # 지금까지 받은 최대 position
+        self.open = {}              # 열린 0.3cm bin 번호 (floor(position / bin_size)) → [초과 수, 비교 수]
+        self.late_dropped = 0       # 이미 닫힌 bin 에 늦게 들어와서 버린 샘플 수
+        self.anomaly_bins = 0
+        self.flags = []             # 확정된 이상 bin 목록
+        self.closed = False
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        bins, table = gyro_threshold_table(model.gyro_summary())
+        return cls(bins, table, baseline_version=model.version, **kwargs)
+
+    @property
+    def detected(self):
+        return self.anomaly_bins > 0
+
+    # 샘플별 (0.3cm bin 번호, 초과 수, 비교 수) - summary 에 없는 30cm bin 의 샘플은 비교 수 0
+    def score(self, position, gyro):
+        coarse = np.floor(position / self.upper_bin_size) * self.upper_bin_size
+        row = np.minimum(np.searchsorted(self.bins, coarse), len(self.bins) - 1)
+        matched = self.bins[row] == coarse
+        limits = self.table[row[matched]]
+        exceed = np.zeros(len(position), dtype=np.int64)
+        compare = np.zeros(len(position), dtype=np.int64)
+        with np.errstate(invalid='ignore'):
+            exceed[matched] = (gyro[matched, None] > limits).sum(axis=1)
+        compare[matched] = (~np.isnan(limits)).sum(axis=1)
+        return np.floor(position / self.bin_size).astype(np.int64), exceed, compare
+
+    # bin 하나 확정 → 이상이면 flag 추가
+    # closing: 이 bin 을 닫은 샘플 (몇 번째 샘플인지 1부터, position) - flush 로 닫히면 마지막 샘플
+    def close_bin(self, fine, exceed, compare, closing):
+        if compare == 0 or exceed / compare < self.ratio:  # 비교한 샘플이 없는 bin 은 일괄 판정에도 없음
+            return None
+        self.anomaly_bins += 1
+        n_samples, position = closing
+        flag = {
+            'bin_start': fine * self.bin_size,
+            'ratio': exceed / compare,
+            'samples': n_samples,
+            'position': position,
+            'latency_cm': position - self.first_position,
+        }
+        self.flags.append(flag)
+        return flag
+
+    # watermark 까지 닫힌 마지막 bin 번호 (이 번호 이하 bin 은 더 받지 않음)
+    def closed_upto(self, watermark):
+        return np.floor((watermark - self.lateness) / self.bin_size) - 1
+
+    # 청크 하나 (기록된 순서, position 이 되돌아가도 됨) → 이번에 확정된 이상 bin 목록
+    def push(self, position, gyro):
+        if self.closed:
+            raise ValueError('flush 이후에는 샘플을 넣을 수 없음')
+        position = np.asarray(position, dtype=float)
+        gyro = np.asarray(gyro, dtype=float)
+        if len(position) == 0:
+            return []
+        if np.isnan(position).any():
+            raise ValueError('position 에 NaN 이 있음')
+
+        fine, exceed, compare = self.score(position, gyro)
+        watermark = np.maximum.accumulate(np.maximum(position, self.watermark))
+        # 샘플이 들어오기 직전까지 닫힌 bin 이면 늦은 샘플 → 버림
+        before = self.closed_upto(np.r_[self.watermark, watermark[:-1]])
+        late = fine <= before
+        self.late_dropped += int(late.sum())
+        keep = ~late
+        groups, inverse = np.unique(fine[keep], return_inverse=True)
+        group_exceed = np.bincount(inverse, weights=exceed[keep], minlength=len(groups))
+        group_compare = np.bincount(inverse, weights=compare[keep], minlength=len(groups))
+        for b, e, c in zip(groups.tolist(), group_exceed, group_compare):
+            counter = self.open.setdefault(b, [0, 0])
+            counter[0] += int(e)
+            counter[1] += int(c)
+
+        offset = self.n_samples
+        if self.n_samples == 0:
+            self.first_position = position[0]
+        self.n_samples += len(position)
+        self.last_position = position[-1]
+        self.watermark = watermark[-1]
+
+        # 이번 청크에서 닫힌 bin: 닫게 만든 샘플 = closed_upto 가 처음 그 bin 이상이 된 샘플
+        closed_after = self.closed_upto(watermark)
+        flags = []
+        for b in sorted(b for b in self.open if b <= closed_after[-1]):
+            closing = int(np.searchsorted(closed_after, b))
+            exceed_count, compare_count = self.open.pop(b)
+            flags.append(self.close_bin(b, exceed_count, compare_count, (offset + closing + 1, position[closing])))
+        return [f for f in flags if f is not None]
+
+    # run 끝 → 열린 bin 전부 확정
+    def flush(self):
+        flags = []
+        if not self.closed:
+            for b in sorted(self.open):
+                exceed_count, compare_count = self.open[b]
+                flags.append(self.close_bin(b, exceed_count, compare_count, (self.n_samples, self.last_position)))
+        self.open = {}
+        self.closed = True
+        return [f for f in flags if f is not None]
+
+    # 판정 결과 (detect_files 결과 형식 + 첫 flag 까지 지연)
+    def result(self):
+        first = self.flags[0] if self.flags else {}
+        return {
+            'detected': self.detected,
+            'anomaly_bins': self.anomaly_bins,
+            'flag_samples': first.get('samples'),
+            'flag_position': first.get('position'),
+            'latency_cm': first.get('latency_cm'),
+            'samples': self.n_samples,
+            'late_dropped': self.late_dropped,
+            'final': self.closed,
+            'baseline': self.baseline_version,
+        }
+
+
+# 전처리 run 하나를 기록된 순서 그대로 청크로 흘려 넣기
+# stop_on_flag: 첫 이상 flag 에서 멈춤 (이상 bin 수는 그때까지 센 것)
+def replay_run(df, detector, chunksize=CHUNK_SIZE, stop_on_flag=False):
+    position = df['position'].to_numpy(dtype=float)
+    gyro = df['gyro'].to_numpy(dtype=float)
+    for i in range(0, len(df), chunksize):
+        flags = detector.push(position[i:i + chunksize], gyro[i:i + chunksize])
+        if stop_on_flag and flags:
+            return detector.result()
+    detector.flush()
+    return detector.result()
+
+
+def compare(file_list, model, chunksize=CHUNK_SIZE, lateness=LATENESS):
+    summary_df = model.gyro_summary()
+    bins, table = gyro_threshold_table(summary_df)
+    run_id, arrays = load_runs_array(file_list)
+    batch = count_anomaly_bins(run_id, arrays['position'], arrays['gyro'], bins, table, len(file_list))
+
+    rows = []
+    elapsed = 0.0
+    for f, n_batch in zip(file_list, batch):
+        df = read_run(f, columns=['position', 'gyro'])
+        detector = OnlineBinDetector(bins, table, lateness=lateness, baseline_version=model.version)
+        start = timer.perf_counter()
+        r = replay_run(df, detector, chunksize)
+        elapsed += timer.perf_counter() - start
+        early = replay_run(df, OnlineBinDetector(bins, table, lateness=lateness), chunksize, stop_on_flag=True)
+        position = df['position'].to_numpy(dtype=float)
+        rows.append({
+            'file': os.path.relpath(f, base_dir),
+            'backward': int((position < np.maximum.accumulate(position)).sum()),
+            'late_dropped': r['late_dropped'],
+            'batch_bins': int(n_batch),
+            'online_bins': r['anomaly_bins'],
+            'detected': r['detected'],
+            'flag_samples': r['flag_samples'],
+            'samples': r['samples'],
+            'latency_cm': r['latency_cm'],
+            'early_stop_detected': early['detected'],
+        })
+    return pd.DataFrame(rows), elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='온라인 bin 판정 (기록 순서) vs 일괄 판정')
+    parser.add_argument('--sets', default='anomal/set13,normal/set6', help='data 폴더 기준 set (쉼표 구분)')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--lateness', type=float, default=LATENESS, help='bin 을 닫기 전에 기다리는 역행 거리 (cm)')
+    args = parser.parse_args()
+
+    model = load_model()
+    file_list = []
+    for s in args.sets.split(','):
+        kind = s.split('/')[0]   # normal / anomal → normal_*.csv / anomal_*.csv (raw_* 제외)
+        file_list += sorted(glob.glob(os.path.join(base_dir, s, f'{kind}_*.csv')))
+    results, elapsed = compare(file_list, model, args.chunksize, args.lateness)
+    print(results.to_string(index=False))
+
+    agree = (results['batch_bins'] == results['online_bins']).all()
+    agree &= ((results['batch_bins'] > 0) == results['early_stop_detected']).all()
+    detected = results[results['detected']]
+    n_samples = results['samples'].sum()
+    print(f"\n[INFO] baseline {model.version}, {len(results)} runs, 일괄 판정과 {'일치' if agree else '불일치'} "
+          f"(이상 bin 수 / 첫 flag 에서 멈춘 판정, 기록 순서 그대로)")
+    print(f"[INFO] position 역행 샘플 {results['backward'].sum()} 개 ({(results['backward'] > 0).sum()} runs), "
+          f"lateness {args.lateness:g} cm 넘게 늦어서 버린 샘플 {results['late_dropped'].sum()} 개")
+    if len(detected):
+        fraction = detected['flag_samples'] / detected['samples']
+        print(f"[INFO] 이상 {len(detected)} runs: 첫 flag 까지 샘플 {detected['flag_samples'].median():.0f} 개 "
+              f"(중앙값, run 의 {fraction.median() * 100:.0f}%), 거리 {detected['latency_cm'].median():.1f} cm "
+              f"(최소 {detected['latency_cm'].min():.1f} / 최대 {detected['latency_cm'].max():.1f})")
+    print(f"[INFO] 샘플 {n_samples} 개 {elapsed * 1000:.1f} ms ({elapsed / n_samples * 1e6:.2f} us/샘플, 청크 {args.chunksize})")
+    if not agree:
+        raise SystemExit(1)
@@ -1,34 +1,34 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
 import plotly.graph_objects as go
-from io import BytesIO
-from PIL import Image
-import os
-import glob
+from anomaly import bin_runs, tilt_band, tilt_band_check
+from baseline_model import load_model
+
 
 def load_summary_data():
-    data_dir = "data/normal/summary"
-    file_list = glob.glob(os.path.join(data_dir, "summary_pitch_tilt_set[0-5].csv"))
-
-    combined_df = pd.DataFrame()
-    for file in file_list:
-        df = pd.read_csv(file)
-        df['file'] = os.path.basename(file).split('.')[0]
-        df.rename(columns={
-            'position_bin_pitch_tilt': 'position_bin',
-            'mean_pitch': 'pitch',
-            'mean_tilt': 'tilt'
-        }, inplace=True)
-        combined_df = pd.concat([combined_df, df[['position_bin', 'pitch', 'tilt', 'file']]], ignore_index=True)
-
-    return combined_df
+    return load_summary_cached(load_model().version)
 
-def show_pitch(uploaded_data=None):
+
+# baseline 모델 (set0~5 summary_pitch_tilt) 이 바뀔 때만 다시 만듦 (rerun·세션 사이 캐시)
+@st.cache_data(show_spinner=False)
+def load_summary_cached(version):
+    combined_df = load_model().pitch_tilt_summary()
+    combined_df['file'] = 'summary_pitch_tilt_' + combined_df['set_name']
+    combined_df.rename(columns={
+        'position_bin_pitch_tilt': 'position_bin',
+        'mean_pitch': 'pitch',
+        'mean_tilt': 'tilt'
+    }, inplace=True)
+
+    return combined_df[['position_bin', 'pitch', 'tilt', 'file']]
+
+
+# 기본(정상) 그래프 + 20 단위 구간별 tilt 평균/std 도 캐시 (summary 는 한 번만 읽음)
+# st.cache_data 는 호출할 때마다 복사본을 주므로 반환된 fig 에 업로드 trace 를 더해도 캐시는 그대로
+@st.cache_data(show_spinner=False)
+def load_pitch_baseline(version):
     # ✅ 기본 summary 데이터 불러오기
-    summary_df = load_summary_data()
+    summary_df = load_summary_cached(version)
 
     # ✅ 유효 범위로 필터링
     summary_df = summary_df[(summary_df['position_bin'] >= 0.0) & (summary_df['position_bin'] <= 220)]
@@ -42,57 +42,20 @@ def show_pitch(uploaded_data=None):
     merged_df['tilt_upper'] = merged_df['pitch_mean'] + merged_df['tilt_mean'] * scale
     merged_df['tilt_lower'] = merged_df['pitch_mean'] - merged_df['tilt_mean'] * scale
 
-    # ✅ 업로드된 데이터 평균 추가 계산 (있고, 9개 이상일 때만)
-    pitch_mean_uploaded = None
-    if uploaded_data is not None and len(uploaded_data) >= 9:
-
-
-        combined_df_list = []
-        for df in uploaded_data:
-            df['position_bin'] = (df['position'] / 1).round() * 1
-            df = df[(df['position_bin'] >= 0) & (df['position_bin'] <= 220)]
-            combined_df_list.append(df[['position_bin', 'cumulative_pitch']])
-
-        df_uploaded_all = pd.concat(combined_df_list, axis=0)
-        pitch_mean_uploaded = df_uploaded_all.groupby('position_bin')['cumulative_pitch'].mean().reset_index()
-
-
-        combined_tilt_list = []
-        for df in uploaded_data:
-            df['position_bin'] = (df['position'] / 1).round() * 1
-            df = df[(df['position_bin'] >= 0) & (df['position_bin'] <= 220)]
-            if 'tilt' in df.columns:
-                combined_tilt_list.append(df[['position_bin', 'tilt']])
-
-        tilt_band_uploaded = None
-        if combined_tilt_list:
-            df_uploaded_tilt_all = pd.concat(combined_tilt_list, axis=0)
-            tilt_mean_uploaded = df_uploaded_tilt_all.groupby('position_bin')['tilt'].mean().reset_index(name='tilt_mean')
-            pitch_mean_uploaded = pitch_mean_uploaded.rename(columns={'cumulative_pitch': 'pitch_mean'})
-            uploaded_merged = pd.merge(pitch_mean_uploaded, tilt_mean_uploaded, on='position_bin', how='inner')
-            uploaded_merged['tilt_upper'] = uploaded_merged['pitch_mean'] + uploaded_merged['tilt_mean'] * 0.25
-            uploaded_merged['tilt_lower'] = uploaded_merged['pitch_mean'] - uploaded_merged['tilt_mean'] * 0.25
-        else:
-            uploaded_merged = pitch_mean_uploaded.copy()
-            
-            
-            
-            
     # ✅ 그래프 그리기
     fig = go.Figure()
 
     # --- 개별 summary 파일들 (토글로 숨김 처리) ---
-    with st.expander("📁 개별 Summary 파일 보기 (Toggle)", expanded=False):
-        for fname in summary_df['file'].unique():
-            file_data = summary_df[summary_df['file'] == fname]
-            fig.add_trace(go.Scatter(
-                x=file_data['position_bin'],
-                y=file_data['pitch'],
-                mode='lines',
-                name=fname,
-                line=dict(width=1, color='rgba(100,100,100,1)'),
-                visible='legendonly'
-            ))
+    for fname in summary_df['file'].unique():
+        file_data = summary_df[summary_df['file'] == fname]
+        fig.add_trace(go.Scatter(
+            x=file_data['position_bin'],
+            y=file_data['pitch'],
+            mode='lines',
+            name=fname,
+            line=dict(width=1, color='rgba(100,100,100,1)'),
+            visible='legendonly'
+        ))
 
     # --- 평균 pitch ---
     fig.add_trace(go.Scatter(
@@ -124,6 +87,68 @@ def show_pitch(uploaded_data=None):
         showlegend=True
     ))
 
+
+    # --- 레이아웃 ---
+    fig.update_layout(
+        title='🎯 Cumulative Pitch (Mean) with Tilt Band',
+        xaxis_title='Position (m)',
+        yaxis_title='Pitch',
+        width=900,
+        height=500,
+        xaxis=dict(range=[-5, 225]),
+        yaxis=dict(range=[-0.04, 0.06]),
+        legend=dict(
+            orientation='h',
+            yanchor='bottom',
+            y=-0.3,
+            xanchor='center',
+            x=0.5
+        ),
+        template='plotly_white',
+        margin=dict(b=80)
+    )
+
+    # ✅ Summary 데이터 구간별 (0~220, 20 단위) tilt 평균과 std 배열
+    tilt_band_summary = tilt_band(summary_df)
+
+    return fig, tilt_band_summary
+
+
+def show_pitch(uploaded_data=None):
+    # ✅ 기본 그래프 / tilt 구간 통계 (캐시) - 업로드 데이터 부분만 매번 계산
+    version = load_model().version
+    fig, tilt_band_summary = load_pitch_baseline(version)
+
+    # ✅ 업로드된 데이터 평균 추가 계산 (있고, 9개 이상일 때만)
+    # 업로드 데이터는 1cm 로 한 번만 binning (원본 DataFrame 은 바꾸지 않음) → anomaly.bin_runs
+    pitch_mean_uploaded = None
+    binned_uploaded = None
+    if uploaded_data is not None and len(uploaded_data) >= 9:
+        binned_uploaded = bin_runs(uploaded_data)
+        uploaded_mean = binned_uploaded.groupby('position_bin').mean().reset_index()
+        uploaded_mean = uploaded_mean.rename(columns={'cumulative_pitch': 'pitch_mean', 'tilt': 'tilt_mean'})
+        pitch_mean_uploaded = uploaded_mean[['position_bin', 'pitch_mean']]
+
+        if 'tilt_mean' in uploaded_mean.columns:
+            uploaded_merged = uploaded_mean.dropna(subset=['tilt_mean']).reset_index(drop=True)
+            uploaded_merged['tilt_upper'] = uploaded_merged['pitch_mean'] + uploaded_merged['tilt_mean'] * 0.25
+            uploaded_merged['tilt_lower'] = uploaded_merged['pitch_mean'] - uploaded_merged['tilt_mean'] * 0.25
+        else:
+            uploaded_merged = pitch_mean_uploaded.copy()
+
+    # --- 개별 summary 파일들 (토글로 숨김 처리, 그래프 trace 는 캐시된 그래프에 legendonly 로 들어 있음) ---
+    with st.expander("📁 개별 Summary 파일 보기 (Toggle)", expanded=False):
+        summary_df = load_summary_cached(version)
+        file_table = summary_df.groupby('file').agg(
+            bins=('position_bin', 'size'),
+            position_min=('position_bin', 'min'),
+            position_max=('position_bin', 'max'),
+            pitch_mean=('pitch', 'mean'),
+            tilt_mean=('tilt', 'mean'),
+        )
+        st.dataframe(file_table.style.format({'pitch_mean': '{:.4f}', 'tilt_mean': '{:.4f}'}))
+        st.caption(f"범례에서 파일 이름을 누르면 그래프에 표시됩니다 · baseline {version}")
+
     # --- 업로드 데이터 결과 겹쳐 그리기 ---
     if pitch_mean_uploaded is not None:
         fig.add_trace(go.Scatter(
@@ -154,26 +179,6 @@ def show_pitch(uploaded_data=None):
             showlegend=True
         ))
 
-    # --- 레이아웃 ---
-    fig.update_layout(
-        title='🎯 Cumulative Pitch (Mean) with Tilt Band',
-        xaxis_title='Position (m)',
-        yaxis_title='Pitch',
-        width=900,
-        height=500,
-        xaxis=dict(range=[-5, 225]),
-        yaxis=dict(range=[-0.04, 0.06]),
-        legend=dict(
-            orientation='h',
-            yanchor='bottom',
-            y=-0.3,
-            xanchor='center',
-            x=0.5
-        ),
-        template='plotly_white',
-        margin=dict(b=80)
-    )
-
     # ✅ 출력
     st.plotly_chart(fig, use_container_width=True)
 
@@ -183,77 +188,20 @@ def show_pitch(uploaded_data=None):
     elif len(uploaded_data) < 9:
         st.warning(f"⚠️ 데이터 부족: 업로드된 데이터가 9개 미만입니다. (현재 업로드:{len(uploaded_data)}개)")
 
-    if uploaded_data is not None and len(uploaded_data) >= 9:
-
-        # 1. 구간 범위 (0~220, 20 단위)
-        bins = list(range(0, 221, 20))
-
-        # 2. Summary 데이터 구간별 tilt 평균과 std 계산
-        summary_df = load_summary_data()
-        summary_df = summary_df[(summary_df['position_bin'] >= 0) & (summary_df['position_bin'] <= 220)]
+    if binned_uploaded is not None and 'tilt' in binned_uploaded.columns:
 
-        # 구간별로 position_bin을 20단위로 그룹핑하기 위한 열 생성
-        summary_df['bin_group'] = pd.cut(summary_df['position_bin'], bins=bins, right=False, include_lowest=True)
+        # 구간(0~220, 20 단위)별 업로드 tilt 평균 vs 정상 summary 평균 ± 3σ (한 번에 비교) → anomaly.tilt_band_check
+        band_check = tilt_band_check(binned_uploaded, tilt_band_summary)
+        abnormal_bins = band_check[band_check['out_of_band']]
 
-        summary_group = summary_df.groupby('bin_group')['tilt'].agg(['mean', 'std']).reset_index()
-
-        # 3. 업로드된 데이터 tilt 평균 구간별 계산
-        combined_tilt_list = []
-        for df in uploaded_data:
-            df['position_bin'] = (df['position'] / 1).round() * 1
-            df = df[(df['position_bin'] >= 0) & (df['position_bin'] <= 220)]
-            if 'tilt' in df.columns:
-                combined_tilt_list.append(df[['position_bin', 'tilt']])
-
-        df_uploaded_tilt_all = pd.concat(combined_tilt_list, axis=0)
-        df_uploaded_tilt_all['bin_group'] = pd.cut(df_uploaded_tilt_all['position_bin'], bins=bins, right=False, include_lowest=True)
-
-        # 구간별 업로드 데이터 tilt 평균 계산 (파일별 평균 필요시 추가 가능)
-        uploaded_group_mean = df_uploaded_tilt_all.groupby(['bin_group', 'position_bin']).mean().reset_index()
-        # 여기선 단순 구간별 tilt 평균 (전체 평균)로 사용
-        uploaded_bin_mean = df_uploaded_tilt_all.groupby('bin_group')['tilt'].mean().reset_index()
-
-
-        # 4. 이상치 탐지: 업로드 tilt 평균이 summary 평균 ± 3*std 벗어나는 구간 찾기
-        abnormal_bins = []
-        for idx, row in uploaded_bin_mean.iterrows():
-            bin_label = row['bin_group']
-            upload_mean_tilt = row['tilt']
-            summary_stats = summary_group[summary_group['bin_group'] == bin_label]
-
-            if not summary_stats.empty:
-                mean_tilt = summary_stats['mean'].values[0]
-                std_tilt = summary_stats['std'].values[0]
-                if pd.isna(std_tilt) or std_tilt == 0:
-                    std_tilt = 1e-6  # 0일 때 나누기 방지용 아주 작은 수
-
-                upper_limit = mean_tilt + 3 * std_tilt
-                lower_limit = mean_tilt - 3 * std_tilt
-
-                if upload_mean_tilt > upper_limit or upload_mean_tilt < lower_limit:
-            # 이상치 구간 기록 (bin 시작값, 이상치 개수는 대략 1개 이상으로 임의 설정 가능)
-                    bin_start = bins[idx]
-                    abnormal_bins.append((bin_start, 1))
-
-        # 5) 이상치 메시지 출력 (루프 밖으로 분리)
-        total_bins = len(bins) - 1  # 실제 구간 개수 계산 (bins 길이 - 1)
+        # 이상치 메시지 출력
+        total_bins = len(band_check)
         detected_bins = len(abnormal_bins)
 
         if detected_bins > 0:
             st.error(f"🚨 이상 예측 구간 발견: 전체 {total_bins}개 구간 중 {detected_bins}개 구간")
 
-            for bin_start, _ in abnormal_bins:
-                summary_stats = summary_group[summary_group['bin_group'] == pd.Interval(left=bin_start, right=bin_start+20, closed='left')]
-                upload_mean_tilt = uploaded_bin_mean[uploaded_bin_mean['bin_group'] == pd.Interval(left=bin_start, right=bin_start+20, closed='left')]['tilt'].values[0]
-                mean_tilt = summary_stats['mean'].values[0]
-                std_tilt = summary_stats['std'].values[0]
-                if pd.isna(std_tilt) or std_tilt == 0:
-                    std_tilt = 1e-6
-
-                deviation = abs(upload_mean_tilt - mean_tilt)
-                threshold = 3 * std_tilt
-                percent_exceed = (deviation / threshold) * 100
-
-                st.markdown(f"- **{bin_start}~{bin_start+20}m 구간**: Tilt 평균이 3σ 한계치를 {percent_exceed:.1f}% 초과함 ")
+            for row in abnormal_bins.itertuples():
+                st.markdown(f"- **{row.bin_start}~{row.bin_start+20}m 구간**: Tilt 평균이 3σ 한계치를 {row.percent_exceed:.1f}% 초과함 ")
         else:
             st.success(f"✅ 이상 예측 구간 없음: 전체 {total_bins}개 구간 모두 정상 범위(±3σ) 내에 있습니다.")
\ No newline at end of file
@@ -0,0 +1,123 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from storage import atomic_write, file_hash, output_path
+
+### 전체 set 일괄 전처리 (병렬 + 증분)
+# data/normal/set*/raw_*.csv, data/anomal/set*/raw_*.csv 를 모두 찾아
+# 프로세스 풀에서 data_demo.analyze_and_save(headless) 로 처리한다.
+# 입력 파일 해시를 manifest 에 기록해 두고, 바뀌지 않은 run 은 다음 실행에서 건너뛴다.
+# 기본은 전처리 결과 파일이 이미 있는 run 만 다시 만든다 (결과가 없는 원본은 건너뜀).
+# 새 결과 파일이 생기면 matrix.py / bench_detection.py 의 검증 set (glob) 이 바뀌므로 --new 일 때만 만든다.
+#
+# 사용법:
+#   python preprocess.py                 # 바뀐 run 만 처리
+#   python preprocess.py --force         # 전부 다시 처리
+#   python preprocess.py --workers 4 --data-types anomal
+#   python preprocess.py --new           # 결과 파일이 없는 원본도 처리 (새 파일 생성)
+
+base_dir = 'data'
+DATA_TYPES = ('normal', 'anomal')
+MANIFEST_PATH = os.path.join(base_dir, '.preprocess_manifest.json')
+
+
+def discover_runs(data_types=DATA_TYPES):
+    runs = []
+    for data_type in data_types:
+        files = glob.glob(os.path.join(base_dir, data_type, 'set*', 'raw_*.csv'))
+        runs.extend((file_path, data_type) for file_path in sorted(files))
+    return runs
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    atomic_write(path, lambda f: json.dump(manifest, f, indent=1, sort_keys=True), mode='w')
+
+
+# 처리가 필요한지 판단 (mtime/size 가 같으면 해시 계산도 생략)
+# 반환: (처리 필요 여부, 새 manifest 항목)
+def check_run(file_path, entry):
+    stat = os.stat(file_path)
+    info = {'mtime': stat.st_mtime, 'size': stat.st_size}
+    output_exists = entry is not None and os.path.exists(entry.get('output', ''))
+
+    if output_exists and entry['mtime'] == info['mtime'] and entry['size'] == info['size']:
+        return False, entry
+
+    info['sha1'] = file_hash(file_path)
+    if output_exists and entry.get('sha1') == info['sha1']:
+        return False, dict(entry, **info)
+    return True, info
+
+
+# 작업 프로세스에서 실행
+def process_run(file_path, data_type):
+    from data_demo import analyze_and_save
+    return analyze_and_save(file_path, data_type, mode='headless')
+
+
+def main(data_types=DATA_TYPES, workers=None, force=False, manifest_path=MANIFEST_PATH, allow_new=False):
+    start = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+
+    todo = []
+    new_entries = {}
+    no_output = []
+    for file_path, data_type in discover_runs(data_types):
+        if not allow_new and not os.path.exists(output_path(file_path, data_type)):
+            no_output.append(file_path)
+            continue
+        needed, info = check_run(file_path, None if force else manifest.get(file_path))
+        if needed:
+            todo.append((file_path, data_type))
+        new_entries[file_path] = info
+
+    skipped = len(new_entries) - len(todo)
+    print(f"[INFO] {len(new_entries)} runs found, {len(todo)} to process, {skipped} unchanged")
+    if no_output:
+        print(f"[INFO] 전처리 결과가 없는 원본 {len(no_output)}개 건너뜀 (--new 로 새로 만들 수 있음)")
+
+    failed = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_run, file_path, data_type): file_path for file_path, data_type in todo}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    new_entries[file_path]['output'] = future.result()
+                except Exception as e:
+                    print(f"[ERROR] {file_path}: {e}")
+                    failed.append(file_path)
+
+    # 실패한 run 은 manifest 에 남기지 않아 다음 실행에서 다시 시도
+    for file_path in failed:
+        new_entries.pop(file_path)
+    # 이번에 다루지 않은 data_type 항목은 유지
+    manifest = {k: v for k, v in manifest.items() if k not in new_entries and os.path.exists(k)}
+    manifest.update(new_entries)
+    save_manifest(manifest, manifest_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] processed {len(todo) - len(failed)}, failed {len(failed)}, skipped {skipped} in {elapsed:.2f}s")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='data/*/set*/raw_*.csv 일괄 전처리')
+    parser.add_argument('--data-types', nargs='+', choices=DATA_TYPES, default=list(DATA_TYPES))
+    parser.add_argument('--workers', type=int, default=None, help='프로세스 수 (기본: CPU 코어 수)')
+    parser.add_argument('--force', action='store_true', help='manifest 무시하고 전부 다시 처리')
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    parser.add_argument('--new', action='store_true', help='전처리 결과 파일이 없는 원본도 처리 (검증 set 이 바뀔 수 있음)')
+    args = parser.parse_args()
+    failed = main(args.data_types, args.workers, args.force, args.manifest, args.new)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,248 @@
+import argparse
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+from sketch import BinnedMoments, SparseBinnedSketch
+from storage import atomic_write, files_signature, read_run
+
+### 다해상도 summary 피라미드 (set 별로 한 번만 계산)
+# 소비하는 코드마다 같은 데이터를 다른 bin 으로 다시 묶고 있음:
+#   data_add.py 10cm(round) / pitch·tilt 1cm(round) / gyro.py, pitch.py 20cm(floor) / matrix.py 30cm, 0.3cm(floor)
+# 가장 작은 단위 FINEST_BIN(0.1cm, floor) 칸마다 병합 가능한 통계를 한 번 만들어 두고, 더 큰 bin 은 칸 통계를 합쳐서 만든다.
+# (칸 경계가 0.1 의 배수라서 위 bin 들은 모두 칸 단위로 정확히 나뉨)
+# - 가장 작은 level: set / 채널 / 칸 별 개수·평균·M2·최소·최대 (sketch.BinnedMoments) + 분위수 sketch (SparseBinnedSketch)
+#   큰 bin / 여러 set 은 원본 값 없이 이 통계끼리 병합 (regroup / merge) → run 추가도 그 run 만큼만 계산
+# - 평균 / std / 최소 / 최대는 원본으로 계산한 것과 부동소수점 오차 수준에서 같고, 분위수는 sketch 상대오차 1% 이내
+#   (q25 / q75 는 sketch 근사값 → 여기서 만든 IQR 상한선은 binstats 로 정확히 계산한 summary_gyro 의 upper_bound_gyro 와 다름)
+# - 지금 읽는 곳은 sweep.py (학습 set 10cm Q1/Q3) 뿐. gyro.py / pitch.py / matrix.py / anomaly.py 는
+#   summary CSV / baseline 모델 (정확한 상한선) 을 20 / 30 / 0.3cm 로 직접 다시 묶는다
+# - LEVELS 의 bin 들은 미리 계산해서 같은 파일(PYRAMID_PATH)에 저장 → level() 은 바로 반환
+# - 그 밖의 bin (0.1 의 배수) 은 가장 작은 level 에서 바로 만든다 (CSV 다시 읽지 않음)
+# - 파일에 원본 run 목록의 files_signature 를 같이 저장 → load_pyramid 는 run 이 바뀌었으면 다시 만든다
+# bin 경계에 정확히 걸친 값(부동소수점)은 원래 코드와 1칸 차이 날 수 있음
+
+base_dir = 'data'
+PYRAMID_PATH = os.path.join(base_dir, 'normal', 'summary', 'summary_pyramid.npz')
+FORMAT_VERSION = 2
+
+FINEST_BIN = 0.1
+CHANNELS = ['gyro', 'cumulative_pitch', 'tilt']
+QUANTILES = (0.25, 0.75)
+# (bin 크기, 'round' | 'floor')
+LEVELS = [(0.3, 'floor'), (1, 'round'), (10, 'round'), (20, 'floor'), (30, 'floor')]
+
+
+def cell_index(position):
+    return np.floor(np.asarray(position, dtype=float) / FINEST_BIN).astype(np.int64)
+
+
+# 칸 번호 → bin 라벨
+# round: (position / bin_size).round() * bin_size 와 같은 bin, floor: floor(position / bin_size) * bin_size
+def cell_labels(cells, bin_size, how='round'):
+    cells = np.asarray(cells).astype(np.int64)
+    m = int(round(bin_size / FINEST_BIN))
+    if m < 1 or not np.isclose(m * FINEST_BIN, bin_size):
+        raise ValueError(f'bin_size {bin_size} 는 {FINEST_BIN} 의 배수여야 함')
+    if how == 'floor':
+        return (cells // m) * bin_size
+    if how == 'round':
+        if m % 2:
+            raise ValueError(f'round bin {bin_size} 는 경계가 {FINEST_BIN} 칸 가운데에 걸림 (floor 사용)')
+        return ((cells + m // 2) // m) * bin_size
+    raise ValueError(f"how 는 'round' 또는 'floor': {how}")
+
+
+def level_key(bin_size, how):
+    return f'{float(bin_size):g}{how}'
+
+
+# data/normal/set*/normal_*.csv (피라미드 원본 run 목록)
+def source_files(folder=os.path.join(base_dir, 'normal'), set_pattern='set*'):
+    return sorted(glob.glob(os.path.join(folder, set_pattern, 'normal_*.csv')))
+
+
+class SummaryPyramid:
+    def __init__(self, sources=None):
+        self.moments = {}   # {set_name: {channel: BinnedMoments (bin = 칸 번호)}}
+        self.sketches = {}  # {set_name: {channel: SparseBinnedSketch (bin = 칸 번호)}}
+        self.levels = {}    # {(set_names, bin_size, how): DataFrame}
+        self.sources = sources  # 원본 run 의 files_signature (JSON 목록) - 모르면 None
+
+    @property
+    def set_names(self):
+        return sorted(self.moments)
+
+    def n_rows(self, set_name):
+        return int(self.moments[set_name]['gyro'].count.sum())
+
+    def add_run(self, set_name, df):
+        df = df[df['position'].notna()]
+        cells = cell_index(df['position'])
+        moments = self.moments.setdefault(set_name, {col: BinnedMoments() for col in CHANNELS})
+        sketches = self.sketches.setdefault(set_name, {col: SparseBinnedSketch() for col in CHANNELS})
+        for col in CHANNELS:
+            values = df[col].to_numpy(dtype=float)
+            moments[col].update(cells, values)
+            sketches[col].update(cells, values)
+        # 이 set 이 들어간 level 은 다시 계산
+        self.levels = {key: df for key, df in self.levels.items() if set_name not in key[0]}
+        return self
+
+    # set_names: 'set0' 또는 ['set0', 'set1', ...] (여러 set 을 합친 bin 통계)
+    # 반환: position_bin + 채널별 count_/mean_/std_/min_/max_/q25_/q75_ 열
+    def level(self, set_names, bin_size, how='round'):
+        set_names = (set_names,) if isinstance(set_names, str) else tuple(set_names)
+        key = (set_names, float(bin_size), how)
+        if key not in self.levels:
+            self.levels[key] = self.compute_level(set_names, bin_size, how)
+        return self.levels[key]
+
+    # 칸 통계 → (set 병합) → bin 으로 regroup
+    def compute_level(self, set_names, bin_size, how):
+        missing = [s for s in set_names if s not in self.moments]
+        if missing:
+            raise KeyError(f'피라미드에 없는 set: {missing}')
+        stats = {}
+        for col in CHANNELS:
+            if len(set_names) == 1:     # set 하나면 병합 없이 그대로 (regroup 은 새 객체를 만듦)
+                moments, sketch = self.moments[set_names[0]][col], self.sketches[set_names[0]][col]
+            else:
+                moments = BinnedMoments()
+                sketch = SparseBinnedSketch()
+                for s in set_names:
+                    moments.merge(self.moments[s][col])
+                    sketch.merge(self.sketches[s][col])
+            coarse = moments.regroup(cell_labels(moments.bins, bin_size, how))
+            coarse_sketch = sketch.regroup(cell_labels(np.unique(sketch.bins), bin_size, how))
+            columns = {'count': coarse.count, 'mean': coarse.mean, 'std': coarse.std(), 'min': coarse.min, 'max': coarse.max}
+            for q in QUANTILES:
+                bins, values = coarse_sketch.quantile(q)
+                columns[f'q{round(q * 100)}'] = values[np.searchsorted(bins, coarse.bins)]
+            stats[col] = (coarse.bins, columns)
+
+        # 채널마다 값이 있는 bin 이 다를 수 있음 → bin 합집합에 맞춰 채움 (없는 칸은 NaN, merge how='outer' 와 같음)
+        position_bin = np.unique(np.concatenate([bins for bins, _ in stats.values()]))
+        summary = {'position_bin': position_bin}
+        for col, (bins, columns) in stats.items():
+            rows = np.searchsorted(position_bin, bins)
+            for name, values in columns.items():
+                full = np.full(len(position_bin), np.nan)
+                full[rows] = values
+                summary[f'{name}_{col}'] = full
+        summary = pd.DataFrame(summary)
+        for col in stats:   # 모든 채널이 모든 bin 에 있으면 개수는 정수
+            if not summary[f'count_{col}'].isna().any():
+                summary[f'count_{col}'] = summary[f'count_{col}'].astype(np.int64)
+        return summary
+
+    def build_levels(self, levels=LEVELS):
+        for set_name in self.set_names:
+            for bin_size, how in levels:
+                self.level(set_name, bin_size, how)
+        return self
+
+    # 가장 작은 level (칸 통계) + 미리 계산한 level (단일 set) + 원본 signature 를 파일 하나에 저장
+    def save(self, path=PYRAMID_PATH):
+        arrays = {'meta': np.array(json.dumps({'format': FORMAT_VERSION, 'sources': self.sources}))}
+        for set_name in self.set_names:
+            for col in CHANNELS:
+                for key, value in self.moments[set_name][col].to_arrays().items():
+                    arrays[f'{set_name}/moments/{col}/{key}'] = value
+                for key, value in self.sketches[set_name][col].to_arrays().items():
+                    arrays[f'{set_name}/sketch/{col}/{key}'] = value
+        for (set_names, bin_size, how), summary in self.levels.items():
+            if len(set_names) != 1:
+                continue
+            for col in summary.columns:
+                arrays[f'{set_names[0]}/level/{level_key(bin_size, how)}/{col}'] = summary[col].to_numpy()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write(path, lambda f: np.savez(f, **arrays))
+
+    @classmethod
+    def load(cls, path=PYRAMID_PATH):
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta'])) if 'meta' in npz.files else {}
+            if meta.get('format') != FORMAT_VERSION:
+                raise ValueError(f"피라미드 형식이 다름: {meta.get('format')} (필요: {FORMAT_VERSION})")
+            pyramid = cls(meta['sources'])
+            grouped = {}
+            for key in npz.files:
+                if key == 'meta':
+                    continue
+                set_name, kind, rest = key.split('/', 2)
+                grouped.setdefault((set_name, kind), {})[rest] = npz[key]
+        level_arrays = {}
+        for (set_name, kind), items in grouped.items():
+            if kind == 'level':
+                for rest, value in items.items():
+                    name, col = rest.split('/')
+                    level_arrays.setdefault((set_name, name), {})[col] = value
+                continue
+            target = pyramid.moments if kind == 'moments' else pyramid.sketches
+            stats_cls = BinnedMoments if kind == 'moments' else SparseBinnedSketch
+            target[set_name] = {col: stats_cls.from_arrays({k.split('/')[1]: v for k, v in items.items()
+                                                            if k.startswith(f'{col}/')})
+                                for col in CHANNELS}
+        # 저장된 level 은 다시 계산하지 않음
+        for bin_size, how in LEVELS:
+            for set_name in pyramid.set_names:
+                arrays = level_arrays.get((set_name, level_key(bin_size, how)))
+                if arrays is not None:
+                    pyramid.levels[((set_name,), float(bin_size), how)] = pd.DataFrame(arrays)
+        return pyramid
+
+
+def signature_json(file_list):
+    return [list(entry) for entry in files_signature(file_list)]
+
+
+# load_sets 결과 ({set_name: [(base_name, df), ...]}) 로 만들기
+# sources: 그 run 들의 파일 목록 (signature 를 같이 저장 → load_pyramid 가 최신인지 확인)
+def build_pyramid(sets, levels=LEVELS, sources=None):
+    pyramid = SummaryPyramid(signature_json(sources) if sources is not None else None)
+    for set_name, runs in sets.items():
+        if runs:    # set 의 run 을 한 번에 (칸 통계 정렬 1번)
+            pyramid.add_run(set_name, pd.concat([df[['position', *CHANNELS]] for _, df in runs], ignore_index=True))
+    return pyramid.build_levels(levels)
+
+
+# 저장된 피라미드가 지금 data/normal/set* run 으로 만든 것이면 읽고, 아니면 (없음 / 형식 다름 / run 바뀜) 새로 만들어 저장
+def load_pyramid(path=PYRAMID_PATH, folder=os.path.join(base_dir, 'normal'), set_pattern='set*'):
+    file_list = source_files(folder, set_pattern)
+    sources = signature_json(file_list)
+    if os.path.exists(path):
+        try:
+            pyramid = SummaryPyramid.load(path)
+            if pyramid.sources == sources:
+                return pyramid
+            print(f"[INFO] 원본 run 이 바뀌어서 피라미드 다시 만듦: {path}")
+        except (OSError, ValueError, KeyError):
+            print(f"[INFO] 피라미드 파일을 읽을 수 없어서 다시 만듦: {path}")
+    pyramid = SummaryPyramid(sources)
+    runs = {}
+    for file_path in file_list:
+        runs.setdefault(os.path.basename(os.path.dirname(file_path)), []).append(
+            read_run(file_path, columns=['position', *CHANNELS]))
+    for set_name, frames in runs.items():
+        pyramid.add_run(set_name, pd.concat(frames, ignore_index=True))
+    pyramid.build_levels().save(path)
+    return pyramid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='다해상도 summary 피라미드')
+    parser.add_argument('--path', default=PYRAMID_PATH)
+    parser.add_argument('--rebuild', action='store_true', help='저장된 파일 무시하고 새로 만들기')
+    parser.add_argument('--show', nargs=3, metavar=('SETS', 'BIN_SIZE', 'HOW'),
+                        help="예: --show set0,set1 20 floor")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path):
+        os.remove(args.path)
+    pyramid = load_pyramid(args.path)
+    print(f"[INFO] {len(pyramid.set_names)} sets, {sum(pyramid.n_rows(s) for s in pyramid.set_names)} rows → {args.path}")
+    if args.show:
+        set_names, bin_size, how = args.show
+        print(pyramid.level(set_names.split(','), float(bin_size), how).to_string(index=False))
@@ -0,0 +1,67 @@
+import numpy as np
+
+### 충격(방지턱) 구간 검출 - 마스크 경계(run-length) 기반
+# data_demo.clean_run 에서 안정 구간을 자를 때 사용하고,
+# 대시보드 / 탐지 코드에서도 같은 함수를 그대로 쓸 수 있다.
+
+
+# --- 연속 True 구간 찾기 ---
+# mask: bool 1차원 배열
+# 반환: [(start, end), ...]  (end 는 포함하지 않음, 길이 >= min_length 인 구간만)
+def find_regions(mask, min_length=1):
+    mask = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_length
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+# --- 여러 run 한번에 ---
+# masks: bool 2차원 배열 (run × 샘플, 짧은 run 은 False 로 패딩) 또는 1차원 배열 리스트
+# 반환: run 별 [(start, end), ...] 리스트
+def find_regions_batch(masks, min_length=1):
+    if not isinstance(masks, np.ndarray):
+        width = max(len(m) for m in masks)
+        padded = np.zeros((len(masks), width), dtype=bool)
+        for i, m in enumerate(masks):
+            padded[i, :len(m)] = m
+        masks = padded
+    masks = np.asarray(masks, dtype=bool)
+
+    n_runs = masks.shape[0]
+    framed = np.zeros((n_runs, masks.shape[1] + 2), dtype=np.int8)
+    framed[:, 1:-1] = masks
+    edges = np.diff(framed, axis=1)
+
+    # 행 우선 순서라 같은 run 안에서 시작/끝이 번갈아 나옴
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    keep = ends - starts >= min_length
+    start_rows, starts, ends = start_rows[keep], starts[keep], ends[keep]
+
+    split_at = np.searchsorted(start_rows, np.arange(1, n_runs))
+    return [list(zip(s.tolist(), e.tolist()))
+            for s, e in zip(np.split(starts, split_at), np.split(ends, split_at))]
+
+
+# --- 첫 충격 끝 ~ 마지막 충격 시작 사이 안정 구간 ---
+# 반환: (stable_start_idx, stable_end_idx) (둘 다 포함), 충격 구간이 없으면 None
+def stable_segment(regions, n_samples, buffer_samples=0):
+    if len(regions) < 1:
+        return None
+    # 첫 충격 끝 이후 안정 구간 시작
+    first_shock_end = regions[0][1]
+    # 마지막 충격 시작 이전 안정 구간 끝
+    last_shock_start = regions[-1][0]
+
+    stable_start_idx = min(first_shock_end + buffer_samples, n_samples - 1)
+    stable_end_idx = max(last_shock_start - buffer_samples, 0)
+    return stable_start_idx, stable_end_idx
+
+
+# --- 임계값 → 충격 구간 → 안정 구간 한번에 ---
+# signal: smoothing 된 gyro 크기 등
+def detect_stable_segment(signal, threshold, min_length, buffer_samples=0):
+    regions = find_regions(np.asarray(signal) > threshold, min_length)
+    return regions, stable_segment(regions, len(signal), buffer_samples)
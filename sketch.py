@@ -0,0 +1,289 @@
+import numpy as np
+
+### position_bin 별 병합 가능한 통계 (증분 업데이트 / set 간 병합용)
+# - BinnedMoments: bin 별 개수, 평균, 제곱편차합(M2), 최소, 최대 (Welford / Chan 병합 공식)
+# - BinnedSketch: bin 별 로그 버킷 히스토그램 (DDSketch 방식) 으로 분위수 근사
+#   상대오차 RELATIVE_ACCURACY 이내, 버킷 개수를 더하기만 하면 병합됨
+# - SparseBinnedSketch: BinnedSketch 와 같은 버킷을 (bin, 버킷, 개수) 로 비어 있지 않은 칸만 저장
+#   bin 이 아주 많고 bin 당 값이 적을 때 (pyramid.py 의 0.1cm 칸) 용
+# 모든 클래스가 bin 라벨은 정렬된 float 배열로 들고 있고, 새 bin 이 들어오면 자동으로 늘어난다.
+# regroup(labels): bin 을 더 큰 bin 으로 묶은 새 객체 (원본 값 없이 통계만 병합)
+
+RELATIVE_ACCURACY = 0.01
+MIN_VALUE = 1e-6    # 이보다 작은 |x| 는 0 버킷
+MAX_VALUE = 1e3
+
+
+# bin 라벨 합집합 + 기존 배열을 새 위치로 옮길 인덱스
+def union_bins(old_bins, new_bins):
+    bins = np.union1d(old_bins, new_bins)
+    return bins, np.searchsorted(bins, old_bins)
+
+
+# bin 라벨 별로 묶기: (정렬된 고유 bin, 각 값의 bin 인덱스)
+def group_index(bin_values):
+    return np.unique(np.asarray(bin_values, dtype=float), return_inverse=True)
+
+
+class BinnedMoments:
+    def __init__(self):
+        self.bins = np.empty(0)
+        self.count = np.empty(0)
+        self.mean = np.empty(0)
+        self.m2 = np.empty(0)
+        self.min = np.empty(0)
+        self.max = np.empty(0)
+
+    # 값들로 bin 별 통계를 만들어 병합 (O(len(values)))
+    def update(self, bin_values, values):
+        values = np.asarray(values, dtype=float)
+        ok = ~np.isnan(values)
+        bins, inverse = group_index(np.asarray(bin_values, dtype=float)[ok])
+        values = values[ok]
+        if len(values) == 0:
+            return self
+
+        other = BinnedMoments()
+        other.bins = bins
+        other.count = np.bincount(inverse, minlength=len(bins)).astype(float)
+        other.mean = np.bincount(inverse, weights=values, minlength=len(bins)) / other.count
+        other.m2 = np.bincount(inverse, weights=(values - other.mean[inverse]) ** 2, minlength=len(bins))
+        other.min = np.full(len(bins), np.inf)
+        other.max = np.full(len(bins), -np.inf)
+        np.minimum.at(other.min, inverse, values)
+        np.maximum.at(other.max, inverse, values)
+        return self.merge(other)
+
+    # 병렬 분산 병합 (Chan et al.)
+    def merge(self, other):
+        bins, self_idx = union_bins(self.bins, other.bins)
+        other_idx = np.searchsorted(bins, other.bins)
+
+        count = np.zeros(len(bins))
+        mean = np.zeros(len(bins))
+        m2 = np.zeros(len(bins))
+        vmin = np.full(len(bins), np.inf)
+        vmax = np.full(len(bins), -np.inf)
+        count[self_idx] = self.count
+        mean[self_idx] = self.mean
+        m2[self_idx] = self.m2
+        vmin[self_idx] = self.min
+        vmax[self_idx] = self.max
+
+        n_a = count[other_idx]
+        n_b = other.count
+        n = n_a + n_b
+        delta = other.mean - mean[other_idx]
+        mean[other_idx] = mean[other_idx] + delta * n_b / n
+        m2[other_idx] = m2[other_idx] + other.m2 + delta ** 2 * n_a * n_b / n
+        count[other_idx] = n
+        vmin[other_idx] = np.minimum(vmin[other_idx], other.min)
+        vmax[other_idx] = np.maximum(vmax[other_idx], other.max)
+
+        self.bins, self.count, self.mean, self.m2, self.min, self.max = bins, count, mean, m2, vmin, vmax
+        return self
+
+    # labels: bin 별 새 라벨 (self.bins 와 같은 길이) → 같은 라벨끼리 병합한 새 객체
+    def regroup(self, labels):
+        bins, inverse = group_index(labels)
+        out = BinnedMoments()
+        out.bins = bins
+        out.count = np.bincount(inverse, weights=self.count, minlength=len(bins))
+        out.mean = np.bincount(inverse, weights=self.count * self.mean, minlength=len(bins)) / out.count
+        out.m2 = np.bincount(inverse, weights=self.m2 + self.count * (self.mean - out.mean[inverse]) ** 2,
+                             minlength=len(bins))
+        out.min = np.full(len(bins), np.inf)
+        out.max = np.full(len(bins), -np.inf)
+        np.minimum.at(out.min, inverse, self.min)
+        np.maximum.at(out.max, inverse, self.max)
+        return out
+
+    # 표본 표준편차 (pandas std 와 같은 ddof=1)
+    def std(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan))
+
+    def to_arrays(self):
+        return {'bins': self.bins, 'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        obj = cls()
+        for key in ['bins', 'count', 'mean', 'm2', 'min', 'max']:
+            setattr(obj, key, np.asarray(arrays[key], dtype=float))
+        return obj
+
+
+class BinnedSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, min_value=MIN_VALUE, max_value=MAX_VALUE):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.offset = int(np.ceil(np.log(min_value) / self.log_gamma))
+        # 버킷 0 = |x| < min_value, 1.. = 로그 버킷
+        self.n_buckets = int(np.ceil(np.log(max_value) / self.log_gamma)) - self.offset + 2
+        self.bins = np.empty(0)
+        self.pos = np.zeros((0, self.n_buckets), dtype=np.int64)
+        self.neg = np.zeros((0, self.n_buckets), dtype=np.int64)
+
+    def bucket_index(self, magnitude):
+        with np.errstate(divide='ignore'):
+            k = np.ceil(np.log(np.maximum(magnitude, self.min_value)) / self.log_gamma).astype(np.int64) - self.offset + 1
+        k = np.clip(k, 1, self.n_buckets - 1)
+        return np.where(magnitude < self.min_value, 0, k)
+
+    # 버킷 대표값 (버킷 0 은 0)
+    def bucket_values(self):
+        k = np.arange(self.n_buckets) + self.offset - 1
+        values = 2 * self.gamma ** k / (self.gamma + 1)
+        values[0] = 0.0
+        return values
+
+    def grow(self, new_bins):
+        bins, idx = union_bins(self.bins, new_bins)
+        if len(bins) != len(self.bins):
+            pos = np.zeros((len(bins), self.n_buckets), dtype=np.int64)
+            neg = np.zeros((len(bins), self.n_buckets), dtype=np.int64)
+            pos[idx] = self.pos
+            neg[idx] = self.neg
+            self.bins, self.pos, self.neg = bins, pos, neg
+
+    def update(self, bin_values, values):
+        values = np.asarray(values, dtype=float)
+        ok = ~np.isnan(values)
+        bin_values = np.asarray(bin_values, dtype=float)[ok]
+        values = values[ok]
+        self.grow(np.unique(bin_values))
+        rows = np.searchsorted(self.bins, bin_values)
+        cols = self.bucket_index(np.abs(values))
+        negative = values < 0
+        np.add.at(self.pos, (rows[~negative], cols[~negative]), 1)
+        np.add.at(self.neg, (rows[negative], cols[negative]), 1)
+        return self
+
+    def merge(self, other):
+        if other.n_buckets != self.n_buckets or other.gamma != self.gamma:
+            raise ValueError('sketch 설정(relative_accuracy, 범위)이 다르면 병합할 수 없음')
+        self.grow(other.bins)
+        rows = np.searchsorted(self.bins, other.bins)
+        self.pos[rows] += other.pos
+        self.neg[rows] += other.neg
+        return self
+
+    def count(self):
+        return self.pos.sum(axis=1) + self.neg.sum(axis=1)
+
+    # bin 별 q 분위수 (모든 bin 한번에)
+    def quantile(self, q):
+        values = self.bucket_values()
+        # 작은 값부터: 음수(큰 버킷부터) → 0 → 양수
+        counts = np.concatenate([self.neg[:, :0:-1], (self.neg[:, :1] + self.pos[:, :1]), self.pos[:, 1:]], axis=1)
+        ordered = np.concatenate([-values[:0:-1], [0.0], values[1:]])
+        cum = np.cumsum(counts, axis=1)
+        total = cum[:, -1]
+        # pandas 기본(linear) 과 같이 floor(rank), ceil(rank) 번째 값 사이를 선형 보간
+        rank = q * np.maximum(total - 1, 0)
+        lo = np.floor(rank)
+        last = len(ordered) - 1
+        v_lo = ordered[np.minimum((cum <= lo[:, None]).sum(axis=1), last)]
+        v_hi = ordered[np.minimum((cum <= np.ceil(rank)[:, None]).sum(axis=1), last)]
+        result = v_lo + (rank - lo) * (v_hi - v_lo)
+        return np.where(total > 0, result, np.nan)
+
+    def to_arrays(self):
+        pos_rows, pos_cols = np.nonzero(self.pos)
+        neg_rows, neg_cols = np.nonzero(self.neg)
+        return {
+            'bins': self.bins,
+            'config': np.array([self.relative_accuracy, self.min_value, self.max_value]),
+            'pos_index': np.stack([pos_rows, pos_cols]), 'pos_count': self.pos[pos_rows, pos_cols],
+            'neg_index': np.stack([neg_rows, neg_cols]), 'neg_count': self.neg[neg_rows, neg_cols],
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        relative_accuracy, min_value, max_value = arrays['config']
+        obj = cls(relative_accuracy, min_value, max_value)
+        obj.bins = np.asarray(arrays['bins'], dtype=float)
+        obj.pos = np.zeros((len(obj.bins), obj.n_buckets), dtype=np.int64)
+        obj.neg = np.zeros((len(obj.bins), obj.n_buckets), dtype=np.int64)
+        obj.pos[tuple(arrays['pos_index'])] = arrays['pos_count']
+        obj.neg[tuple(arrays['neg_index'])] = arrays['neg_count']
+        return obj
+
+
+class SparseBinnedSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, min_value=MIN_VALUE, max_value=MAX_VALUE):
+        self.scheme = BinnedSketch(relative_accuracy, min_value, max_value)  # 버킷 규칙만 사용
+        # (bin, 부호 있는 버킷 번호) 오름차순, 중복 없음 - 음수 값은 -버킷, 0 버킷은 0
+        self.bins = np.empty(0)
+        self.codes = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def config(self):
+        return self.scheme.relative_accuracy, self.scheme.min_value, self.scheme.max_value
+
+    def empty_like(self):
+        return SparseBinnedSketch(*self.config())
+
+    # 같은 (bin, 버킷) 끼리 합쳐서 정렬
+    def set_entries(self, bins, codes, counts):
+        order = np.lexsort((codes, bins))
+        bins, codes, counts = bins[order], codes[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, (bins[1:] != bins[:-1]) | (codes[1:] != codes[:-1])]) if len(bins) else []
+        self.bins = bins[starts]
+        self.codes = codes[starts]
+        self.counts = np.add.reduceat(counts, starts) if len(bins) else counts
+        return self
+
+    def update(self, bin_values, values):
+        values = np.asarray(values, dtype=float)
+        ok = ~np.isnan(values)
+        values = values[ok]
+        codes = self.scheme.bucket_index(np.abs(values)) * np.where(values < 0, -1, 1)
+        return self.set_entries(np.concatenate([self.bins, np.asarray(bin_values, dtype=float)[ok]]),
+                                np.concatenate([self.codes, codes]),
+                                np.concatenate([self.counts, np.ones(len(values), dtype=np.int64)]))
+
+    def merge(self, other):
+        if other.config() != self.config():
+            raise ValueError('sketch 설정(relative_accuracy, 범위)이 다르면 병합할 수 없음')
+        return self.set_entries(np.concatenate([self.bins, other.bins]), np.concatenate([self.codes, other.codes]),
+                                np.concatenate([self.counts, other.counts]))
+
+    # labels: 고유 bin (np.unique(self.bins)) 별 새 라벨
+    def regroup(self, labels):
+        bins, inverse = np.unique(self.bins, return_inverse=True)
+        if len(labels) != len(bins):
+            raise ValueError('labels 는 고유 bin 개수와 같아야 함')
+        return self.empty_like().set_entries(np.asarray(labels, dtype=float)[inverse], self.codes, self.counts)
+
+    # 반환: (정렬된 bin, bin 별 q 분위수) - BinnedSketch.quantile 과 같은 보간
+    def quantile(self, q):
+        if len(self.bins) == 0:
+            return np.empty(0), np.empty(0)
+        starts = np.flatnonzero(np.r_[True, self.bins[1:] != self.bins[:-1]])
+        total = np.add.reduceat(self.counts, starts)
+        cum = np.cumsum(self.counts)
+        before = cum[starts] - self.counts[starts]
+        rank = q * np.maximum(total - 1, 0)
+        lo = np.floor(rank)
+        bucket_values = self.scheme.bucket_values()
+        values = np.sign(self.codes) * bucket_values[np.abs(self.codes)]
+        v_lo = values[np.searchsorted(cum, before + lo, side='right')]
+        v_hi = values[np.searchsorted(cum, before + np.ceil(rank), side='right')]
+        return self.bins[starts], v_lo + (rank - lo) * (v_hi - v_lo)
+
+    def to_arrays(self):
+        return {'bins': self.bins, 'config': np.array(self.config()), 'codes': self.codes, 'counts': self.counts}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        obj = cls(*arrays['config'])
+        obj.bins = np.asarray(arrays['bins'], dtype=float)
+        obj.codes = np.asarray(arrays['codes'], dtype=np.int64)
+        obj.counts = np.asarray(arrays['counts'], dtype=np.int64)
+        return obj
@@ -0,0 +1,166 @@
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+### run CSV 컬럼형 캐시 (.npy + .json)
+# 처음 읽을 때 CSV 를 타입이 있는 numpy 배열로 바꿔 data/.cache 아래에 저장하고,
+# 다음부터는 CSV 파싱 없이 배열을 바로 읽는다.
+# - 모든 열이 같은 숫자 타입이면 2차원 배열 하나 (가장 빠름, 현재 데이터는 전부 float64)
+# - 아니면 열 이름이 들어간 structured 배열 (문자열 열의 빈 값은 '<열>.isna' bool 필드로 따로 저장)
+# 원본 CSV 의 mtime/size 가 바뀌면 sha1 을 다시 계산해서, 내용이 바뀐 경우에만 다시 만든다.
+# (pyarrow 없이 numpy 만으로 동작하도록 .npy 사용)
+# 여러 프로세스 / 대시보드 세션이 같은 캐시를 동시에 만들 수 있으므로 임시 파일은 mkstemp 로 (이름 겹치지 않게) 만든 뒤 교체
+
+base_dir = 'data'
+CACHE_DIR = os.path.join(base_dir, '.cache')
+CACHE_FORMAT = 2    # 바뀌면 기존 캐시를 다시 만듦
+NA_SUFFIX = '.isna'
+
+
+def file_hash(file_path):
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# 전처리 결과 저장 경로 (원본과 같은 폴더, raw_ 를 뗀 이름): data/normal/set0/raw_normal_1.csv → data/normal/set0/normal_1.csv
+# data_demo.analyze_and_save 와 preprocess.py 가 같이 씀 (preprocess 는 무거운 data_demo 를 작업 프로세스에서만 import)
+def output_path(file_path, data_type):
+    original_base = os.path.join(base_dir, 'normal' if data_type == 'normal' else 'anomal')
+
+    rel_path = os.path.relpath(file_path, original_base)  # 예: set0/normal_1.csv
+    set_folder, filename = os.path.split(rel_path)        # ('set0', 'normal_1.csv')
+
+    # raw_anomal_1.csv → anomal_1.csv (raw_normal_ 도 같은 규칙, 원본 덮어쓰기 방지)
+    if filename.startswith('raw_'):
+        filename = filename[len('raw_'):]
+
+    return os.path.join(original_base, set_folder, filename)   # 원래 위치, 이름 그대로 저장
+
+
+# data/normal/set0/normal_0.csv → data/.cache/normal/set0/normal_0 (.npy / .json)
+# data 폴더 밖의 파일은 절대경로 해시로 이름을 만든다
+def cache_path(file_path, cache_dir=CACHE_DIR):
+    abs_path = os.path.abspath(file_path)
+    rel_path = os.path.relpath(abs_path, os.path.abspath(os.path.dirname(cache_dir)))
+    if rel_path.startswith('..'):
+        rel_path = os.path.join('_external', hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:16],
+                                os.path.basename(abs_path))
+    return os.path.join(cache_dir, os.path.splitext(rel_path)[0])
+
+
+def source_stat(file_path):
+    stat = os.stat(file_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+# 파일 목록의 (경로, mtime, size) - 파일이 바뀌었는지 확인하는 캐시 키로 사용 (dashboard 등)
+def files_signature(file_list):
+    return tuple((file_path, *source_stat(file_path).values()) for file_path in sorted(file_list))
+
+
+def to_array(df):
+    dtypes = set(df.dtypes)
+    if len(dtypes) == 1 and next(iter(dtypes)).kind in 'biuf':
+        return df.to_numpy()
+    # 숫자가 아닌 열은 유니코드 문자열로 저장 (pickle 사용 안 함) - 빈 값은 '' + isna 필드
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if df[col].dtype.kind in 'biufcmM':
+            columns[str(col)] = values
+            continue
+        isna = pd.isna(values)
+        columns[str(col)] = np.where(isna, '', values.astype(str))
+        if isna.any():
+            columns[str(col) + NA_SUFFIX] = isna
+    records = np.empty(len(df), dtype=[(col, values.dtype) for col, values in columns.items()])
+    for col, values in columns.items():
+        records[col] = values
+    return records
+
+
+def from_array(array, columns):
+    if array.dtype.names is None:
+        return pd.DataFrame(array, columns=columns)
+    data = {}
+    for col in columns:
+        values = array[col]
+        if col + NA_SUFFIX in array.dtype.names:
+            values = values.astype(object)
+            values[array[col + NA_SUFFIX]] = np.nan
+        data[col] = values
+    return pd.DataFrame(data)
+
+
+# 같은 폴더의 겹치지 않는 임시 파일에 쓰고 교체 (동시에 써도 반쯤 쓴 파일이 보이지 않음)
+def atomic_write(path, write, mode='wb'):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                    suffix='.tmp')
+    try:
+        with open(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def write_cache(df, base_path, meta):
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    # 배열 먼저, 메타는 나중에 (메타가 있으면 배열도 완성된 상태)
+    array = to_array(df)
+    atomic_write(base_path + '.npy', lambda f: np.save(f, array))
+    meta = dict(meta, format=CACHE_FORMAT, columns=[str(c) for c in df.columns])
+    atomic_write(base_path + '.json', lambda f: json.dump(meta, f), mode='w')
+
+
+def read_cache(base_path, meta):
+    return from_array(np.load(base_path + '.npy', allow_pickle=False), meta['columns'])
+
+
+def select_columns(df, columns):
+    return df if columns is None else df[[c for c in df.columns if c in columns]]
+
+
+# --- run 하나 읽기 (pd.read_csv 대신 사용) ---
+# columns: 필요한 열만 (None 이면 전체)
+def read_run(file_path, columns=None, cache_dir=CACHE_DIR):
+    base_path = cache_path(file_path, cache_dir)
+    stat = source_stat(file_path)
+
+    try:
+        with open(base_path + '.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') == CACHE_FORMAT and meta['mtime_ns'] == stat['mtime_ns'] and meta['size'] == stat['size']:
+            return select_columns(read_cache(base_path, meta), columns)
+        # mtime 만 바뀐 경우 (git checkout 등): 내용이 같으면 메타만 갱신
+        sha1 = file_hash(file_path)
+        if meta.get('format') == CACHE_FORMAT and meta.get('sha1') == sha1:
+            df = read_cache(base_path, meta)
+            write_cache(df, base_path, dict(stat, sha1=sha1))
+            return select_columns(df, columns)
+    except (OSError, ValueError, KeyError):
+        pass  # 캐시가 없거나 깨졌으면 새로 만든다
+
+    df = pd.read_csv(file_path)
+    try:
+        write_cache(df, base_path, dict(stat, sha1=file_hash(file_path)))
+    except OSError:
+        pass  # 읽기 전용 환경(배포 서버 등)에서는 캐시 없이 동작
+    return select_columns(df, columns)
+
+
+# --- set 폴더 하나 읽기 ---
+# 반환: [(file_path, df), ...] (파일명 순)
+def read_set(set_folder, pattern='*.csv', columns=None, cache_dir=CACHE_DIR):
+    file_list = sorted(glob.glob(os.path.join(set_folder, pattern)))
+    return [(file_path, read_run(file_path, columns, cache_dir)) for file_path in file_list]
@@ -0,0 +1,367 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from anomaly import bin_runs, count_anomaly_bins, gyro_threshold_table, tilt_band, tilt_band_check
+from baseline_model import load_model
+from data_demo import clean_run
+from uploads import RAW_COLUMNS
+
+### 실시간 센서 스트림 수신 (UDP) + 통과(crossing) 단위 판정
+# 휴대폰 → CSV → 수동 업로드 대신, 기기가 샘플을 UDP 로 보내면 기기별 ring buffer 에 쌓고
+# 통과가 끝나면 바로 판정을 낸다.
+# - 패킷 (JSON 한 개 = datagram 한 개)
+#     {"device": "phone-1", "samples": [[time, accel_y, gyro_x, gyro_y, gyro_z, roll, pitch], ...]}
+#     {"device": "phone-1", "end": true}      ← 녹화 종료 (통과 끝)
+# - 샘플이 들어올 때마다: ring buffer 에 복사, gyro 크기 이동평균으로 충격 구간을 이어서 추적 (ShockTracker)
+# - 통과 끝 판단: end 패킷 / IDLE_TIMEOUT 동안 패킷 없음 / 충격 2개 이상 + QUIET_TIME 동안 조용함 / buffer 가득 참
+#   (QUIET_TIME 은 end 패킷 없이 계속 보내는 기기용, 현재 데이터의 통과 중 조용한 구간은 3초 이하)
+# - 통과가 끝나면 그 통과의 샘플만 복사해서 판정 스레드로 넘김 (수신 루프는 멈추지 않음) →
+#   data_demo.clean_run (업로드 전처리와 같은 파이프라인) →
+#   baseline 모델 기준 gyro 판정 (matrix.py 규칙) + tilt 3σ 띠 판정
+#   위치 적분은 통과 전체 시간 / 마지막 위치(219cm) 보정이 필요해서 끝난 뒤 한 번에 계산한다.
+#   통과 하나는 buffer 크기 이하라서 판정 시간도 그만큼으로 제한됨 (latency_ms 로 기록)
+# 로컬 테스트: python stream.py demo (raw_*.csv 를 원래 샘플 간격으로 재생해서 보내고, 파일 일괄 처리 결과와 비교)
+
+HOST = '127.0.0.1'
+PORT = 9999
+BUFFER_SIZE = 8192          # 기기별 ring buffer 샘플 수 (100Hz 기준 약 80초)
+IDLE_TIMEOUT = 0.3          # 초, 패킷이 이만큼 없으면 통과 끝
+QUIET_TIME = 5.0            # 초, 충격 2개 이후 이만큼 조용하면 통과 끝
+SHOCK_THRESHOLD = 0.3       # data_demo.clean_run 과 같은 값
+SMOOTH_TIME = 0.2
+MIN_SHOCK_TIME = 0.05
+MAX_DATAGRAM = 65507
+RECV_BUFFER = 4 << 20       # 판정 중에도 패킷이 버려지지 않도록 소켓 수신 버퍼를 늘림
+
+TIME, GYRO_X, GYRO_Y, GYRO_Z = (RAW_COLUMNS.index(c) for c in ['time', 'gyro_x', 'gyro_y', 'gyro_z'])
+
+
+# 기기별 고정 크기 ring buffer (샘플 번호 seq 로 접근)
+class RingBuffer:
+    def __init__(self, capacity=BUFFER_SIZE, n_cols=len(RAW_COLUMNS)):
+        self.data = np.empty((capacity, n_cols))
+        self.capacity = capacity
+        self.count = 0      # 지금까지 들어온 샘플 수 (다음 seq)
+
+    @property
+    def oldest(self):
+        return max(0, self.count - self.capacity)
+
+    # capacity 보다 많이 들어오면 마지막 capacity 개만 남기지만 seq 는 들어온 샘플 수만큼 전부 증가
+    # (ShockTracker 는 모든 샘플에 seq 를 매기므로 두 번호가 어긋나지 않게)
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=float)
+        total = len(rows)
+        rows = rows[-self.capacity:]
+        pos = (self.count + total - len(rows)) % self.capacity
+        first = min(len(rows), self.capacity - pos)
+        self.data[pos:pos + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.count += total
+
+    # [start, end) seq 구간 복사본 (덮어써진 샘플은 제외)
+    def view(self, start, end=None):
+        end = self.count if end is None else end
+        start = max(start, self.oldest)
+        idx = np.arange(start, end) % self.capacity
+        return self.data[idx]
+
+
+# gyro 크기 이동평균 > 임계값 이 MIN_SHOCK_TIME 이상 이어지는 구간을 샘플이 들어오는 대로 추적
+# (이동평균은 지난 SMOOTH_TIME 만 보는 causal 평균 - 통과 끝 판단용, 판정은 clean_run 결과로 함)
+# 샘플 간격은 처음 들어온 샘플들로 정함 (clean_run 은 통과 전체 평균 간격)
+class ShockTracker:
+    def __init__(self, threshold=SHOCK_THRESHOLD):
+        self.threshold = threshold
+        self.window = None
+        self.min_len = None
+        self.pending = np.empty((0, len(RAW_COLUMNS)))  # 샘플 간격을 정하기 전 샘플
+        self.history = np.empty(0)                      # 이동평균용 지난 gyro 크기 (window - 1 개)
+        self.seq = 0
+        self.run_start = None   # 지금 임계값을 넘고 있는 구간의 시작 seq
+        self.regions = []       # [(start_seq, end_seq), ...] (end 미포함)
+        self.region_end_time = None
+        self.last_time = None
+
+    def update(self, rows):
+        rows = np.asarray(rows, dtype=float)
+        if self.window is None:
+            rows = np.concatenate([self.pending, rows])
+            if len(rows) < 2:
+                self.pending = rows
+                return
+            dt = np.mean(np.diff(rows[:, TIME]))
+            self.window = max(int(SMOOTH_TIME / dt), 1)
+            self.min_len = max(int(MIN_SHOCK_TIME / dt), 1)
+
+        gyro = np.sqrt((rows[:, [GYRO_X, GYRO_Y, GYRO_Z]] ** 2).sum(axis=1))
+        values = np.concatenate([self.history, gyro])
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        # 지난 window 개 평균 (통과 시작 부분은 있는 샘플만)
+        ends = np.arange(len(self.history) + 1, len(values) + 1)
+        starts = np.maximum(ends - self.window, 0)
+        smooth = (csum[ends] - csum[starts]) / (ends - starts)
+
+        # 임계값 넘는 구간의 시작/끝만 훑음
+        edges = np.flatnonzero(np.diff(np.concatenate([[self.run_start is not None], smooth > self.threshold]).astype(np.int8)))
+        for i in edges:
+            seq = self.seq + i
+            if self.run_start is None:
+                self.run_start = seq
+            else:
+                if seq - self.run_start >= self.min_len:
+                    self.regions.append((self.run_start, seq))
+                    self.region_end_time = rows[i, TIME]
+                self.run_start = None
+
+        self.history = values[max(len(values) - (self.window - 1), 0):]
+        self.seq += len(rows)
+        self.last_time = rows[-1, TIME]
+
+    # 마지막 충격이 끝난 뒤 조용한 시간 (초)
+    def quiet_time(self):
+        if self.run_start is not None or self.region_end_time is None:
+            return 0.0
+        return float(self.last_time - self.region_end_time)
+
+
+# 기기 하나의 현재 통과
+class DeviceStream:
+    def __init__(self, device, capacity=BUFFER_SIZE):
+        self.device = device
+        self.buffer = RingBuffer(capacity)
+        self.reset(0)
+
+    def reset(self, start):
+        self.start = start          # 이 통과의 첫 seq
+        self.tracker = ShockTracker()
+        self.last_arrival = None
+        self.crossing = getattr(self, 'crossing', -1) + 1
+
+    def push(self, rows, now):
+        self.buffer.append(rows)
+        self.tracker.update(rows)
+        self.last_arrival = now
+
+    def n_samples(self):
+        return self.buffer.count - self.start
+
+    def should_finish(self, now):
+        if self.n_samples() == 0:
+            return None
+        if self.n_samples() >= self.buffer.capacity:
+            return 'buffer_full'
+        if self.last_arrival is not None and now - self.last_arrival >= IDLE_TIMEOUT:
+            return 'idle'
+        if len(self.tracker.regions) >= 2 and self.tracker.quiet_time() >= QUIET_TIME:
+            return 'quiet'
+        return None
+
+    def take_crossing(self):
+        rows = self.buffer.view(self.start)
+        self.reset(self.buffer.count)
+        return pd.DataFrame(rows, columns=RAW_COLUMNS)
+
+
+# 통과 하나 (원본 DataFrame) → 판정 dict
+class CrossingDetector:
+    def __init__(self, model=None):
+        self.model = load_model() if model is None else model
+        self.bins, self.table = gyro_threshold_table(self.model.gyro_summary())
+        summary = self.model.pitch_tilt_summary().rename(columns={'position_bin_pitch_tilt': 'position_bin', 'mean_tilt': 'tilt'})
+        self.band = tilt_band(summary)
+
+    def detect(self, df_clean):
+        position = df_clean['position'].to_numpy(dtype=float)
+        gyro_bins = count_anomaly_bins(np.zeros(len(position), dtype=np.int64), position,
+                                       df_clean['gyro'].to_numpy(dtype=float), self.bins, self.table, 1)[0]
+        band_check = tilt_band_check(bin_runs([df_clean]), self.band)
+        return {
+            'detected': bool(gyro_bins > 0),
+            'anomaly_bins': int(gyro_bins),
+            'tilt_out_of_band': int(band_check['out_of_band'].sum()),
+            'baseline': self.model.version,
+        }
+
+    def process(self, raw_df):
+        df_clean, _ = clean_run(raw_df)
+        return df_clean, self.detect(df_clean)
+
+
+class StreamServer:
+    def __init__(self, host=HOST, port=PORT, on_verdict=None, model=None, capacity=BUFFER_SIZE):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.05)
+        self.address = self.sock.getsockname()
+        self.devices = {}
+        self.capacity = capacity
+        self.detector = CrossingDetector(model)
+        self.on_verdict = on_verdict or (lambda verdict: print(json.dumps(verdict, ensure_ascii=False)))
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=1)   # 판정 (순서대로)
+
+    def handle(self, packet, now):
+        message = json.loads(packet)
+        device = self.devices.get(message['device'])
+        if device is None:
+            device = self.devices[message['device']] = DeviceStream(message['device'], self.capacity)
+        if message.get('samples'):
+            device.push(message['samples'], now)
+            if device.should_finish(now) == 'buffer_full':
+                self.finish(device, 'buffer_full', now)
+        if message.get('end'):
+            self.finish(device, 'end', now)
+
+    # 통과 샘플을 buffer 에서 떼어 내서 판정 스레드로 넘김
+    def finish(self, device, reason, now):
+        if device.n_samples() < 2:
+            device.reset(device.buffer.count)
+            return
+        info = {
+            'device': device.device,
+            'crossing': device.crossing,
+            'reason': reason,
+            'n_samples': device.n_samples(),
+            'shocks': len(device.tracker.regions),
+        }
+        last_arrival = device.last_arrival or now
+        raw_df = device.take_crossing()
+        self.executor.submit(self.judge, raw_df, info, last_arrival)
+
+    def judge(self, raw_df, info, last_arrival):
+        start = time.perf_counter()
+        try:
+            _, verdict = self.detector.process(raw_df)
+        except Exception as e:
+            print(f"[WARN] {info['device']} #{info['crossing']} 판정 실패: {e}")
+            return
+        done = time.perf_counter()
+        verdict = {
+            **info,
+            **verdict,
+            'processing_ms': round((done - start) * 1000, 2),
+            # 마지막 샘플 도착 → 판정까지 (idle 로 끝나면 IDLE_TIMEOUT 포함)
+            'latency_ms': round((done - last_arrival) * 1000, 2),
+        }
+        self.on_verdict(verdict)
+
+    def poll(self):
+        now = time.perf_counter()
+        for device in self.devices.values():
+            reason = device.should_finish(now)
+            if reason is not None:
+                self.finish(device, reason, now)
+
+    def serve(self):
+        while not self.stopped.is_set():
+            try:
+                packet, _ = self.sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                packet = None
+            if packet:
+                try:
+                    self.handle(packet, time.perf_counter())
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"[WARN] 잘못된 패킷: {e}")
+            self.poll()
+        self.sock.close()
+        self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stopped.set()
+
+
+# --- 시뮬레이터: raw_*.csv 를 원래 샘플 간격으로 재생 ---
+# speed: 재생 배속, batch: 패킷 하나에 넣을 샘플 수, gap: 파일 사이 쉬는 시간 (초)
+def replay(file_list, host=HOST, port=PORT, device='sim-0', speed=1.0, batch=5, gap=0.5):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for file_path in file_list:
+        rows = pd.read_csv(file_path)[RAW_COLUMNS].to_numpy(dtype=float)
+        t0 = time.perf_counter()
+        for i in range(0, len(rows), batch):
+            chunk = rows[i:i + batch]
+            wait = t0 + (chunk[-1, TIME] - rows[0, TIME]) / speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            sock.sendto(json.dumps({'device': device, 'samples': chunk.tolist()}).encode('utf-8'), (host, port))
+        sock.sendto(json.dumps({'device': device, 'end': True}).encode('utf-8'), (host, port))
+        time.sleep(gap / speed)
+    sock.close()
+
+
+# 로컬 서버 + 시뮬레이터 → 스트림 판정과 파일 일괄 처리 판정 비교
+def demo(file_list, speed=10.0, batch=5):
+    verdicts = []
+    server = StreamServer(port=0, on_verdict=verdicts.append)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    replay(file_list, *server.address, speed=speed, batch=batch)
+    time.sleep(IDLE_TIMEOUT * 2)
+    server.stop()
+    thread.join()
+
+    mismatch = 0
+    for file_path, verdict in zip(file_list, verdicts):
+        _, batch_verdict = server.detector.process(pd.read_csv(file_path))
+        same = all(verdict[k] == batch_verdict[k] for k in ['detected', 'anomaly_bins', 'tilt_out_of_band'])
+        mismatch += not same
+        print(f"{os.path.basename(file_path)}: 이상 구간 수 = {verdict['anomaly_bins']}, 이상 감지 = {verdict['detected']}, "
+              f"tilt 띠 이탈 = {verdict['tilt_out_of_band']}, 샘플 {verdict['n_samples']}, "
+              f"판정 {verdict['processing_ms']:.1f} ms, 지연 {verdict['latency_ms']:.1f} ms {'(일치)' if same else '(불일치)'}")
+    latency = [v['latency_ms'] for v in verdicts]
+    print(f"[INFO] {len(verdicts)}/{len(file_list)} 통과 판정, 일괄 처리와 불일치 {mismatch}개, "
+          f"지연 최대 {max(latency, default=0):.1f} ms (baseline {server.detector.model.version})")
+    return verdicts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='실시간 센서 스트림 수신 / 재생')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='UDP 수신 서버')
+    serve.add_argument('--host', default=HOST)
+    serve.add_argument('--port', type=int, default=PORT)
+    serve.add_argument('--out', help='판정 결과 JSON lines 파일')
+    play = sub.add_parser('replay', help='raw_*.csv 재생해서 보내기')
+    play.add_argument('files', nargs='+')
+    play.add_argument('--host', default=HOST)
+    play.add_argument('--port', type=int, default=PORT)
+    play.add_argument('--device', default='sim-0')
+    play.add_argument('--speed', type=float, default=1.0)
+    play.add_argument('--batch', type=int, default=5)
+    run_demo = sub.add_parser('demo', help='로컬 서버 + 재생 + 일괄 처리 비교')
+    run_demo.add_argument('--files', default=os.path.join('data', 'anomal', 'set13', 'raw_anomal_*.csv'))
+    run_demo.add_argument('--speed', type=float, default=10.0)
+    run_demo.add_argument('--batch', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        with contextlib.ExitStack() as stack:
+            out = stack.enter_context(open(args.out, 'a', encoding='utf-8')) if args.out else None
+
+            def emit(verdict):
+                line = json.dumps(verdict, ensure_ascii=False)
+                print(line)
+                if out is not None:
+                    out.write(line + '\n')
+                    out.flush()
+
+            server = StreamServer(args.host, args.port, on_verdict=emit)
+            print(f"[INFO] {server.address[0]}:{server.address[1]} 수신 대기 (baseline {server.detector.model.version})")
+            try:
+                server.serve()
+            except KeyboardInterrupt:
+                server.stop()
+    elif args.command == 'replay':
+        replay(args.files, args.host, args.port, args.device, args.speed, args.batch)
+    elif args.command == 'demo':
+        demo(sorted(glob.glob(args.files)), args.speed, args.batch)
@@ -0,0 +1,359 @@
+import argparse
+import glob
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from segmentation import detect_stable_segment
+
+### 전처리 필터의 스트리밍(청크) 버전
+# data_demo.clean_run 은 녹화 전체를 메모리에 올려 놓고
+#   gyro 크기 0.2초 가운데 이동평균 + bfill/ffill → 열 전체 scipy zscore (3σ) → 열 전체 선형 보간
+# 을 한다. 여기 필터들은 샘플을 청크 단위로 받아 처리하고, 각자 정해진 개수의 샘플만 들고 있다 (메모리 일정).
+# 필터 객체: push(값 배열) → 지금 내보낼 수 있는 값들, flush() → 남은 값들 (입력 순서, 전체 개수 같음)
+# 제너레이터: run_filter / clean_chunks 로 DataFrame 청크 스트림에 이어 붙임 (출력이 늦는 만큼 행도 같이 늦게 나감)
+#
+# 일괄 처리와의 차이 (python stream_filters.py compare 로 raw_*.csv 49개에서 확인):
+# - RollingMean(window) (lookahead 기본 = pandas center=True 위치): rolling(center=True).mean().bfill().ffill() 와
+#   같은 값 (합산 순서 차이로 1e-15 이내). 출력은 (window - 1) // 2 샘플 늦게 나오고, 맨 앞 window // 2 개는
+#   첫 평균이 나올 때까지 기다림. lookahead=0 이면 지난 window 개만 보는 causal 평균 (일괄 결과보다 window // 2 샘플 늦은 곡선)
+# - RunningZScore: 열 전체 평균/표준편차 대신 지금까지 들어온 값(자기 포함)의 누적 평균/표준편차로 판단.
+#   처음 warmup 개는 제거하지 않음. 녹화 앞부분은 일괄 결과와 다를 수 있고, 뒤로 갈수록 일괄 통계에 가까워짐.
+#   안정 구간 안에서 천천히 변하는 열 (특히 pitch) 은 누적 평균이 따라가지 못해서 일괄보다 많이 제거함
+#   (일괄 pitch 제거 7개 / 스트리밍 916개). gyro / accel 열은 비슷한 개수
+# - GapInterpolator: 결측 구간을 다음 유효값이 들어올 때까지 잡아 두었다가 (청크 경계를 넘어도) 선형 보간.
+#   pandas interpolate(method='linear') 와 같이 앞쪽 결측은 그대로, 끝 결측은 마지막 값으로 채움.
+#   max_gap 보다 긴 결측 구간은 메모리를 늘리지 않도록 보간하지 않고 NaN 으로 내보냄 (pandas 는 보간함)
+# - stable_chunks (clean_chunks(segment_len=...) 로 켜는 선택 단계, 기본은 끔):
+#   clean_run 처럼 첫 충격 끝 ~ 마지막 충격 시작 사이 안정 구간만 z-score / 보간으로 넘김.
+#   마지막 충격은 녹화가 끝나야 알 수 있어서 가장 최근 충격 시작 이후 행 (두 번째 충격 전이면 첫 충격 뒤 안정 구간
+#   전체) 과 첫 충격 전 행을 다음 충격 / flush 까지 들고 있음. 들고 있는 행은 max_hold 개까지만
+#   (넘치면 오래된 행부터: 첫 충격 뒤면 안정 구간으로 내보내고, 첫 충격 전이면 버림 → 메모리 일정).
+#   max_hold 안에 들어오는 녹화는 가운데 이동평균이면 잘리는 위치가 일괄 결과와 같음 (compare 의 stable_match).
+#   더 긴 녹화는 마지막 충격 뒤 max_hold 개보다 오래된 행이 남고, 충격 없는 녹화는 마지막 max_hold 개만 남음
+#
+# ※ clean_chunks 는 clean_run 의 대체품이 아님: 안정 구간 자르기는 선택이고, 같은 안정 구간에서도 z-score 제거 결과가 많이 다름
+#   (49개 파일 일괄 985 / 스트리밍 1685 제거, 둘 다 제거한 값은 615개). 판정 기준 (baseline 모델) 은 일괄 결과로
+#   만든 것이라 스트리밍 출력으로 판정하면 결과가 달라질 수 있음. stream.py 판정은 통과가 끝난 뒤 clean_run 을 씀
+
+ZSCORE_COLUMNS = ['accel_y', 'gyro_x', 'gyro_y', 'gyro_z', 'pitch', 'roll']
+SMOOTH_TIME = 0.2
+SHOCK_THRESHOLD = 0.3   # data_demo.clean_run 과 같은 값
+MIN_SHOCK_TIME = 0.05   # 충격 최소 길이 = 안정 구간 여유 버퍼
+Z_THRESHOLD = 3
+WARMUP = 200        # 이 개수 전에는 z-score 제거 안 함 (약 2초)
+MAX_GAP = 1000      # 보간을 위해 들고 있을 최대 결측 샘플 수
+MAX_HOLD = 6000     # 안정 구간인지 모르는 채로 들고 있을 최대 행 수 (약 60초)
+CHUNK_SIZE = 256
+
+
+# 이동평균 (window 개), 출력 i = 입력 [i + lookahead - window + 1, i + lookahead] 평균
+# lookahead=None 이면 pandas rolling(window, center=True) 와 같은 위치 ((window - 1) // 2)
+# 앞/뒤 평균을 못 내는 샘플은 첫/마지막 평균으로 채움 (bfill / ffill)
+class RollingMean:
+    def __init__(self, window, lookahead=None):
+        self.window = window
+        self.lookahead = (window - 1) // 2 if lookahead is None else lookahead
+        self.tail = np.empty(0)     # 마지막 window - 1 개 입력
+        self.n_in = 0
+        self.n_out = 0
+        self.last = np.nan
+
+    def push(self, values):
+        values = np.asarray(values, dtype=float)
+        buf = np.concatenate([self.tail, values])
+        self.n_in += len(values)
+        self.tail = buf[max(len(buf) - (self.window - 1), 0):]
+        if len(buf) < self.window:
+            return np.empty(0)
+        means = sliding_window_view(buf, self.window).mean(axis=1)
+        self.last = means[-1]
+        # 이번에 새로 계산된 평균의 출력 위치 = window 끝 - lookahead
+        first_end = self.n_in - len(means)  # 첫 평균의 window 끝 (0 부터 센 입력 번호)
+        first_out = first_end - self.lookahead
+        out = []
+        if self.n_out < first_out:  # 아직 평균이 없던 앞부분 (bfill)
+            out.append(np.full(first_out - self.n_out, means[0]))
+            self.n_out = first_out
+        out.append(means[self.n_out - first_out:])
+        self.n_out += len(out[-1])
+        return np.concatenate(out)
+
+    def flush(self):
+        rest = np.full(self.n_in - self.n_out, self.last)  # 뒤쪽 (ffill), 평균이 하나도 없으면 NaN
+        self.n_out = self.n_in
+        return rest
+
+
+# 누적 평균/표준편차 (ddof=0, scipy zscore 와 같음) 기준 |z| > threshold 인 값을 NaN 으로
+class RunningZScore:
+    def __init__(self, threshold=Z_THRESHOLD, warmup=WARMUP):
+        self.threshold = threshold
+        self.warmup = warmup
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, values):
+        values = np.asarray(values, dtype=float).copy()
+        valid = ~np.isnan(values)
+        d = np.where(valid, values - self.mean, 0.0)
+        # 이전 상태 + 이번 청크 앞부분 (Chan 병합을 prefix 마다)
+        n = self.n + np.cumsum(valid)
+        s1 = np.cumsum(d)
+        s2 = np.cumsum(d * d)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.mean + s1 / n
+            m2 = self.m2 + s2 - s1 * s1 / n
+            std = np.sqrt(np.maximum(m2, 0) / n)
+            z = (values - mean) / std
+        outlier = valid & (n > self.warmup) & (np.abs(z) > self.threshold)
+        if valid.any():
+            self.n, self.mean, self.m2 = int(n[-1]), float(mean[-1]), float(max(m2[-1], 0))
+        values[outlier] = np.nan
+        return values
+
+    def flush(self):
+        return np.empty(0)
+
+
+# 결측 구간 선형 보간 (청크 경계를 넘는 구간도)
+class GapInterpolator:
+    def __init__(self, max_gap=MAX_GAP):
+        self.max_gap = max_gap
+        self.last = np.nan      # 마지막 유효값
+        self.gap = 0            # 잡아 두고 있는 결측 수
+        self.dropping = False   # max_gap 넘은 결측 구간 (다음 유효값까지 NaN)
+
+    def push(self, values):
+        values = np.asarray(values, dtype=float)
+        out = []
+        valid_idx = np.flatnonzero(~np.isnan(values))
+        pos = 0
+        for i in valid_idx:
+            n_missing = self.gap + (i - pos)
+            if n_missing:
+                if np.isnan(self.last) or self.dropping:
+                    out.append(np.full(n_missing, np.nan))  # 앞쪽 결측 / 너무 긴 결측
+                else:
+                    step = (values[i] - self.last) / (n_missing + 1)
+                    out.append(self.last + step * np.arange(1, n_missing + 1))
+            out.append(values[i:i + 1])
+            self.last = values[i]
+            self.gap = 0
+            self.dropping = False
+            pos = i + 1
+        self.gap += len(values) - pos
+        if self.gap > self.max_gap or (self.gap and np.isnan(self.last)):
+            out.append(np.full(self.gap, np.nan))
+            self.dropping = not np.isnan(self.last)
+            self.gap = 0
+        return np.concatenate(out) if out else np.empty(0)
+
+    def flush(self):
+        rest = np.full(self.gap, np.nan if self.dropping else self.last)  # 끝 결측은 마지막 값
+        self.gap = 0
+        return rest
+
+
+# --- DataFrame 청크 스트림에 필터 하나 적용 ---
+# filt 출력이 늦으면 그만큼 행을 들고 있다가 같이 내보냄 (out_col 이 None 이면 col 을 덮어씀)
+def run_filter(chunks, filt, col, out_col=None):
+    out_col = out_col or col
+    pending = []
+
+    def emit(values):
+        rows = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+        ready, rest = rows.iloc[:len(values)].copy(), rows.iloc[len(values):]
+        ready[out_col] = values
+        pending[:] = [rest] if len(rest) else []
+        return ready
+
+    for df in chunks:
+        pending.append(df)
+        values = filt.push(df[col].to_numpy())
+        if len(values):
+            yield emit(values)
+    values = filt.flush()
+    if len(values):
+        yield emit(values)
+
+
+def read_chunks(file_path, chunksize=CHUNK_SIZE):
+    yield from pd.read_csv(file_path, chunksize=chunksize)
+
+
+def add_gyro_combined(chunks):
+    for df in chunks:
+        yield df.assign(gyro_combined=np.sqrt(df['gyro_x'] ** 2 + df['gyro_y'] ** 2 + df['gyro_z'] ** 2))
+
+
+# --- gyro_smooth 기준 안정 구간 행만 내보냄 (segmentation.detect_stable_segment 의 스트리밍 버전) ---
+# 충격 = gyro_smooth > threshold 가 min_len 개 이상, 안정 구간 = [첫 충격 끝 + buffer, 마지막 충격 시작 - buffer]
+# 충격 구간이 하나도 없으면 clean_run 처럼 전체를 내보냄 (max_hold 개 넘게 들고 있지 않음, 위 설명 참고)
+def stable_chunks(chunks, min_len, buffer_samples, threshold=SHOCK_THRESHOLD, max_hold=MAX_HOLD):
+    held = []           # 안정 구간인지 아직 모르는 행
+    held_start = 0      # held 첫 행 번호
+    seq = 0             # 지금까지 들어온 행 수
+    run_start = None    # 임계값을 넘고 있는 구간의 시작 번호
+    first_end = last_start = None
+
+    # held 에서 hi 이전 행 정리: 첫 충격 끝 + buffer 이후는 내보내고 그 앞은 버림 (첫 충격 전이면 전부 버림)
+    def release(hi):
+        nonlocal held, held_start
+        hi = min(hi, seq)
+        if hi <= held_start:
+            return None
+        rows = pd.concat(held, ignore_index=True) if len(held) > 1 else held[0]
+        cut = hi - held_start
+        keep_from = seq if first_end is None else first_end + buffer_samples
+        out = rows.iloc[max(keep_from - held_start, 0):cut]
+        held = [rows.iloc[cut:]] if cut < len(rows) else []
+        held_start = hi
+        return out if len(out) else None
+
+    def add_region(start, end):
+        nonlocal first_end, last_start
+        if end - start >= min_len:
+            first_end = end if first_end is None else first_end
+            last_start = start
+
+    for df in chunks:
+        held.append(df)
+        over = df['gyro_smooth'].to_numpy() > threshold
+        for i in np.flatnonzero(np.diff(np.concatenate([[run_start is not None], over]).astype(np.int8))):
+            if run_start is None:
+                run_start = seq + i
+            else:
+                add_region(run_start, seq + i)
+                run_start = None
+        seq += len(df)
+        hi = seq - max_hold     # 넘치는 행
+        if first_end is not None:
+            hi = max(hi, last_start - buffer_samples + 1, first_end + buffer_samples)
+        out = release(hi)
+        if out is not None:
+            yield out
+
+    if run_start is not None:   # 끝까지 이어진 충격
+        add_region(run_start, seq)
+    if first_end is None:
+        if held:
+            yield pd.concat(held, ignore_index=True)
+        return
+    out = release(last_start - buffer_samples + 1)
+    if out is not None:
+        yield out
+
+
+# clean_run 의 필터 부분 (gyro_smooth, 안정 구간 자르기, z-score 제거, 보간) 을 청크 스트림으로
+# window: 이동평균 샘플 수 (clean_run 은 int(0.2 / 평균 샘플 간격)), lookahead=0 이면 causal
+# segment_len: 주면 stable_chunks 로 안정 구간만 남김 (충격 최소 길이 = 여유 버퍼, clean_run 은 int(0.05 / 평균 샘플 간격))
+#              None (기본) 이면 녹화 전체에 z-score / 보간
+def clean_chunks(chunks, window, lookahead=None, zscore_columns=ZSCORE_COLUMNS,
+                 threshold=Z_THRESHOLD, warmup=WARMUP, max_gap=MAX_GAP, segment_len=None, max_hold=MAX_HOLD):
+    chunks = add_gyro_combined(chunks)
+    chunks = run_filter(chunks, RollingMean(window, lookahead), 'gyro_combined', 'gyro_smooth')
+    if segment_len is not None:
+        chunks = stable_chunks(chunks, segment_len, segment_len, max_hold=max_hold)
+    for col in zscore_columns:
+        chunks = run_filter(chunks, RunningZScore(threshold, warmup), col)
+    for col in zscore_columns:
+        chunks = run_filter(chunks, GapInterpolator(max_gap), col)
+    yield from chunks
+
+
+def window_from_interval(sampling_interval, smooth_time=SMOOTH_TIME):
+    return int(smooth_time / sampling_interval)
+
+
+def min_len_from_interval(sampling_interval, min_shock_time=MIN_SHOCK_TIME):
+    return int(min_shock_time / sampling_interval)
+
+
+# raw 파일 하나에서 일괄 처리 vs 스트리밍 비교
+def compare_file(file_path, chunksize=CHUNK_SIZE):
+    from scipy.stats import zscore
+    df = pd.read_csv(file_path)
+    window = window_from_interval(np.mean(np.diff(df['time'])))
+    gyro_combined = np.sqrt(df['gyro_x'] ** 2 + df['gyro_y'] ** 2 + df['gyro_z'] ** 2)
+    batch_smooth = gyro_combined.rolling(window=window, center=True).mean().bfill().ffill().to_numpy()
+
+    chunks = [df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize)]
+    centered = pd.concat(run_filter(add_gyro_combined(chunks), RollingMean(window), 'gyro_combined', 'gyro_smooth'))
+    causal = pd.concat(run_filter(add_gyro_combined(chunks), RollingMean(window, 0), 'gyro_combined', 'gyro_smooth'))
+
+    # z-score / 보간은 clean_run 처럼 충격 사이 안정 구간에만
+    min_len = min_len_from_interval(np.mean(np.diff(df['time'])))
+    _, stable = detect_stable_segment(batch_smooth, SHOCK_THRESHOLD, min_len, min_len)
+    stream_cut = [c['time'] for c in stable_chunks((centered.iloc[i:i + chunksize] for i in range(0, len(centered), chunksize)), min_len, min_len)]
+    stream_cut = pd.concat(stream_cut).to_numpy() if stream_cut else np.empty(0)
+    if stable is not None:
+        df = df.iloc[stable[0]:stable[1] + 1].reset_index(drop=True)
+    stable_match = np.array_equal(stream_cut, df['time'].to_numpy())
+    chunks = [df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize)]
+
+    # z-score: 열 전체 vs 누적
+    batch_out = np.zeros(len(df), dtype=bool)
+    stream_out = np.zeros(len(df), dtype=bool)
+    for col in ZSCORE_COLUMNS:
+        batch_out |= np.abs(zscore(df[col].to_numpy())) > Z_THRESHOLD
+        filt = RunningZScore()
+        stream_out |= np.isnan(np.concatenate([filt.push(c[col].to_numpy()) for c in chunks]))
+
+    # 보간: 일괄 z-score 로 만든 결측을 pandas / 스트리밍으로 채움
+    holes = df[ZSCORE_COLUMNS].copy()
+    for col in ZSCORE_COLUMNS:
+        holes.loc[np.abs(zscore(df[col].to_numpy())) > Z_THRESHOLD, col] = np.nan
+    batch_interp = holes.interpolate(method='linear')
+    hole_chunks = [holes.iloc[i:i + chunksize] for i in range(0, len(holes), chunksize)]
+    for col in ZSCORE_COLUMNS:
+        hole_chunks = run_filter(hole_chunks, GapInterpolator(), col)
+    stream_interp = pd.concat(hole_chunks)
+
+    return {
+        'file': os.path.basename(file_path),
+        'window': window,
+        'stable_samples': len(df),
+        'stable_match': stable_match,
+        'smooth_centered_max_diff': float(np.max(np.abs(centered['gyro_smooth'].to_numpy() - batch_smooth))),
+        'smooth_causal_max_diff': float(np.max(np.abs(causal['gyro_smooth'].to_numpy() - batch_smooth))),
+        'zscore_batch': int(batch_out.sum()),
+        'zscore_stream': int(stream_out.sum()),
+        'zscore_both': int((batch_out & stream_out).sum()),
+        'interp_max_diff': float(np.nanmax(np.abs(stream_interp.to_numpy() - batch_interp.to_numpy()))),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='전처리 필터 스트리밍 버전')
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmp = sub.add_parser('compare', help='raw_*.csv 에서 일괄 처리와 비교')
+    cmp.add_argument('--files', default=os.path.join('data', 'anomal', 'set*', 'raw_anomal_*.csv'))
+    cmp.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    clean = sub.add_parser('clean', help='raw CSV 하나를 청크로 읽어 필터 적용 후 저장')
+    clean.add_argument('file')
+    clean.add_argument('out')
+    clean.add_argument('--sampling-interval', type=float, default=0.01)
+    clean.add_argument('--causal', action='store_true')
+    clean.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    clean.add_argument('--segment', action='store_true', help='clean_run 처럼 충격 사이 안정 구간만 남김')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        results = pd.DataFrame([compare_file(f, args.chunksize) for f in sorted(glob.glob(args.files))])
+        print(results.to_string(index=False))
+        print(f"\n[INFO] {len(results)} files: 가운데 이동평균 최대 차이 {results['smooth_centered_max_diff'].max():.2e}, "
+              f"causal {results['smooth_causal_max_diff'].max():.3f}, 보간 최대 차이 {results['interp_max_diff'].max():.2e}, "
+              f"z-score 제거 일괄 {results['zscore_batch'].sum()} / 스트리밍 {results['zscore_stream'].sum()} "
+              f"(공통 {results['zscore_both'].sum()}), 안정 구간 일치 {results['stable_match'].sum()}")
+    elif args.command == 'clean':
+        window = window_from_interval(args.sampling_interval)
+        segment_len = min_len_from_interval(args.sampling_interval) if args.segment else None
+        header = True
+        with open(args.out, 'w', encoding='utf-8', newline='') as f:
+            for df in clean_chunks(read_chunks(args.file, args.chunksize), window, 0 if args.causal else None,
+                                   segment_len=segment_len):
+                df.to_csv(f, index=False, header=header)
+                header = False
+        print(f"[INFO] 저장 완료: {args.out}")
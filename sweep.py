@@ -0,0 +1,262 @@
+import argparse
+import glob
+import os
+import time as timer
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, roc_auc_score
+from anomaly import ANOMALY_RATIO, FINE_BIN_SIZE, SIGMA, TILT_BIN_SIZE, TILT_RANGE, UPPER_BIN_SIZE, tilt_band
+from binstats import IQR_MULTIPLIER, iqr_upper_bound
+from pyramid import load_pyramid
+from storage import read_run
+
+### 탐지기 파라미터 sweep → ROC / PR 표
+# matrix.py 의 gyro 판정 (0.3cm bin, 30cm 상한선, 70% 비율, 2.5×IQR) 과 tilt 3σ 띠 판정의 손잡이를
+# 격자로 돌려 본다. 파라미터를 바꿀 때마다 CSV 를 다시 읽고 merge 하지 않도록:
+# - 검증 run 전체를 한 번만 읽어 배열 하나로 합침 (run id, position, gyro, tilt)
+# - 상한선은 학습 set 의 10cm bin Q1/Q3 (pyramid) 로 두고 IQR 배수마다 배열 연산으로 다시 계산
+# - (fine bin, 상한선 bin) 쌍마다 (run, bin) 묶음을 한 번 만들고, 그 안에서 IQR 배수를 돌림
+# - 비율 / σ 는 run 별 점수 (gyro: bin 이상 비율의 최대값, tilt: 구간 |평균 차| / std 최대값) 하나로
+#   모든 기준값을 한 번에 평가 (점수 >= 비율 이면 gyro 이상, 점수 > σ 이면 tilt 이상)
+# (fine bin, 상한선 bin) 쌍은 프로세스 풀에 나눠서 계산한다.
+# 상한선을 만든 학습 set(TRAIN_SETS, set0-5) 의 정상 run 은 평가에서 뺌 (--include-train 이면 포함)
+
+base_dir = 'data'
+OUT_DIR = os.path.join(base_dir, 'artifacts', 'sweep')
+TRAIN_SETS = [f'set{i}' for i in range(6)]
+SUMMARY_BIN = 10  # summary_gyro_setN.csv 의 position_bin_gyro (10cm round)
+
+FINE_BIN_SIZES = [0.1, 0.2, 0.3, 0.5, 1.0]
+UPPER_BIN_SIZES = [10, 20, 30, 40, 60]  # summary bin(10cm) 의 배수만 상한선과 맞음
+IQR_MULTIPLIERS = [round(k, 2) for k in np.arange(1.0, 4.01, 0.25)]
+RATIOS = [round(r, 2) for r in np.arange(0.5, 1.001, 0.05)]
+TILT_BIN_SIZES = [10, 20, 40]
+SIGMAS = [round(s, 2) for s in np.arange(1.0, 6.01, 0.25)]
+
+_data = None  # 작업 프로세스의 검증 데이터
+
+
+# 반환: {'files', 'label', 'run_id', 'position', 'gyro', 'tilt'} (정상 0 / 이상 1)
+def load_validation(normal_files, anomal_files):
+    file_list = normal_files + anomal_files
+    runs = [read_run(f, columns=['position', 'gyro', 'tilt']) for f in file_list]
+    data = {
+        'files': [os.path.relpath(f, base_dir) for f in file_list],
+        'label': np.array([0] * len(normal_files) + [1] * len(anomal_files)),
+        'run_id': np.repeat(np.arange(len(runs)), [len(df) for df in runs]),
+    }
+    for col in ['position', 'gyro', 'tilt']:
+        data[col] = np.concatenate([df[col].to_numpy(dtype=float) for df in runs]) if runs else np.empty(0)
+    return data
+
+
+# 학습 set 의 10cm bin gyro Q1/Q3 → (bin, bin × set Q1 표, bin × set Q3 표) - set 에 없는 bin 은 NaN
+def gyro_quantile_table(pyramid, train_sets=TRAIN_SETS):
+    levels = [pyramid.level(set_name, SUMMARY_BIN, 'round') for set_name in train_sets]
+    bins = np.unique(np.concatenate([level['position_bin'].to_numpy(dtype=float) for level in levels]))
+    q25 = np.full((len(bins), len(levels)), np.nan)
+    q75 = np.full((len(bins), len(levels)), np.nan)
+    for j, level in enumerate(levels):
+        row = np.searchsorted(bins, level['position_bin'].to_numpy(dtype=float))
+        q25[row, j] = level['q25_gyro'].to_numpy()
+        q75[row, j] = level['q75_gyro'].to_numpy()
+    return bins, q25, q75
+
+
+def init_worker(data):
+    global _data
+    _data = data
+
+
+# anomaly.count_anomaly_bins 와 같은 규칙으로 run 별 점수 (0.3cm bin 이상 비율의 최대값) 계산
+# 반환: {iqr_multiplier: run 별 점수 (비교한 bin 이 없으면 -inf)}
+def gyro_scores(fine_bin_size, upper_bin_size, iqr_multipliers, data=None):
+    data = _data if data is None else data
+    bins, q25, q75 = data['bins'], data['q25'], data['q75']
+    n_runs = len(data['label'])
+    position = data['position']
+
+    coarse = np.floor(position / upper_bin_size) * upper_bin_size
+    row = np.minimum(np.searchsorted(bins, coarse), len(bins) - 1)
+    matched = bins[row] == coarse
+    row = row[matched]
+    gyro = data['gyro'][matched]
+    fine = np.floor(position[matched] / fine_bin_size).astype(np.int64)
+    if len(fine) == 0:
+        return {k: np.full(n_runs, -np.inf) for k in iqr_multipliers}
+
+    span = fine.max() - fine.min() + 1
+    group, inverse = np.unique(data['run_id'][matched] * span + (fine - fine.min()), return_inverse=True)
+    compare_count = np.bincount(inverse, weights=(~np.isnan(q75[row])).sum(axis=1), minlength=len(group))
+    group_run = group // span
+    starts = np.flatnonzero(np.r_[True, group_run[1:] != group_run[:-1]])
+
+    scores = {}
+    for k in iqr_multipliers:
+        upper = iqr_upper_bound(q25, q75, k)
+        with np.errstate(invalid='ignore'):
+            exceed_count = (gyro[:, None] > upper[row]).sum(axis=1)
+        anomaly_ratio = np.bincount(inverse, weights=exceed_count, minlength=len(group)) / compare_count
+        score = np.full(n_runs, -np.inf)
+        score[group_run[starts]] = np.maximum.reduceat(anomaly_ratio, starts)
+        scores[k] = score
+    return scores
+
+
+# pitch.show_pitch 의 tilt 3σ 띠 판정을 run 하나씩 적용 → run 별 max |구간 평균 - 정상 평균| / std
+def tilt_scores(band, data=None):
+    data = _data if data is None else data
+    n_runs = len(data['label'])
+    bin_starts = band['bin_starts']
+    n_bins = len(bin_starts)
+
+    position_bin = np.round(data['position'])  # anomaly.bin_runs (1cm round)
+    tilt = data['tilt']
+    idx = np.floor((position_bin - bin_starts[0]) / band['bin_size']).astype(np.int64)
+    ok = ((position_bin >= TILT_RANGE[0]) & (position_bin <= TILT_RANGE[1])
+          & (idx >= 0) & (idx < n_bins) & ~np.isnan(tilt))
+    cell = data['run_id'][ok] * n_bins + idx[ok]
+    counts = np.bincount(cell, minlength=n_runs * n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        upload_mean = (np.bincount(cell, weights=tilt[ok], minlength=n_runs * n_bins) / counts).reshape(n_runs, n_bins)
+
+    std = np.where(np.isnan(band['std']) | (band['std'] == 0), 1e-6, band['std'])
+    z = np.abs(upload_mean - band['mean']) / std
+    z[np.isnan(z)] = -np.inf
+    return z.max(axis=1) if n_bins else np.full(n_runs, -np.inf)
+
+
+# detected: 기준값 × run 이상 여부 → 기준값별 혼동 행렬 / ROC / PR 값
+def curve_table(label, detected):
+    positive = label == 1
+    tp = (detected & positive).sum(axis=1)
+    fp = (detected & ~positive).sum(axis=1)
+    fn = positive.sum() - tp
+    tn = (~positive).sum() - fp
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / (tp + fn)
+        return pd.DataFrame({
+            'tp': tp, 'fp': fp, 'tn': tn, 'fn': fn,
+            'tpr': recall,
+            'fpr': fp / (fp + tn),
+            'precision': precision,
+            'recall': recall,
+            'f1': np.where(tp > 0, 2 * precision * recall / (precision + recall), 0.0),
+            'accuracy': (tp + tn) / len(label),
+        })
+
+
+# 점수 하나로 요약 (AUC 는 기준값 격자와 상관없이 점수 전체로 계산)
+def score_summary(label, score):
+    finite = np.where(np.isfinite(score), score, -1.0)
+    if label.min() == label.max():
+        return {'roc_auc': np.nan, 'average_precision': np.nan}
+    return {'roc_auc': roc_auc_score(label, finite), 'average_precision': average_precision_score(label, finite)}
+
+
+def run_tasks(func, tasks, data, max_workers):
+    if max_workers == 1:
+        return [func(*task, data=data) for task in tasks]
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(data,)) as executor:
+        futures = [executor.submit(func, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def sweep(data, tilt_summary, fine_bin_sizes=FINE_BIN_SIZES, upper_bin_sizes=UPPER_BIN_SIZES,
+          iqr_multipliers=IQR_MULTIPLIERS, ratios=RATIOS, tilt_bin_sizes=TILT_BIN_SIZES, sigmas=SIGMAS,
+          max_workers=None):
+    label = data['label']
+    ratios = np.asarray(ratios, dtype=float)
+    sigmas = np.asarray(sigmas, dtype=float)
+
+    # === gyro ===
+    pairs = [(b, u) for b in fine_bin_sizes for u in upper_bin_sizes]
+    results = run_tasks(gyro_scores, [(b, u, iqr_multipliers) for b, u in pairs], data, max_workers)
+    gyro_roc, gyro_auc = [], []
+    for (b, u), scores in zip(pairs, results):
+        for k, score in scores.items():
+            params = {'fine_bin_size': b, 'upper_bin_size': u, 'iqr_multiplier': k}
+            curve = curve_table(label, score[None, :] >= ratios[:, None])
+            curve.insert(0, 'ratio', ratios)
+            gyro_roc.append(curve.assign(**params))
+            best = curve.loc[curve['f1'].idxmax()]
+            gyro_auc.append({**params, **score_summary(label, score), 'best_ratio': best['ratio'], 'best_f1': best['f1']})
+
+    # === tilt ===
+    bands = [tilt_band(tilt_summary, bin_size=tb) for tb in tilt_bin_sizes]
+    results = run_tasks(tilt_scores, [(band,) for band in bands], data, max_workers)
+    tilt_roc, tilt_auc = [], []
+    for tb, score in zip(tilt_bin_sizes, results):
+        curve = curve_table(label, score[None, :] > sigmas[:, None])
+        curve.insert(0, 'sigma', sigmas)
+        tilt_roc.append(curve.assign(tilt_bin_size=tb))
+        best = curve.loc[curve['f1'].idxmax()]
+        tilt_auc.append({'tilt_bin_size': tb, **score_summary(label, score), 'best_sigma': best['sigma'], 'best_f1': best['f1']})
+
+    gyro_keys = ['fine_bin_size', 'upper_bin_size', 'iqr_multiplier']
+    return {
+        'gyro_roc': pd.concat(gyro_roc, ignore_index=True)[gyro_keys + [c for c in gyro_roc[0].columns if c not in gyro_keys]],
+        'gyro_auc': pd.DataFrame(gyro_auc).sort_values(['roc_auc', 'best_f1'], ascending=False, ignore_index=True),
+        'tilt_roc': pd.concat(tilt_roc, ignore_index=True)[['tilt_bin_size'] + [c for c in tilt_roc[0].columns if c != 'tilt_bin_size']],
+        'tilt_auc': pd.DataFrame(tilt_auc).sort_values(['roc_auc', 'best_f1'], ascending=False, ignore_index=True),
+    }
+
+
+def main(normal_pattern='normal/set*/normal_*.csv', anomal_pattern='anomal/set*/anomal_*.csv',
+         out_dir=OUT_DIR, max_workers=None, include_train=False):
+    start = timer.perf_counter()
+    normal_files = sorted(glob.glob(os.path.join(base_dir, normal_pattern)))
+    if not include_train:
+        train = [f for f in normal_files if os.path.basename(os.path.dirname(f)) in TRAIN_SETS]
+        normal_files = [f for f in normal_files if f not in train]
+        print(f"[INFO] 학습 set 정상 run {len(train)}개 제외 ({', '.join(TRAIN_SETS)})")
+    anomal_files = sorted(glob.glob(os.path.join(base_dir, anomal_pattern)))
+    data = load_validation(normal_files, anomal_files)
+    data['bins'], data['q25'], data['q75'] = gyro_quantile_table(load_pyramid())
+
+    summary_files = [os.path.join(base_dir, 'normal', 'summary', f'summary_pitch_tilt_{s}.csv') for s in TRAIN_SETS]
+    tilt_summary = pd.concat([read_run(f) for f in summary_files], ignore_index=True)
+    tilt_summary = tilt_summary.rename(columns={'position_bin_pitch_tilt': 'position_bin', 'mean_tilt': 'tilt'})
+    print(f"[INFO] 정상 {len(normal_files)} / 이상 {len(anomal_files)} runs, "
+          f"{len(data['position'])} rows 준비 ({timer.perf_counter() - start:.2f}s)")
+
+    start = timer.perf_counter()
+    tables = sweep(data, tilt_summary, max_workers=max_workers)
+    n_combos = len(tables['gyro_roc']) + len(tables['tilt_roc'])
+    print(f"[INFO] {n_combos} 조합 평가 ({timer.perf_counter() - start:.2f}s)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, table in tables.items():
+        table.to_csv(os.path.join(out_dir, f'{name}.csv'), index=False)
+    print(f"[INFO] 저장: {out_dir}/{{{','.join(tables)}}}.csv")
+
+    gyro_roc = tables['gyro_roc']
+    current = gyro_roc[np.isclose(gyro_roc['fine_bin_size'], FINE_BIN_SIZE) & (gyro_roc['upper_bin_size'] == UPPER_BIN_SIZE)
+                       & np.isclose(gyro_roc['iqr_multiplier'], IQR_MULTIPLIER) & np.isclose(gyro_roc['ratio'], ANOMALY_RATIO)]
+    print("\n=== gyro 현재 설정 ===")
+    print(current.to_string(index=False))
+    print("\n=== gyro F1 상위 ===")
+    print(gyro_roc.sort_values(['f1', 'accuracy'], ascending=False).head(10).to_string(index=False))
+    print("\n=== gyro AUC 상위 ===")
+    print(tables['gyro_auc'].head(5).to_string(index=False))
+
+    tilt_roc = tables['tilt_roc']
+    print(f"\n=== tilt 현재 설정 (bin {TILT_BIN_SIZE}, {SIGMA}σ) ===")
+    print(tilt_roc[(tilt_roc['tilt_bin_size'] == TILT_BIN_SIZE) & np.isclose(tilt_roc['sigma'], SIGMA)].to_string(index=False))
+    print("\n=== tilt AUC ===")
+    print(tables['tilt_auc'].to_string(index=False))
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='탐지기 파라미터 sweep (ROC / PR 표)')
+    parser.add_argument('--normal-pattern', default='normal/set*/normal_*.csv', help='data 폴더 기준 glob')
+    parser.add_argument('--anomal-pattern', default='anomal/set*/anomal_*.csv', help='data 폴더 기준 glob')
+    parser.add_argument('--out-dir', default=OUT_DIR)
+    parser.add_argument('--workers', type=int, default=None, help='프로세스 수 (1 이면 풀 없이 실행)')
+    parser.add_argument('--include-train', action='store_true', help='학습 set (set0-5) 정상 run 도 평가')
+    args = parser.parse_args()
+
+    main(args.normal_pattern, args.anomal_pattern, args.out_dir, args.workers, args.include_train)
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import pandas as pd
+
+### 대시보드 업로드 처리
+# - CSV / XLSX / ZIP(안의 CSV, XLSX) 업로드를 (파일명, DataFrame) 목록으로 읽음
+# - 이미 전처리된 CSV (position, gyro, cumulative_pitch, tilt) 는 그대로 사용
+# - 휴대폰 원본 (time, accel_y, gyro_*, roll, pitch) 은 프로세스 풀에서 data_demo.clean_run 으로 전처리
+#   (analyze_and_save 와 같은 파이프라인, 다만 data 폴더에 저장하지 않고 결과만 돌려받음)
+# - 파일 하나가 잘못되어도 (읽기 실패, 깨진 ZIP, 전처리 예외) 그 파일만 건너뛴 목록에 넣고 나머지는 처리
+# - 내용이 같은 파일 (같은 해시) 은 한 번만 전처리
+# - 작업 프로세스가 죽어서 풀이 깨지면 (BrokenProcessPool) 새 풀을 만들어 남은 파일을 한 번 더 시도 (UploadPool)
+
+RAW_COLUMNS = ['time', 'accel_y', 'gyro_x', 'gyro_y', 'gyro_z', 'roll', 'pitch']
+PROCESSED_COLUMNS = ['position', 'gyro', 'cumulative_pitch', 'tilt']
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_table(file_name, data):
+    if file_name.endswith('.csv'):
+        return pd.read_csv(BytesIO(data))
+    if file_name.endswith('.xlsx'):
+        return pd.read_excel(BytesIO(data))
+    return None
+
+
+# 업로드 파일 하나 → [(파일명, 원본 bytes), ...] (ZIP 이면 안의 파일들)
+def expand_upload(file_name, data):
+    if not file_name.endswith('.zip'):
+        return [(file_name, data)]
+    entries = []
+    with zipfile.ZipFile(BytesIO(data)) as z:
+        for name in sorted(z.namelist()):
+            if name.endswith(('.csv', '.xlsx')) and not os.path.basename(name).startswith('.'):
+                entries.append((os.path.basename(name), z.read(name)))
+    return entries
+
+
+# 업로드 [(파일명, bytes), ...] → (펼친 목록, 펼치지 못한 파일명 목록)
+def expand_uploads(uploads):
+    entries = []
+    skipped = []
+    for file_name, data in uploads:
+        try:
+            entries.extend(expand_upload(file_name, data))
+        except Exception as e:
+            print(f"[WARN] 업로드를 열 수 없음: {file_name} ({e})")
+            skipped.append(file_name)
+    return entries, skipped
+
+
+def is_processed(df):
+    return all(col in df.columns for col in PROCESSED_COLUMNS)
+
+
+def is_raw(df):
+    return all(col in df.columns for col in RAW_COLUMNS)
+
+
+# 작업 프로세스에서 실행
+def process_raw(df):
+    from data_demo import clean_run
+    df_clean, _ = clean_run(df)
+    return df_clean
+
+
+def make_pool(max_workers=None):
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+
+# 깨지면 다시 만드는 프로세스 풀 (대시보드가 프로세스당 하나를 캐시해서 씀)
+class UploadPool:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.executor = None
+
+    def submit(self, fn, *args):
+        if self.executor is None:
+            self.executor = make_pool(self.max_workers)
+        try:
+            return self.executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self.reset()
+            self.executor = make_pool(self.max_workers)
+            return self.executor.submit(fn, *args)
+
+    def reset(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+
+
+# entries: [(파일명, bytes), ...]
+# executor: UploadPool (또는 submit 이 있는 executor - 그때는 깨진 풀을 다시 만들지 않음)
+# cache: {content_hash: 전처리된 DataFrame} - 이미 처리한 파일은 다시 처리하지 않음 (세션 상태 등)
+# progress: progress(완료 수, 전체 수) 콜백
+# 반환: (전처리된 DataFrame 목록 (업로드 순서), 건너뛴 파일명 목록)
+def prepare_uploads(entries, executor, cache=None, progress=None):
+    cache = {} if cache is None else cache
+    keys = [content_hash(data) for _, data in entries]
+    results = {}
+    skipped = []
+    pending = {}    # 전처리할 원본 {key: (파일명, df)} - 같은 내용은 한 번만
+
+    for (name, data), key in zip(entries, keys):
+        if key in cache:
+            results[key] = cache[key]
+            continue
+        if key in results or key in pending:
+            continue
+        try:
+            df = read_table(name, data)
+        except Exception as e:
+            print(f"[WARN] 읽기 실패: {name} ({e})")
+            df = None
+        if df is None:
+            skipped.append(name)
+        elif is_processed(df):
+            results[key] = cache[key] = df
+        elif is_raw(df):
+            pending[key] = (name, df)
+        else:
+            skipped.append(name)
+
+    # 작업 프로세스가 죽어서 풀이 깨지면 끝나지 않은 파일은 새 풀에서 한 번 더 (두 번째도 깨지면 건너뜀)
+    total = len(pending)
+    done = 0
+    todo = list(pending)
+    for attempt in range(2):
+        futures = {}
+        for key in todo:
+            try:
+                futures[executor.submit(process_raw, pending[key][1])] = key
+            except Exception as e:
+                print(f"[WARN] 전처리 실패: {pending[key][0]} ({e})")
+                skipped.append(pending[key][0])
+        todo = []
+        broken = False
+        for future in as_completed(futures):
+            key = futures[future]
+            name = pending[key][0]
+            try:
+                results[key] = cache[key] = future.result()
+            except BrokenProcessPool as e:
+                broken = True
+                if attempt == 0:
+                    todo.append(key)
+                    continue
+                print(f"[WARN] 전처리 실패: {name} ({e})")
+                skipped.append(name)
+            except Exception as e:
+                print(f"[WARN] 전처리 실패: {name} ({e})")
+                skipped.append(name)
+            done += 1
+            if progress is not None:
+                progress(done, total)
+        if broken and hasattr(executor, 'reset'):
+            executor.reset()
+        if not todo:
+            break
+
+    frames = []
+    for (name, _), key in zip(entries, keys):
+        if key in results:
+            df = results[key].copy()
+            df.attrs['filename'] = os.path.splitext(name)[0]
+            frames.append(df)
+    return frames, skipped